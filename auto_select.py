@@ -0,0 +1,205 @@
+"""
+Automatic endpoint selection for Claude Model Manager
+Keeps decayed latency/error scores for a group of profiles and rides the fastest healthy one
+"""
+
+import time
+
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+
+# 伪模型名称：--switch auto 会开启自动选择，而不是切换到名为 auto 的模型
+AUTO_PROFILE = "auto"
+
+DEFAULT_SETTINGS = {
+    "enabled": False,
+    "members": [],
+    "interval_seconds": 30,
+    "hysteresis": 0.2,
+    "half_life_seconds": 120,
+}
+MIN_SAMPLES = 2
+ERROR_PENALTY_MS = 5000.0
+
+
+def auto_settings(config):
+    settings = dict(DEFAULT_SETTINGS)
+    settings.update(config.get("auto", {}))
+    return settings
+
+
+def set_auto_enabled(config, enabled):
+    """Turn automatic selection on or off; returns True if the setting changed"""
+    if not enabled and "auto" not in config:
+        return False
+    auto = config.setdefault("auto", {})
+    changed = bool(auto.get("enabled")) != enabled
+    auto["enabled"] = enabled
+    return changed
+
+
+class DecayedScore:
+    """Exponentially time-decayed latency and error rate of one member"""
+
+    __slots__ = ("latency_ms", "error", "samples", "updated")
+
+    def __init__(self, latency_ms, error, now):
+        self.latency_ms = latency_ms
+        self.error = error
+        self.samples = 1
+        self.updated = now
+
+    def value(self):
+        return self.latency_ms + self.error * ERROR_PENALTY_MS
+
+
+class AutoScorer:
+    """Scores members and decides when a switch is worth it
+
+    Each observation moves the scores towards the new sample by a weight that
+    grows with the time since the last one (half-life decay), so irregular
+    probe intervals are handled. A failure raises the error rate instead of
+    touching the latency. Lower scores are better.
+    """
+
+    def __init__(self, half_life=DEFAULT_SETTINGS["half_life_seconds"]):
+        self.half_life = half_life
+        self.scores = {}
+
+    def update(self, name, latency_ms, now=None):
+        """Record one probe; latency_ms is None when the probe failed"""
+        now = time.time() if now is None else now
+        ok = latency_ms is not None
+        score = self.scores.get(name)
+        if score is None:
+            self.scores[name] = DecayedScore(
+                latency_ms if ok else ERROR_PENALTY_MS, 0.0 if ok else 1.0, now
+            )
+            return
+        alpha = 1 - 0.5 ** (max(now - score.updated, 0.0) / self.half_life)
+        if ok:
+            score.latency_ms += alpha * (latency_ms - score.latency_ms)
+            score.error -= alpha * score.error
+        else:
+            score.error += alpha * (1 - score.error)
+        score.samples += 1
+        score.updated = now
+
+    def score(self, name):
+        score = self.scores.get(name)
+        return None if score is None else score.value()
+
+    def forget(self, keep):
+        for name in list(self.scores):
+            if name not in keep:
+                del self.scores[name]
+
+    def choose(self, members, current, hysteresis):
+        """Member to switch to, or None to stay on current
+
+        Only members with MIN_SAMPLES observations compete. The current member
+        is replaced only when the best score beats it by the hysteresis
+        fraction, which keeps near-equal routes from flapping.
+        """
+        ready = [
+            name for name in members
+            if name in self.scores and self.scores[name].samples >= MIN_SAMPLES
+        ]
+        if not ready:
+            return None
+        best = min(ready, key=lambda name: self.scores[name].value())
+        if best == current:
+            return None
+        if current not in members or current not in self.scores:
+            return best
+        if self.scores[best].value() < self.scores[current].value() * (1 - hysteresis):
+            return best
+        return None
+
+
+class AutoSwitcher(QObject):
+    """Runs its own periodic probes of the group and asks the owner to switch"""
+
+    switch_requested = pyqtSignal(str, str)  # profile, reason
+    scores_updated = pyqtSignal()
+
+    def __init__(self, config_getter, store=None, parent=None):
+        super().__init__(parent)
+        self.config_getter = config_getter
+        self.store = store
+        self.scorer = AutoScorer()
+        self.probe_thread = None
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.probe_now)
+
+    def settings(self):
+        return auto_settings(self.config_getter())
+
+    def members(self):
+        models = self.config_getter()["models"]
+        return [name for name in self.settings()["members"] if name in models]
+
+    def is_enabled(self):
+        settings = self.settings()
+        return settings["enabled"] and len(self.members()) >= 2
+
+    def reconfigure(self):
+        """Apply config["auto"]; call after it changes"""
+        settings = self.settings()
+        self.scorer.half_life = max(1.0, float(settings["half_life_seconds"]))
+        self.scorer.forget(set(self.members()))
+        if self.is_enabled():
+            self.timer.start(int(max(5, settings["interval_seconds"]) * 1000))
+            self.probe_now()
+        else:
+            self.timer.stop()
+
+    def probe_now(self):
+        if self.probe_thread and self.probe_thread.isRunning():
+            return
+        # 探测模块（asyncio、http_client）在第一次探测时才导入，不拖慢启动
+        from health_probe import HealthProbeThread, profile_urls
+
+        profiles = profile_urls(self.config_getter(), self.members())
+        if not profiles:
+            return
+        self.probe_thread = HealthProbeThread(profiles, self.store, parent=self)
+        self.probe_thread.results_ready.connect(self.on_results)
+        self.probe_thread.start()
+
+    def on_results(self, results):
+        from health_probe import ProbeResult
+
+        for result in results:
+            ok = result.status == ProbeResult.UP
+            self.scorer.update(result.profile, result.timings.get("ttfb_ms") if ok else None)
+        self.scores_updated.emit()
+        if not self.is_enabled():
+            return
+        config = self.config_getter()
+        current = config.get("active")
+        choice = self.scorer.choose(self.members(), current, self.settings()["hysteresis"])
+        if choice:
+            before = self.scorer.score(current)
+            after = self.scorer.score(choice)
+            reason = f"{after:.0f} ms" if before is None else f"{before:.0f} ms → {after:.0f} ms"
+            self.switch_requested.emit(choice, reason)
+
+    def describe(self):
+        """One line per member with its current score, best first"""
+        lines = []
+        ranked = sorted(
+            self.members(),
+            key=lambda n: float("inf") if n not in self.scorer.scores else self.scorer.score(n),
+        )
+        active = self.config_getter().get("active")
+        for name in ranked:
+            score = self.scorer.scores.get(name)
+            mark = " ← 当前" if name == active else ""
+            if score is None:
+                lines.append(f"{name}: 尚无数据{mark}")
+            else:
+                lines.append(
+                    f"{name}: 评分 {score.value():.0f}（延迟 {score.latency_ms:.0f} ms，"
+                    f"错误率 {score.error:.0%}，样本 {score.samples}）{mark}"
+                )
+        return lines
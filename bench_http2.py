@@ -0,0 +1,206 @@
+"""
+HTTP/2 benchmark for Claude Model Manager
+Compares the gateway's HTTP/1.1 pool and HTTP/2 transport against a local stub upstream
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import http2_client
+from http_client import AsyncHttpClient
+from usage_meter import _width
+
+H2_PREFACE = b"PRI * HTTP/2.0\r\n\r\nSM\r\n\r\n"
+REQUEST_BODY = json.dumps({
+    "model": "stub", "max_tokens": 64, "stream": True,
+    "messages": [{"role": "user", "content": "hello"}],
+}).encode()
+
+
+class StubUpstream:
+    """Streams a short SSE reply over HTTP/1.1 or h2c (prior knowledge) on one port
+
+    Each accepted connection first sleeps setup_ms, standing in for the TCP
+    and TLS handshakes a real upstream costs; that is the price the HTTP/1.1
+    pool pays once per concurrent stream and HTTP/2 once per connection.
+    """
+
+    def __init__(self, setup_ms=50, events=5, event_ms=10):
+        self.setup = setup_ms / 1000
+        self.events = events
+        self.event_gap = event_ms / 1000
+        self.connections = 0
+        self.server = None
+        self.port = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    def sse(self):
+        for i in range(self.events):
+            data = json.dumps({"type": "content_block_delta", "index": i})
+            yield f"event: content_block_delta\ndata: {data}\n\n".encode()
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        await asyncio.sleep(self.setup)
+        try:
+            preface = await reader.readexactly(len(H2_PREFACE))
+            if preface == H2_PREFACE:
+                await self.serve_h2(preface, reader, writer)
+            else:
+                await self.serve_http1(preface, reader, writer)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve_http1(self, buffered, reader, writer):
+        # buffered 是判断协议时已读出的字节，属于第一个请求
+        while True:
+            while b"\r\n\r\n" not in buffered:
+                buffered += await reader.readuntil(b"\r\n\r\n")
+            head, _, buffered = buffered.partition(b"\r\n\r\n")
+            length = 0
+            for line in head.split(b"\r\n")[1:]:
+                name, _, value = line.partition(b":")
+                if name.strip().lower() == b"content-length":
+                    length = int(value)
+            if len(buffered) < length:
+                buffered += await reader.readexactly(length - len(buffered))
+            buffered = buffered[length:]
+            writer.write(
+                b"HTTP/1.1 200 OK\r\ncontent-type: text/event-stream\r\n"
+                b"transfer-encoding: chunked\r\n\r\n"
+            )
+            for event in self.sse():
+                await asyncio.sleep(self.event_gap)
+                writer.write(b"%x\r\n%s\r\n" % (len(event), event))
+                await writer.drain()
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+
+    async def serve_h2(self, preface, reader, writer):
+        import h2.config
+        import h2.connection
+        import h2.events
+        import h2.exceptions
+
+        conn = h2.connection.H2Connection(h2.config.H2Configuration(client_side=False))
+        conn.initiate_connection()
+        tasks = set()
+
+        def flush():
+            data = conn.data_to_send()
+            if data:
+                writer.write(data)
+
+        async def respond(stream_id):
+            conn.send_headers(stream_id, [(":status", "200"), ("content-type", "text/event-stream")])
+            flush()
+            try:
+                for event in self.sse():
+                    await asyncio.sleep(self.event_gap)
+                    conn.send_data(stream_id, event)
+                    flush()
+                conn.end_stream(stream_id)
+            except h2.exceptions.StreamClosedError:
+                pass  # 客户端中途重置了这个流
+            flush()
+
+        data = preface
+        while data:
+            for event in conn.receive_data(data):
+                if isinstance(event, h2.events.StreamEnded):
+                    task = asyncio.ensure_future(respond(event.stream_id))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                elif isinstance(event, h2.events.DataReceived):
+                    conn.acknowledge_received_data(event.flow_controlled_length, event.stream_id)
+            flush()
+            await writer.drain()
+            data = await reader.read(65536)
+        for task in tasks:
+            task.cancel()
+
+
+async def run_client(client, url, requests, concurrency):
+    """Per-request milliseconds from send to the last SSE byte"""
+    latencies = []
+    gate = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with gate:
+            started = time.perf_counter()
+            response = await client.open(
+                "POST", url, {"content-type": "application/json"}, REQUEST_BODY, timeout=60
+            )
+            await response.read()
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return latencies, (time.perf_counter() - started) * 1000
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def bench(args):
+    rows = []
+    transports = [("HTTP/1.1", lambda: AsyncHttpClient(max_per_host=args.max_per_host))]
+    if http2_client.available():
+        transports.append((
+            f"HTTP/2（每连接 {args.max_streams} 流）",
+            lambda: http2_client.Http2Client(max_streams=args.max_streams, cleartext=True),
+        ))
+    else:
+        print("未安装 h2（pip install h2），只测试 HTTP/1.1")
+    for label, factory in transports:
+        stub = StubUpstream(args.setup_ms, args.events, args.event_ms)
+        await stub.start()
+        url = f"http://127.0.0.1:{stub.port}/v1/messages"
+        async with factory() as client:
+            latencies, total = await run_client(client, url, args.requests, args.concurrency)
+        await stub.close()
+        rows.append([
+            label, str(stub.connections),
+            f"{statistics.median(latencies):.1f}", f"{percentile(latencies, 99):.1f}",
+            f"{total:.0f}",
+        ])
+    table = [["传输方式", "上游连接数", "p50 (ms)", "p99 (ms)", "总耗时 (ms)"]] + rows
+    widths = [max(_width(row[col]) for row in table) for col in range(len(table[0]))]
+    for row in table:
+        cells = [
+            cell + " " * (width - _width(cell)) if col == 0 else " " * (width - _width(cell)) + cell
+            for col, (cell, width) in enumerate(zip(row, widths))
+        ]
+        print("  ".join(cells))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="比较网关上游的 HTTP/1.1 连接池与 HTTP/2 多路复用")
+    parser.add_argument("--requests", type=int, default=400, help="请求总数")
+    parser.add_argument("--concurrency", type=int, default=200, help="同时进行的请求数")
+    parser.add_argument("--max-streams", type=int, default=http2_client.DEFAULT_MAX_STREAMS,
+                        help="HTTP/2 每个连接的最大并发流数")
+    parser.add_argument("--max-per-host", type=int, default=64, help="HTTP/1.1 每个主机的最大连接数")
+    parser.add_argument("--setup-ms", type=float, default=50, help="模拟每个新连接的握手耗时")
+    parser.add_argument("--events", type=int, default=5, help="每个响应的 SSE 事件数")
+    parser.add_argument("--event-ms", type=float, default=10, help="SSE 事件之间的间隔")
+    args = parser.parse_args(argv)
+    asyncio.run(bench(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+Sticky routing benchmark for Claude Model Manager
+Measures the prompt-cache hit rate of multi-turn conversations through the gateway's load balancer
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+
+import gateway
+from http_client import AsyncHttpClient, HttpError, SseParser, header_dict, iter_body, read_head
+from usage_meter import _width
+
+BYTES_PER_TOKEN = 4
+
+
+class PromptCacheStub:
+    """Anthropic-like upstream that keeps a separate prompt cache per credential
+
+    A request reads from the cache the longest prefix of [system, *messages]
+    that an earlier request with the same token already sent, and writes the
+    rest, like a cache breakpoint on the last message. Usage is reported in
+    message_start the way the real API does.
+    """
+
+    def __init__(self):
+        self.caches = {}  # token → 已缓存的前缀哈希
+        self.requests = {}
+        self.server = None
+        self.port = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    def usage(self, token, payload):
+        cache = self.caches.setdefault(token, set())
+        self.requests[token] = self.requests.get(token, 0) + 1
+        blocks = [payload.get("system")] + payload["messages"]
+        digest = hashlib.sha256()
+        cached = total = 0
+        for block in blocks:
+            data = json.dumps(block, sort_keys=True).encode()
+            digest.update(data)
+            total += len(data) // BYTES_PER_TOKEN
+            # 哈希是累积的：命中意味着到这里为止的整个前缀都已缓存
+            prefix = digest.hexdigest()
+            if prefix in cache:
+                cached = total
+            cache.add(prefix)
+        return {
+            "input_tokens": 0, "output_tokens": 1,
+            "cache_read_input_tokens": cached, "cache_creation_input_tokens": total - cached,
+        }
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                _, raw_headers = await read_head(reader)
+                headers = header_dict(raw_headers)
+                body = b"".join([c async for c in iter_body(reader, headers, read_to_eof=False)])
+                token = headers.get("authorization", "")[7:]
+                usage = self.usage(token, json.loads(body))
+                await asyncio.sleep(0.005)
+                start = {"type": "message_start", "message": {"model": "stub", "usage": usage}}
+                events = (
+                    f"event: message_start\ndata: {json.dumps(start)}\n\n"
+                    "event: message_stop\ndata: {\"type\": \"message_stop\"}\n\n"
+                ).encode()
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\ncontent-type: text/event-stream\r\n"
+                    b"content-length: %d\r\n\r\n%s" % (len(events), events)
+                )
+                await writer.drain()
+        except (HttpError, asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+
+
+def conversation(number, turns, system):
+    """Request payloads for each turn of one conversation"""
+    messages = []
+    for turn in range(turns):
+        filler = " ".join(f"c{number}t{turn}w{i}" for i in range(400))
+        messages.append({"role": "user", "content": f"第 {turn + 1} 个问题 {filler}"})
+        yield {
+            "model": "stub", "max_tokens": 16, "stream": True, "system": system,
+            "messages": list(messages),
+        }
+        messages.append({"role": "assistant", "content": f"第 {turn + 1} 个回答 {filler}"})
+
+
+async def run(sticky, args):
+    stub = PromptCacheStub()
+    await stub.start()
+    url = f"http://127.0.0.1:{stub.port}"
+    config = {
+        "active": "bench",
+        "models": {"bench": {"ANTHROPIC_AUTH_TOKEN": "key-1", "ANTHROPIC_BASE_URL": url}},
+        "gateway": {
+            "pools": {"bench": [
+                {"ANTHROPIC_AUTH_TOKEN": f"key-{n}"} for n in range(2, args.members + 1)
+            ]},
+            "sticky_routing": sticky, "usage_metering": False, "rate_limiting": False,
+        },
+    }
+    gw = gateway.Gateway("bench", port=0)
+    gw.set_route(gateway.Route.from_config(config))
+    gw.apply_settings(gateway.gateway_settings(config))
+    await gw.start()
+    system = "你是一个编程助手。" + " ".join(f"rule{i}" for i in range(args.system_words))
+    totals = {"read": 0, "prompt": 0, "ok": 0}
+    # 固定种子，两种路由方式面对同样的请求节奏
+    pauses = random.Random(7)
+
+    async def talk(client, number):
+        for payload in conversation(number, args.turns, system):
+            # 用户思考时间各不相同，各会话的轮次不会同步
+            await asyncio.sleep(pauses.uniform(0, args.think_ms / 1000))
+            response, data = await client.request(
+                "POST", f"http://127.0.0.1:{gw.port}/v1/messages",
+                {"Authorization": "Bearer bench"}, json.dumps(payload).encode(), timeout=30,
+            )
+            if response.status != 200:
+                continue
+            totals["ok"] += 1
+            for event, body in SseParser().feed(data):
+                if event == "message_start":
+                    usage = json.loads(body)["message"]["usage"]
+                    totals["read"] += usage["cache_read_input_tokens"]
+                    totals["prompt"] += (
+                        usage["cache_read_input_tokens"] + usage["cache_creation_input_tokens"]
+                    )
+
+    async with AsyncHttpClient(max_per_host=args.conversations) as client:
+        await asyncio.gather(*(talk(client, n) for n in range(args.conversations)))
+    snapshot = gw.snapshot()
+    await gw.close()
+    await stub.close()
+    spread = "/".join(str(stub.requests.get(f"key-{n}", 0)) for n in range(1, args.members + 1))
+    return [
+        "会话粘滞" if sticky else "最少在途",
+        f"{totals['read'] / totals['prompt']:.1%}" if totals["prompt"] else "-",
+        spread, str(snapshot["sticky_moved"]), str(totals["ok"]),
+    ]
+
+
+async def bench(args):
+    table = [["路由方式", "缓存读取占比", "各凭证请求数", "改派", "成功请求"]]
+    for sticky in (False, True):
+        table.append(await run(sticky, args))
+    widths = [max(_width(row[col]) for row in table) for col in range(len(table[0]))]
+    for row in table:
+        cells = [
+            cell + " " * (width - _width(cell)) if col == 0 else " " * (width - _width(cell)) + cell
+            for col, (cell, width) in enumerate(zip(row, widths))
+        ]
+        print("  ".join(cells))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="比较有无会话粘滞时上游提示缓存的命中情况")
+    parser.add_argument("--members", type=int, default=3, help="同一模型配置下的凭证数")
+    parser.add_argument("--conversations", type=int, default=24, help="同时进行的会话数")
+    parser.add_argument("--turns", type=int, default=6, help="每个会话的轮数")
+    parser.add_argument("--think-ms", type=float, default=50, help="每轮之前的最长随机等待")
+    parser.add_argument("--system-words", type=int, default=2000, help="系统提示的长度（词数）")
+    args = parser.parse_args(argv)
+    asyncio.run(bench(args))
+
+
+if __name__ == "__main__":
+    main()
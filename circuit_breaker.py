@@ -0,0 +1,137 @@
+"""
+Circuit breaker for Claude Model Manager
+Tracks an upstream's recent failures and stops sending it traffic while it is unhealthy
+"""
+
+import time
+from collections import deque
+
+WINDOW_SECONDS = 60.0
+MIN_REQUESTS = 5
+ERROR_RATE = 0.5
+CONSECUTIVE_FAILURES = 3
+OPEN_SECONDS = 30.0
+MAX_OPEN_SECONDS = 300.0
+
+
+class CircuitBreaker:
+    """Closed → open → half-open state machine for one upstream
+
+    Outcomes inside a sliding time window are counted. The breaker opens
+    when the error rate over at least MIN_REQUESTS reaches ERROR_RATE, or
+    after CONSECUTIVE_FAILURES failures in a row (a dead host times out
+    slowly, so waiting for a rate would take minutes). After the open period
+    one trial request is let through (half-open); success closes the
+    breaker, failure re-opens it with a doubled open period.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, window=WINDOW_SECONDS, min_requests=MIN_REQUESTS, error_rate=ERROR_RATE,
+                 consecutive=CONSECUTIVE_FAILURES, open_seconds=OPEN_SECONDS, clock=time.monotonic):
+        self.window = window
+        self.min_requests = min_requests
+        self.error_rate = error_rate
+        self.consecutive = consecutive
+        self.base_open_seconds = open_seconds
+        self.clock = clock
+        self.state = self.CLOSED
+        self.open_seconds = open_seconds
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.failures_in_row = 0
+        self.last_error = None
+        self._outcomes = deque()  # (time, ok)
+
+    def available(self):
+        """Like allow() but without claiming the half-open trial"""
+        if self.state == self.OPEN:
+            return self.clock() - self.opened_at >= self.open_seconds
+        if self.state == self.HALF_OPEN:
+            return not self.trial_in_flight
+        return True
+
+    def allow(self):
+        """Whether a request may be sent now; a half-open breaker admits one trial"""
+        if self.state == self.OPEN:
+            if self.clock() - self.opened_at < self.open_seconds:
+                return False
+            self.state = self.HALF_OPEN
+            self.trial_in_flight = False
+        if self.state == self.HALF_OPEN:
+            if self.trial_in_flight:
+                return False
+            self.trial_in_flight = True
+        return True
+
+    def record_success(self):
+        if self.state == self.HALF_OPEN:
+            self._close()
+        self.failures_in_row = 0
+        self._add(True)
+
+    def record_failure(self, error=None):
+        self.last_error = error
+        self.failures_in_row += 1
+        if self.state == self.HALF_OPEN:
+            self._open(self.open_seconds * 2)
+            return
+        self._add(False)
+        if self.state == self.CLOSED and self._should_open():
+            self._open(self.base_open_seconds)
+
+    def release_trial(self):
+        """The trial request ended without a verdict (e.g. the client went away)"""
+        if self.state == self.HALF_OPEN:
+            self.trial_in_flight = False
+
+    def error_ratio(self):
+        self._expire()
+        if not self._outcomes:
+            return 0.0
+        return sum(1 for _, ok in self._outcomes if not ok) / len(self._outcomes)
+
+    def retry_in(self):
+        """Seconds until an open breaker lets a trial through"""
+        if self.state != self.OPEN:
+            return 0.0
+        return max(0.0, self.open_seconds - (self.clock() - self.opened_at))
+
+    def to_dict(self):
+        return {
+            "state": self.state,
+            "error_rate": round(self.error_ratio(), 3),
+            "requests": len(self._outcomes),
+            "retry_in": round(self.retry_in(), 1),
+            "last_error": self.last_error,
+        }
+
+    # --- 内部实现 ---
+    def _add(self, ok):
+        self._outcomes.append((self.clock(), ok))
+        self._expire()
+
+    def _expire(self):
+        horizon = self.clock() - self.window
+        while self._outcomes and self._outcomes[0][0] < horizon:
+            self._outcomes.popleft()
+
+    def _should_open(self):
+        if self.failures_in_row >= self.consecutive:
+            return True
+        return len(self._outcomes) >= self.min_requests and self.error_ratio() >= self.error_rate
+
+    def _open(self, seconds):
+        self.state = self.OPEN
+        self.open_seconds = min(seconds, MAX_OPEN_SECONDS)
+        self.opened_at = self.clock()
+        self.trial_in_flight = False
+
+    def _close(self):
+        self.state = self.CLOSED
+        self.open_seconds = self.base_open_seconds
+        self.opened_at = None
+        self.trial_in_flight = False
+        self._outcomes.clear()
@@ -0,0 +1,109 @@
+"""
+Request coalescing for Claude Model Manager
+Lets identical in-flight gateway requests share one upstream response
+"""
+
+import asyncio
+import itertools
+
+# 已缓冲的响应超过此大小后不再接纳新的跟随者
+MAX_JOIN_BYTES = 8 * 1024 * 1024
+
+
+class Flight:
+    """One upstream response shared by the leader request and its followers
+
+    A separate task reads the upstream and feed()s every chunk into a shared
+    buffer. The leader and each follower attach() as readers with their own
+    cursor and write at their own pace, so a slow client only delays itself;
+    a follower that joins mid-stream starts from the first chunk. Once no
+    one can join any more, chunks every cursor has passed are dropped.
+    """
+
+    PENDING = "pending"
+    STREAMING = "streaming"
+    DONE = "done"
+    ABORTED = "aborted"  # 响应中途中断
+    FAILED = "failed"  # 领头请求没有得到可共享的响应
+
+    def __init__(self, key):
+        self.key = key
+        self.state = self.PENDING
+        self.status = None
+        self.reason = ""
+        self.raw_headers = []
+        self.has_body = True
+        self.chunks = []
+        self.offset = 0  # chunks[0] 的序号；之前的块已被所有读者读过并丢弃
+        self.size = 0
+        self.cursors = {}  # 读者 → 下一个要读的块的序号
+        self._ids = itertools.count()
+        self._changed = asyncio.Event()
+
+    def joinable(self):
+        return self.state in (self.PENDING, self.STREAMING) and self.size <= MAX_JOIN_BYTES
+
+    def ended(self):
+        return self.state in (self.DONE, self.ABORTED, self.FAILED)
+
+    # --- 上游读取 ---
+    def start(self, response):
+        self.status = response.status
+        self.reason = response.reason
+        self.raw_headers = response.raw_headers
+        self.has_body = response.has_body
+        self.state = self.STREAMING
+        self._notify()
+
+    def feed(self, chunk):
+        self.chunks.append(chunk)
+        self.size += len(chunk)
+        self._trim()
+        self._notify()
+
+    def finish(self, ok=True):
+        if self.state == self.STREAMING:
+            self.state = self.DONE if ok else self.ABORTED
+        elif self.state == self.PENDING:
+            self.state = self.FAILED
+        self._notify()
+
+    # --- 读者 ---
+    def attach(self):
+        """Register a reader starting at the first chunk; only valid while joinable()"""
+        reader = next(self._ids)
+        self.cursors[reader] = 0
+        return reader
+
+    def detach(self, reader):
+        self.cursors.pop(reader, None)
+        self._trim()
+
+    async def wait_head(self):
+        """True once the response head is known, False if the leader got none to share"""
+        while self.state == self.PENDING:
+            await self._changed.wait()
+        return self.state != self.FAILED
+
+    async def read(self, reader):
+        """The reader's next chunks, waiting for more; [] means the response has ended"""
+        while self.cursors[reader] >= self.offset + len(self.chunks) and not self.ended():
+            await self._changed.wait()
+        chunks = self.chunks[self.cursors[reader] - self.offset:]
+        self.cursors[reader] = self.offset + len(self.chunks)
+        self._trim()
+        return chunks
+
+    def _trim(self):
+        # 还可能有新读者从头加入时必须保留全部缓冲
+        if self.joinable():
+            return
+        low = min(self.cursors.values(), default=self.offset + len(self.chunks))
+        if low > self.offset:
+            del self.chunks[:low - self.offset]
+            self.offset = low
+
+    def _notify(self):
+        # 唤醒所有等待者，并换一个新的 Event 供下一轮等待
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
@@ -0,0 +1,330 @@
+"""
+Fan-out comparison for Claude Model Manager
+Sends one streamed Messages request to several profiles at once and times each response
+"""
+
+import asyncio
+import json
+import time
+import unicodedata
+
+from PyQt6.QtCore import QThread, pyqtSignal
+
+from credentials import ANTHROPIC_VERSION, messages_url
+from http_client import AsyncHttpClient, HttpError, SseParser
+from tracing import tracer
+
+DEFAULT_MODEL = "claude-sonnet-4-20250514"
+DEFAULT_MAX_TOKENS = 512
+HEAD_TIMEOUT = 30.0
+TOTAL_TIMEOUT = 300.0
+
+
+class CompareResult:
+    """Timings and output of one profile's streamed response"""
+
+    def __init__(self, profile, model):
+        self.profile = profile
+        self.model = model
+        self.http_status = None
+        self.ttft_ms = None
+        self.total_ms = None
+        self.input_tokens = None
+        self.output_tokens = None
+        # 网关未返回 usage 时按文本增量事件数估算
+        self.tokens_estimated = False
+        self.text = ""
+        self.stop_reason = None
+        self.error = None
+
+    def tokens_per_second(self):
+        """Output rate after the first token, which excludes queueing and prefill"""
+        if not self.output_tokens or self.ttft_ms is None or self.total_ms is None:
+            return None
+        generating = (self.total_ms - self.ttft_ms) / 1000
+        return self.output_tokens / generating if generating > 0 else None
+
+    def metrics(self):
+        """[(label, text)] for tables; missing values are shown as "-" """
+        rate = self.tokens_per_second()
+        tokens = "-" if self.output_tokens is None else str(self.output_tokens)
+        if self.tokens_estimated and self.output_tokens is not None:
+            tokens = "≈" + tokens
+        return [
+            ("模型", self.model),
+            ("状态", self.error or f"HTTP {self.http_status}"),
+            ("首 token", "-" if self.ttft_ms is None else f"{self.ttft_ms:.0f} ms"),
+            ("总耗时", "-" if self.total_ms is None else f"{self.total_ms:.0f} ms"),
+            ("输出 tokens", tokens),
+            ("tokens/s", "-" if rate is None else f"{rate:.1f}"),
+        ]
+
+
+def request_body(model, prompt, max_tokens):
+    return json.dumps(
+        {
+            "model": model,
+            "max_tokens": max_tokens,
+            "stream": True,
+            "messages": [{"role": "user", "content": prompt}],
+        }
+    ).encode("utf-8")
+
+
+def apply_event(result, event, data):
+    """Fold one SSE event into result; returns the text delta, if any"""
+    if event == "ping" or not data:
+        return ""
+    try:
+        payload = json.loads(data)
+    except ValueError:
+        return ""
+    kind = payload.get("type", event)
+    if kind == "message_start":
+        usage = payload.get("message", {}).get("usage", {})
+        result.input_tokens = usage.get("input_tokens")
+    elif kind == "content_block_delta":
+        text = payload.get("delta", {}).get("text", "")
+        if text:
+            result.text += text
+            if result.output_tokens is None or result.tokens_estimated:
+                result.output_tokens = (result.output_tokens or 0) + 1
+                result.tokens_estimated = True
+        return text
+    elif kind == "message_delta":
+        usage = payload.get("usage", {})
+        if usage.get("output_tokens") is not None:
+            result.output_tokens = usage["output_tokens"]
+            result.tokens_estimated = False
+        result.stop_reason = payload.get("delta", {}).get("stop_reason")
+    elif kind == "error":
+        result.error = payload.get("error", {}).get("message") or "error"
+    return ""
+
+
+async def stream_one(client, name, model_data, prompt, max_tokens=DEFAULT_MAX_TOKENS,
+                     model=None, on_delta=None, head_timeout=HEAD_TIMEOUT):
+    """Stream one response; on_delta(name, text) is called for every text delta"""
+    model = model or model_data.get("ANTHROPIC_MODEL") or DEFAULT_MODEL
+    result = CompareResult(name, model)
+    headers = {
+        "Authorization": f"Bearer {model_data['ANTHROPIC_AUTH_TOKEN']}",
+        "anthropic-version": ANTHROPIC_VERSION,
+        "Content-Type": "application/json",
+        "Accept": "text/event-stream",
+    }
+    started = time.perf_counter()
+    try:
+        response = await client.open(
+            "POST", messages_url(model_data["ANTHROPIC_BASE_URL"]), headers,
+            request_body(model, prompt, max_tokens), head_timeout,
+        )
+    except (HttpError, OSError, ValueError) as e:
+        result.error = str(e) or type(e).__name__
+        result.total_ms = (time.perf_counter() - started) * 1000
+        return result
+    result.http_status = response.status
+    try:
+        if response.status != 200:
+            data = await response.read()
+            try:
+                result.error = json.loads(data)["error"]["message"]
+            except (ValueError, KeyError, TypeError):
+                result.error = f"HTTP {response.status}: " + data[:120].decode("utf-8", "replace")
+            return result
+        parser = SseParser()
+        async for chunk in response.iter_chunks():
+            for event, data in parser.feed(chunk):
+                text = apply_event(result, event, data)
+                if text:
+                    if result.ttft_ms is None:
+                        result.ttft_ms = (time.perf_counter() - started) * 1000
+                    if on_delta:
+                        on_delta(name, text)
+    except (HttpError, OSError, asyncio.IncompleteReadError) as e:
+        result.error = str(e) or type(e).__name__
+    finally:
+        response.release()
+        result.total_ms = (time.perf_counter() - started) * 1000
+    return result
+
+
+async def compare(models, prompt, max_tokens=DEFAULT_MAX_TOKENS, model=None, on_delta=None,
+                  on_result=None, timeout=TOTAL_TIMEOUT, client=None):
+    """Send prompt to every {name: model_data} concurrently; returns results in input order"""
+    own_client = client is None
+    client = client or AsyncHttpClient()
+
+    async def run(name):
+        try:
+            result = await asyncio.wait_for(
+                stream_one(client, name, models[name], prompt, max_tokens, model, on_delta),
+                timeout,
+            )
+        except asyncio.TimeoutError:
+            result = CompareResult(name, model or models[name].get("ANTHROPIC_MODEL") or DEFAULT_MODEL)
+            result.error = f"超时（{timeout:g} 秒）"
+        if on_result:
+            on_result(result)
+        return result
+
+    try:
+        return await asyncio.gather(*(run(name) for name in models))
+    finally:
+        if own_client:
+            await client.close()
+
+
+class CompareThread(QThread):
+    """Runs one comparison on a private event loop and streams progress back"""
+
+    delta = pyqtSignal(str, str)  # profile, text
+    result_ready = pyqtSignal(object)
+    finished_all = pyqtSignal(list)
+
+    def __init__(self, models, prompt, max_tokens=DEFAULT_MAX_TOKENS, model=None, parent=None):
+        super().__init__(parent)
+        self.models = models
+        self.prompt = prompt
+        self.max_tokens = max_tokens
+        self.model = model
+
+    def run(self):
+        with tracer.span("compare", profiles=len(self.models)):
+            results = asyncio.run(
+                compare(
+                    self.models, self.prompt, self.max_tokens, self.model,
+                    on_delta=self.delta.emit, on_result=self.result_ready.emit,
+                )
+            )
+        self.finished_all.emit(results)
+
+
+# --- 命令行：对比已配置的模型，或对本地桩上游测试 ---
+async def _stub_upstream(first_token_delay, token_delay, tokens):
+    """Minimal Messages API that streams `tokens` words as SSE"""
+
+    def sse(event, payload):
+        return f"event: {event}\ndata: {json.dumps(payload)}\n\n".encode("utf-8")
+
+    async def handle(reader, writer):
+        from http_client import header_dict, iter_body, read_head
+
+        try:
+            while True:
+                try:
+                    _, raw_headers = await read_head(reader)
+                except HttpError:
+                    break
+                headers = header_dict(raw_headers)
+                async for _ in iter_body(reader, headers, read_to_eof=False):
+                    pass
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+                    b"Transfer-Encoding: chunked\r\n\r\n"
+                )
+
+                async def send(data):
+                    writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+                    await writer.drain()
+
+                await send(sse("message_start", {
+                    "type": "message_start",
+                    "message": {"usage": {"input_tokens": 12, "output_tokens": 1}},
+                }))
+                await asyncio.sleep(first_token_delay)
+                for i in range(tokens):
+                    if i:
+                        await asyncio.sleep(token_delay)
+                    await send(sse("content_block_delta", {
+                        "type": "content_block_delta", "index": 0,
+                        "delta": {"type": "text_delta", "text": f"word{i} "},
+                    }))
+                await send(sse("message_delta", {
+                    "type": "message_delta", "delta": {"stop_reason": "end_turn"},
+                    "usage": {"output_tokens": tokens},
+                }))
+                await send(sse("message_stop", {"type": "message_stop"}))
+                writer.write(b"0\r\n\r\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, "127.0.0.1", 0)
+
+
+async def _run_stub(count, prompt, max_tokens):
+    # 各桩上游的首 token 延迟与生成速度不同，便于检验对比结果
+    servers = [
+        await _stub_upstream(0.05 * (i + 1), 0.01 * (i + 1), 20) for i in range(count)
+    ]
+    models = {
+        f"stub-{i}": {
+            "ANTHROPIC_AUTH_TOKEN": "stub",
+            "ANTHROPIC_BASE_URL": f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}",
+        }
+        for i, server in enumerate(servers)
+    }
+    try:
+        return await compare(models, prompt, max_tokens)
+    finally:
+        for server in servers:
+            server.close()
+            await server.wait_closed()
+
+
+def _width(text):
+    # 中文等宽字符在终端中占两列
+    return sum(2 if unicodedata.east_asian_width(ch) in "WF" else 1 for ch in text)
+
+
+def format_table(results):
+    """Metrics side by side, one column per profile"""
+    labels = [label for label, _ in results[0].metrics()]
+    rows = [["", *[r.profile for r in results]]]
+    for i, label in enumerate(labels):
+        rows.append([label, *[r.metrics()[i][1] for r in results]])
+    widths = [max(_width(row[col]) for row in rows) for col in range(len(rows[0]))]
+    return "\n".join(
+        "  ".join(cell + " " * (width - _width(cell)) for cell, width in zip(row, widths)).rstrip()
+        for row in rows
+    )
+
+
+def main(argv=None):
+    import argparse
+    from pathlib import Path
+
+    parser = argparse.ArgumentParser(description="同时向多个模型配置发送同一提示并对比响应")
+    parser.add_argument("names", nargs="*", metavar="NAME", help="要对比的模型配置")
+    parser.add_argument("-p", "--prompt", default="用一句话介绍你自己。", help="提示内容")
+    parser.add_argument("--model", help="覆盖各配置的 ANTHROPIC_MODEL")
+    parser.add_argument("--max-tokens", type=int, default=DEFAULT_MAX_TOKENS)
+    parser.add_argument("--stub", type=int, metavar="N", help="对 N 个本地桩上游进行对比")
+    args = parser.parse_args(argv)
+
+    if args.stub:
+        results = asyncio.run(_run_stub(args.stub, args.prompt, args.max_tokens))
+    else:
+        config_file = Path.home() / ".claude-cli" / "config.json"
+        with open(config_file) as f:
+            all_models = json.load(f).get("models", {})
+        unknown = [name for name in args.names if name not in all_models]
+        if unknown:
+            parser.error(f"未找到模型配置: {', '.join(unknown)}")
+        if len(args.names) < 1:
+            parser.error("请至少指定一个模型配置")
+        results = asyncio.run(
+            compare({name: all_models[name] for name in args.names}, args.prompt,
+                    args.max_tokens, args.model)
+        )
+    print(format_table(results))
+    for result in results:
+        print(f"\n=== {result.profile} ===")
+        print(result.text.strip() or result.error or "(无输出)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""
+Comparison dialog for Claude Model Manager
+Streams one prompt to the checked profiles side by side with TTFT, tokens/s and total latency
+"""
+
+from PyQt6.QtCore import Qt, QTimer
+from PyQt6.QtGui import QTextCursor
+from PyQt6.QtWidgets import (
+    QDialog,
+    QFormLayout,
+    QGroupBox,
+    QHBoxLayout,
+    QLabel,
+    QLineEdit,
+    QListWidget,
+    QListWidgetItem,
+    QPlainTextEdit,
+    QPushButton,
+    QScrollArea,
+    QSpinBox,
+    QVBoxLayout,
+    QWidget,
+)
+
+from compare import DEFAULT_MAX_TOKENS, CompareResult, CompareThread
+
+
+class ResultColumn(QGroupBox):
+    """Metrics and streamed output of one profile"""
+
+    COLUMN_WIDTH = 320
+
+    def __init__(self, profile, parent=None):
+        super().__init__(profile, parent)
+        self.setMinimumWidth(self.COLUMN_WIDTH)
+        layout = QVBoxLayout(self)
+        self.metrics = QFormLayout()
+        self.values = {}
+        layout.addLayout(self.metrics)
+        self.output = QPlainTextEdit()
+        self.output.setReadOnly(True)
+        layout.addWidget(self.output, 1)
+        for label, _ in CompareResult(profile, "").metrics():
+            self._set_value(label, "-")
+        self.set_state("等待响应...")
+
+    def set_state(self, text):
+        self._set_value("状态", text)
+
+    def append(self, text):
+        cursor = self.output.textCursor()
+        cursor.movePosition(QTextCursor.MoveOperation.End)
+        cursor.insertText(text)
+        self.output.setTextCursor(cursor)
+
+    def show_result(self, result):
+        for label, value in result.metrics():
+            self._set_value(label, value)
+        if not result.text and result.error:
+            self.output.setPlainText(result.error)
+
+    def _set_value(self, label, text):
+        value = self.values.get(label)
+        if value is None:
+            value = self.values[label] = QLabel()
+            value.setTextInteractionFlags(Qt.TextInteractionFlag.TextSelectableByMouse)
+            self.metrics.addRow(f"{label}:", value)
+        value.setText(text)
+
+
+class CompareDialog(QDialog):
+    """Sends one prompt to several profiles concurrently and shows the streams side by side"""
+
+    FLUSH_MS = 50
+
+    def __init__(self, config_getter, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("对比模型")
+        self.resize(1000, 640)
+        self.config_getter = config_getter
+        self.thread = None
+        self.columns = {}
+        # 文本增量先缓存，定时批量写入，避免每个 token 都触发一次重绘
+        self.pending = {}
+
+        layout = QVBoxLayout(self)
+        top = QHBoxLayout()
+        self.profile_list = QListWidget()
+        self.profile_list.setMaximumWidth(260)
+        top.addWidget(self.profile_list)
+
+        form = QFormLayout()
+        self.prompt_edit = QPlainTextEdit("用一句话介绍你自己。")
+        self.prompt_edit.setMaximumHeight(110)
+        self.model_edit = QLineEdit()
+        self.model_edit.setPlaceholderText("留空则使用各配置的 ANTHROPIC_MODEL")
+        self.max_tokens_spin = QSpinBox()
+        self.max_tokens_spin.setRange(1, 64000)
+        self.max_tokens_spin.setValue(DEFAULT_MAX_TOKENS)
+        self.run_button = QPushButton("开始对比")
+        self.run_button.clicked.connect(self.start)
+        form.addRow("提示:", self.prompt_edit)
+        form.addRow("模型 ID:", self.model_edit)
+        form.addRow("max_tokens:", self.max_tokens_spin)
+        form.addRow(self.run_button)
+        top.addLayout(form, 1)
+        layout.addLayout(top)
+
+        self.results_widget = QWidget()
+        self.results_layout = QHBoxLayout(self.results_widget)
+        scroll = QScrollArea()
+        scroll.setWidgetResizable(True)
+        scroll.setWidget(self.results_widget)
+        layout.addWidget(scroll, 1)
+        self.status_label = QLabel("勾选要对比的模型配置，然后点击“开始对比”")
+        layout.addWidget(self.status_label)
+
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setInterval(self.FLUSH_MS)
+        self.flush_timer.timeout.connect(self.flush)
+
+    def set_profiles(self, names, checked=()):
+        """Fill the profile checklist, keeping earlier choices"""
+        previous = set(self.checked_profiles()) or set(checked)
+        self.profile_list.clear()
+        for name in names:
+            item = QListWidgetItem(name)
+            item.setFlags(item.flags() | Qt.ItemFlag.ItemIsUserCheckable)
+            item.setCheckState(
+                Qt.CheckState.Checked if name in previous else Qt.CheckState.Unchecked
+            )
+            self.profile_list.addItem(item)
+
+    def checked_profiles(self):
+        return [
+            self.profile_list.item(row).text()
+            for row in range(self.profile_list.count())
+            if self.profile_list.item(row).checkState() == Qt.CheckState.Checked
+        ]
+
+    def start(self):
+        if self.thread and self.thread.isRunning():
+            return
+        models = self.config_getter()["models"]
+        names = [name for name in self.checked_profiles() if name in models]
+        prompt = self.prompt_edit.toPlainText().strip()
+        if not names or not prompt:
+            self.status_label.setText("请至少勾选一个模型配置并填写提示")
+            return
+        for column in self.columns.values():
+            column.deleteLater()
+        self.columns = {}
+        self.pending = {}
+        for name in names:
+            column = self.columns[name] = ResultColumn(name)
+            self.results_layout.addWidget(column)
+
+        self.thread = CompareThread(
+            {name: dict(models[name]) for name in names},
+            prompt,
+            self.max_tokens_spin.value(),
+            self.model_edit.text().strip() or None,
+            parent=self,
+        )
+        self.thread.delta.connect(self.on_delta)
+        self.thread.result_ready.connect(self.on_result)
+        self.thread.finished_all.connect(self.on_finished)
+        self.run_button.setEnabled(False)
+        self.status_label.setText(f"正在同时请求 {len(names)} 个模型配置...")
+        self.flush_timer.start()
+        self.thread.start()
+
+    def on_delta(self, profile, text):
+        if profile not in self.pending:
+            self.pending[profile] = []
+            column = self.columns.get(profile)
+            if column:
+                column.set_state("生成中...")
+        self.pending[profile].append(text)
+
+    def flush(self):
+        for profile, parts in self.pending.items():
+            column = self.columns.get(profile)
+            if column and parts:
+                column.append("".join(parts))
+                parts.clear()
+
+    def on_result(self, result):
+        self.flush()
+        column = self.columns.get(result.profile)
+        if column:
+            column.show_result(result)
+
+    def on_finished(self, results):
+        self.flush()
+        self.flush_timer.stop()
+        self.run_button.setEnabled(True)
+        done = [r for r in results if not r.error]
+        if done:
+            fastest = min(done, key=lambda r: r.ttft_ms if r.ttft_ms is not None else float("inf"))
+            self.status_label.setText(
+                f"完成：{len(done)}/{len(results)} 个成功，首 token 最快的是 {fastest.profile}"
+            )
+        else:
+            self.status_label.setText("完成：全部请求失败")
@@ -0,0 +1,212 @@
+"""
+Credential validation for Claude Model Manager
+Checks each ANTHROPIC_AUTH_TOKEN with one minimal API call, cached by SHA-256 of token and host
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from PyQt6.QtCore import QThread, pyqtSignal
+
+from http_client import AsyncHttpClient, HttpError
+from tracing import tracer
+
+CACHE_FILE = Path.home() / ".claude-cli" / "credential_cache.json"
+MAX_CONCURRENCY = 16
+TIMEOUT = 20.0
+ANTHROPIC_VERSION = "2023-06-01"
+# 只用于触发鉴权；模型不存在（400）同样说明凭证已通过校验
+DEFAULT_MODEL = "claude-3-5-haiku-latest"
+
+VALID = "valid"
+INVALID = "invalid"
+UNKNOWN = "unknown"
+
+# 无效凭证缓存时间较短，服务端修复后能尽快重新校验；无法判断的结果不缓存
+TTL_SECONDS = {VALID: 12 * 3600, INVALID: 3600}
+
+
+def credential_key(token, base_url):
+    """Cache key: SHA-256 of token and host, so the token itself is never stored"""
+    host = urlsplit(base_url).netloc.lower()
+    return hashlib.sha256(f"{token}\0{host}".encode("utf-8")).hexdigest()
+
+
+def messages_url(base_url):
+    return base_url.rstrip("/") + "/v1/messages"
+
+
+def classify(http_status):
+    if http_status in (401, 403):
+        return INVALID
+    # 200 成功；400 参数/模型错误与 429 限流都发生在鉴权之后
+    if http_status in (200, 400, 429, 529):
+        return VALID
+    return UNKNOWN
+
+
+class CredentialResult:
+    def __init__(self, profile, status, http_status=None, detail="", checked_at=None, cached=False):
+        self.profile = profile
+        self.status = status
+        self.http_status = http_status
+        self.detail = detail
+        self.checked_at = checked_at or time.time()
+        self.cached = cached
+
+    def summary(self):
+        label = {VALID: "有效", INVALID: "无效", UNKNOWN: "无法判断"}[self.status]
+        text = f"凭证{label}"
+        if self.http_status:
+            text += f"（HTTP {self.http_status}）"
+        if self.detail and self.status != VALID:
+            text += f": {self.detail}"
+        return text
+
+
+class CredentialCache:
+    """JSON file of {key: {status, http_status, detail, checked_at}} with per-status TTLs"""
+
+    def __init__(self, path=CACHE_FILE):
+        self.path = Path(path)
+        try:
+            with open(self.path) as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def get(self, key, now=None):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        ttl = TTL_SECONDS.get(entry["status"], 0)
+        if (now or time.time()) - entry["checked_at"] > ttl:
+            return None
+        return entry
+
+    def put(self, key, result):
+        if result.status in TTL_SECONDS:
+            self.entries[key] = {
+                "status": result.status,
+                "http_status": result.http_status,
+                "detail": result.detail,
+                "checked_at": result.checked_at,
+            }
+
+    def save(self):
+        now = time.time()
+        self.entries = {
+            key: entry
+            for key, entry in self.entries.items()
+            if now - entry["checked_at"] <= TTL_SECONDS.get(entry["status"], 0)
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.path.with_suffix(".json.tmp")
+        with open(tmp_file, "w") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_file, self.path)
+
+
+async def check_credential(client, model_data, timeout=TIMEOUT):
+    """One max_tokens=1 Messages call; returns (status, http_status, detail)"""
+    body = json.dumps(
+        {
+            "model": model_data.get("ANTHROPIC_MODEL") or DEFAULT_MODEL,
+            "max_tokens": 1,
+            "messages": [{"role": "user", "content": "ping"}],
+        }
+    ).encode("utf-8")
+    headers = {
+        "Authorization": f"Bearer {model_data['ANTHROPIC_AUTH_TOKEN']}",
+        "anthropic-version": ANTHROPIC_VERSION,
+        "Content-Type": "application/json",
+    }
+    try:
+        response, data = await client.request(
+            "POST", messages_url(model_data["ANTHROPIC_BASE_URL"]), headers, body, timeout
+        )
+    except (HttpError, OSError) as e:
+        return UNKNOWN, None, str(e) or type(e).__name__
+    detail = ""
+    if response.status != 200:
+        try:
+            detail = json.loads(data)["error"]["message"]
+        except (ValueError, KeyError, TypeError):
+            detail = data[:120].decode("utf-8", "replace")
+    return classify(response.status), response.status, detail
+
+
+async def validate_profiles(models, cache, max_concurrency=MAX_CONCURRENCY, timeout=TIMEOUT,
+                            client=None, refresh=False):
+    """Validate {name: model_data}; only cache misses hit the network
+
+    Profiles sharing a token and host are checked once. Returns results in
+    input order; fresh results are written into cache (not saved to disk).
+    refresh=True ignores cached entries.
+    """
+    results = {}
+    misses = {}
+    for name, model in models.items():
+        token = model.get("ANTHROPIC_AUTH_TOKEN")
+        base_url = model.get("ANTHROPIC_BASE_URL")
+        if not token or not base_url:
+            continue
+        key = credential_key(token, base_url)
+        entry = None if refresh else cache.get(key)
+        if entry is not None:
+            results[name] = CredentialResult(
+                name, entry["status"], entry["http_status"], entry["detail"],
+                entry["checked_at"], cached=True,
+            )
+        else:
+            misses.setdefault(key, []).append(name)
+
+    if misses:
+        semaphore = asyncio.Semaphore(max_concurrency)
+        own_client = client is None
+        client = client or AsyncHttpClient()
+
+        async def bounded(key, name):
+            async with semaphore:
+                return key, await check_credential(client, models[name], timeout)
+
+        try:
+            outcomes = await asyncio.gather(
+                *(bounded(key, names[0]) for key, names in misses.items())
+            )
+        finally:
+            if own_client:
+                await client.close()
+        for key, (status, http_status, detail) in outcomes:
+            for name in misses[key]:
+                results[name] = CredentialResult(name, status, http_status, detail)
+            cache.put(key, results[misses[key][0]])
+    return [results[name] for name in models if name in results]
+
+
+class CredentialCheckThread(QThread):
+    """Validates profiles on a private event loop and persists the cache"""
+
+    results_ready = pyqtSignal(list)
+
+    def __init__(self, models, cache_file=CACHE_FILE, refresh=False, parent=None):
+        super().__init__(parent)
+        self.models = models
+        self.cache_file = cache_file
+        self.refresh = refresh
+
+    def run(self):
+        with tracer.span("credentials.validate", profiles=len(self.models)):
+            cache = CredentialCache(self.cache_file)
+            results = asyncio.run(validate_profiles(self.models, cache, refresh=self.refresh))
+            if any(not r.cached for r in results):
+                try:
+                    cache.save()
+                except OSError as e:
+                    print(f"无法写入凭证缓存 {self.cache_file}: {e}")
+        self.results_ready.emit(results)
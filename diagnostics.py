@@ -0,0 +1,210 @@
+"""
+Diagnostics bundle for Claude Model Manager
+Collects memory, Qt object, trace span, config and environment snapshots into one zip
+"""
+
+import gc
+import json
+import os
+import platform
+import sys
+import threading
+import time
+import tracemalloc
+import zipfile
+from collections import Counter
+from pathlib import Path
+
+from tracing import tracer
+
+CONFIG_FILE = Path.home() / ".claude-cli" / "config.json"
+DIAGNOSTICS_DIR = Path.home() / ".claude-cli" / "diagnostics"
+TOP_N = 30
+TRACEMALLOC_FRAMES = 5
+SECRET_MARKERS = ("TOKEN", "KEY", "SECRET", "PASSWORD")
+
+_memory_baseline = None
+
+
+def start_memory_tracing(frames=TRACEMALLOC_FRAMES):
+    """Start tracemalloc and keep a baseline snapshot to diff later bundles against"""
+    global _memory_baseline
+    if tracemalloc.is_tracing():
+        return False
+    tracemalloc.start(frames)
+    _memory_baseline = tracemalloc.take_snapshot()
+    return True
+
+
+def redact(value, key=""):
+    """Copy of value with secrets replaced by their length"""
+    if isinstance(value, dict):
+        return {k: redact(v, str(k)) for k, v in value.items()}
+    if isinstance(value, list):
+        return [redact(v, key) for v in value]
+    if isinstance(value, str) and any(m in key.upper() for m in SECRET_MARKERS):
+        return f"<redacted {len(value)} chars>"
+    return value
+
+
+def config_stats(config, config_file):
+    models = config.get("models", {})
+    env_keys = Counter(key for model in models.values() for key in model)
+    try:
+        file_size = os.path.getsize(config_file)
+    except OSError:
+        file_size = None
+    return {
+        "config_file": str(config_file),
+        "config_file_bytes": file_size,
+        "serialized_bytes": len(json.dumps(config)),
+        "profiles": len(models),
+        "active": config.get("active"),
+        "env_keys": dict(env_keys.most_common()),
+        "usage_entries": len(config.get("usage", {}).get("recent", [])),
+        "remote_hosts": len(config.get("remote", {}).get("hosts", [])),
+    }
+
+
+def memory_report(top_n=TOP_N):
+    """Text report of the largest allocation sites and growth since the baseline"""
+    lines = []
+    # 首次导出时开启追踪并保持运行，基线留给之后的导出对比增长
+    started_now = start_memory_tracing()
+    if started_now:
+        lines.append(
+            "tracemalloc 在本次导出时才启动，只包含此后的分配；再次导出可看到此后的增长，"
+            "以 --trace-memory 启动可查看整个会话的增长情况。"
+        )
+    current, peak = tracemalloc.get_traced_memory()
+    lines.append(f"traced current: {current / 1024:.1f} KiB, peak: {peak / 1024:.1f} KiB")
+
+    filters = [
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    ]
+    snapshot = tracemalloc.take_snapshot().filter_traces(filters)
+
+    lines.append("")
+    lines.append(f"=== Top {top_n} allocation sites ===")
+    for stat in snapshot.statistics("lineno")[:top_n]:
+        lines.append(str(stat))
+
+    if _memory_baseline is not None and not started_now:
+        lines.append("")
+        lines.append(f"=== Top {top_n} growth since baseline ===")
+        baseline = _memory_baseline.filter_traces(filters)
+        for stat in snapshot.compare_to(baseline, "lineno")[:top_n]:
+            lines.append(str(stat))
+    return "\n".join(lines) + "\n"
+
+
+def qt_object_counts(top_n=TOP_N):
+    """Widget and QObject counts by class, walked from the application and top-level widgets"""
+    from PyQt6.QtCore import QObject
+    from PyQt6.QtWidgets import QApplication
+
+    app = QApplication.instance()
+    if app is None:
+        return {}
+    widgets = app.allWidgets()
+    seen = {}
+    roots = [app] + list(app.topLevelWidgets())
+    for root in roots:
+        for obj in [root] + root.findChildren(QObject):
+            seen[id(obj)] = obj.metaObject().className()
+    widget_classes = Counter(w.metaObject().className() for w in widgets)
+    object_classes = Counter(seen.values())
+    return {
+        "widgets": len(widgets),
+        "top_level_widgets": len(app.topLevelWidgets()),
+        "widget_classes": dict(widget_classes.most_common(top_n)),
+        "objects": len(seen),
+        "object_classes": dict(object_classes.most_common(top_n)),
+    }
+
+
+def python_object_counts(top_n=TOP_N):
+    counts = Counter(type(obj).__name__ for obj in gc.get_objects())
+    return {
+        "gc_objects": sum(counts.values()),
+        "gc_counts": gc.get_count(),
+        "types": dict(counts.most_common(top_n)),
+    }
+
+
+def environment_info(started=None):
+    from PyQt6.QtCore import PYQT_VERSION_STR, QT_VERSION_STR
+
+    from version import get_current_version
+
+    info = {
+        "app_version": get_current_version(),
+        "python": sys.version,
+        "executable": sys.executable,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "qt": QT_VERSION_STR,
+        "pyqt": PYQT_VERSION_STR,
+        "argv": sys.argv,
+        "pid": os.getpid(),
+        "frozen": bool(getattr(sys, "frozen", False)),
+        "threads": sorted(t.name for t in threading.enumerate()),
+        "time": time.strftime("%Y-%m-%d %H:%M:%S %z"),
+    }
+    if started is not None:
+        info["uptime_seconds"] = round(time.perf_counter() - started, 1)
+    try:
+        import resource
+
+        # Linux 单位是 KiB，macOS 是字节
+        info["max_rss"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    except ImportError:
+        pass
+    return info
+
+
+def spans_report(limit=50):
+    lines = []
+
+    def walk(span, children, depth):
+        name = "  " * depth + span.name
+        lines.append(f"{name:<40}{span.duration_ms:>10.2f} ms  {span.args}")
+        for child, grandchildren in children:
+            walk(child, grandchildren, depth + 1)
+
+    for span, children in tracer.operations(limit):
+        started = time.strftime("%H:%M:%S", time.localtime(tracer.wall_time(span)))
+        lines.append(f"[{started}] {span.thread}")
+        walk(span, children, 1)
+    if not lines:
+        lines.append("没有记录到 span（在性能面板中勾选“记录耗时”或以 --trace 启动）")
+    return "\n".join(lines) + "\n"
+
+
+def default_bundle_path():
+    return DIAGNOSTICS_DIR / time.strftime("diagnostics-%Y%m%d-%H%M%S.zip")
+
+
+def write_bundle(config, path=None, started=None, config_file=CONFIG_FILE):
+    """Write the diagnostics zip and return its path; must run on the GUI thread"""
+    path = Path(path) if path else default_bundle_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    summary = {
+        "environment": environment_info(started),
+        "config": config_stats(config, config_file),
+        "qt": qt_object_counts(),
+        "python_objects": python_object_counts(),
+        "trace": {"enabled": tracer.enabled, "spans": len(tracer.spans())},
+    }
+    memory = memory_report()
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as bundle:
+        bundle.writestr("summary.json", json.dumps(summary, indent=2, ensure_ascii=False))
+        bundle.writestr("memory.txt", memory)
+        bundle.writestr("spans.txt", spans_report())
+        bundle.writestr("trace.json", json.dumps(tracer.chrome_trace()))
+        bundle.writestr(
+            "config.redacted.json", json.dumps(redact(config), indent=2, ensure_ascii=False)
+        )
+    return path
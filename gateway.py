@@ -0,0 +1,958 @@
+"""
+Local gateway for Claude Model Manager
+Anthropic-compatible localhost proxy that forwards to the active profile over pooled connections
+"""
+
+import asyncio
+import concurrent.futures
+import hashlib
+import json
+import math
+import secrets
+import time
+
+from PyQt6.QtCore import QThread, pyqtSignal
+
+from circuit_breaker import CircuitBreaker
+from coalescing import Flight
+from http_client import (
+    IDEMPOTENT_METHODS, AsyncHttpClient, HttpError, RequestNotSent, header_dict, iter_body,
+    read_head,
+)
+from load_balancer import HashRing, MemberState, conversation_key, least_outstanding
+from rate_limiter import RateLimited, RateLimiter, estimate_tokens
+from response_cache import CACHE_HEADER, CacheRecorder, ResponseCache, cache_key, cacheable
+from tracing import tracer
+from usage_meter import UsageMeter, UsageStore
+
+HOST = "127.0.0.1"
+DEFAULT_PORT = 8787
+DEFAULT_SETTINGS = {
+    "enabled": False,
+    "port": DEFAULT_PORT,
+    "token": "",
+    # 每组是按优先级排列的模型名称；当前模型所在的组决定备用上游
+    "failover_groups": [],
+    "failover_timeout_seconds": 30,
+    # 模型名称 → 额外的凭证/地址列表，网关按加权最少在途请求在它们之间分配
+    "pools": {},
+    # 同一会话的各轮请求固定发往同一个凭证/地址，让上游的提示缓存保持命中
+    "sticky_routing": True,
+    # temperature 为 0 的请求按内容缓存到磁盘，重复请求直接回放
+    "response_cache": False,
+    "response_cache_mb": 256,
+    # 从响应中读取 token 用量，按模型配置与模型累计到 usage.db
+    "usage_metering": True,
+    # 按上游返回的限流头在本地排队，而不是把请求发出去换回 429
+    "rate_limiting": True,
+    "rate_limit_max_wait_seconds": 120,
+    # 相同的请求同时进行时只向上游发一次，响应分发给每个请求方
+    "coalesce_requests": False,
+    # 上游协商出 h2 时，多个请求复用同一连接上的多个流（需要安装 h2）
+    "http2": False,
+    "http2_max_streams": 100,
+}
+# 上游首字节超时：长上下文请求的首 token 可能需要数分钟
+UPSTREAM_TIMEOUT = 600.0
+# 在向客户端写出任何字节之前遇到这些状态码，幂等请求可以安全地改发给下一个上游
+RETRYABLE_STATUSES = (429, 500, 502, 503, 504, 529)
+# 上游明确表示未处理请求的状态码；只有这些情况下 POST 才会改发
+OVERLOAD_STATUSES = (429, 529)
+# 计入熔断器的失败；429 是配额问题，不代表上游故障
+BREAKER_FAILURE_STATUSES = (500, 502, 503, 504, 529)
+# 流式响应会一直占用连接，单个上游主机的并发上限要远高于探测时
+MAX_PER_HOST = 64
+STATS_PATH = "/_gateway/stats"
+# 与 Anthropic API 的请求体上限相同；超过的请求直接返回 413
+MAX_REQUEST_BYTES = 32 * 1024 * 1024
+
+HOP_BY_HOP = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailer", "transfer-encoding", "upgrade",
+}
+# 鉴权由网关替换为所选模型的 token；压缩关闭，便于逐块转发 SSE
+STRIPPED_REQUEST_HEADERS = HOP_BY_HOP | {
+    "host", "content-length", "authorization", "x-api-key", "accept-encoding",
+}
+STRIPPED_RESPONSE_HEADERS = HOP_BY_HOP | {"content-length"}
+
+
+def gateway_settings(config):
+    settings = dict(DEFAULT_SETTINGS)
+    settings.update(config.get("gateway", {}))
+    return settings
+
+
+def upstream_client(settings):
+    """The upstream transport the settings ask for; HTTP/1.1 when h2 is off or not installed"""
+    fallback = AsyncHttpClient(max_per_host=MAX_PER_HOST)
+    if not settings["http2"]:
+        return fallback
+    import http2_client
+
+    if not http2_client.available():
+        return fallback
+    return http2_client.Http2Client(
+        max_streams=max(1, int(settings["http2_max_streams"])), fallback=fallback
+    )
+
+
+def transport_key(settings):
+    # 传输方式变化需要重建连接池，因此会重启网关
+    return bool(settings["http2"]), int(settings["http2_max_streams"])
+
+
+def gateway_url(settings):
+    return f"http://{HOST}:{settings['port']}"
+
+
+def ensure_token(config):
+    """Give the gateway its own local token; returns True if one was created"""
+    gateway = config.setdefault("gateway", {})
+    if gateway.get("token"):
+        return False
+    gateway["token"] = "cmm-" + secrets.token_urlsafe(24)
+    return True
+
+
+def env_for(config):
+    """Variables for env.sh: the gateway's when it is enabled, else the active profile's"""
+    settings = gateway_settings(config)
+    if settings["enabled"] and settings["token"]:
+        return {
+            "ANTHROPIC_BASE_URL": gateway_url(settings),
+            "ANTHROPIC_AUTH_TOKEN": settings["token"],
+        }
+    return config["models"][config["active"]]
+
+
+class Upstream:
+    """One place requests can be sent: a base URL and the credential to use there"""
+
+    def __init__(self, profile, model_data, key=None, weight=1):
+        self.profile = profile
+        # 熔断器与在途计数按 key 区分，同一模型的多个凭证各自独立
+        self.key = key or profile
+        self.weight = max(float(weight), 0.01)
+        self.base_url = model_data["ANTHROPIC_BASE_URL"].rstrip("/")
+        self.token = model_data["ANTHROPIC_AUTH_TOKEN"]
+        self.model = model_data.get("ANTHROPIC_MODEL")
+        self.small_fast_model = model_data.get("ANTHROPIC_SMALL_FAST_MODEL")
+
+    def url_for(self, target):
+        return self.base_url + target
+
+    def rewrite_body(self, target, body):
+        """Apply the profile's ANTHROPIC_MODEL, which env.sh no longer carries"""
+        if not self.model or not body or not target.startswith("/v1/messages"):
+            return body
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            return body
+        if not isinstance(payload, dict) or "model" not in payload:
+            return body
+        if self.small_fast_model and "haiku" in str(payload["model"]):
+            model = self.small_fast_model
+        else:
+            model = self.model
+        if payload["model"] == model:
+            return body
+        payload["model"] = model
+        return json.dumps(payload, ensure_ascii=False).encode("utf-8")
+
+
+def member_key(name, model_data):
+    """Stable key of a pool member, derived from its base URL and token
+
+    Breakers, in-flight counts, rate limits and the hash ring are keyed by
+    it, so deleting or reordering pool lines does not move that state onto
+    another credential.
+    """
+    base_url = model_data["ANTHROPIC_BASE_URL"].rstrip("/")
+    identity = f"{base_url}\n{model_data['ANTHROPIC_AUTH_TOKEN']}"
+    return f"{name}#{hashlib.sha256(identity.encode('utf-8')).hexdigest()[:8]}"
+
+
+def profile_upstreams(name, model_data, pool):
+    """The profile's own credential plus the extra members listed in its pool
+
+    Pool entries may override ANTHROPIC_AUTH_TOKEN and/or ANTHROPIC_BASE_URL
+    and carry a "weight"; anything not given falls back to the profile. An
+    entry repeating a credential already listed adds its weight to it.
+    """
+    upstreams = [Upstream(name, model_data)]
+    keys = {member_key(name, model_data): upstreams[0]}
+    for entry in pool or []:
+        data = dict(model_data)
+        data.update({k: v for k, v in entry.items() if k != "weight" and v})
+        key = member_key(name, data)
+        weight = max(float(entry.get("weight", 1)), 0.01)
+        if key in keys:
+            keys[key].weight += weight
+            continue
+        keys[key] = Upstream(name, data, key, weight)
+        upstreams.append(keys[key])
+    return upstreams
+
+
+class Route:
+    """What the gateway currently forwards to; replaced as a whole on every switch
+
+    tiers is the failover order: the active profile first, then the other
+    members of its failover group in their configured order. Each tier holds
+    the upstreams of one profile, which share its load; rings holds the
+    matching consistent-hash ring used for session affinity.
+    """
+
+    def __init__(self, profile, tiers, failover_timeout=None):
+        self.profile = profile
+        self.tiers = tiers
+        self.rings = [HashRing(tier) if len(tier) > 1 else None for tier in tiers]
+        self.failover_timeout = failover_timeout or DEFAULT_SETTINGS["failover_timeout_seconds"]
+
+    def profiles(self):
+        return [tier[0].profile for tier in self.tiers]
+
+    @classmethod
+    def from_config(cls, config):
+        models = config.get("models", {})
+        name = config.get("active")
+        if not models.get(name, {}).get("ANTHROPIC_BASE_URL"):
+            return None
+        settings = gateway_settings(config)
+        names = [name]
+        for group in settings["failover_groups"]:
+            if name in group:
+                names.extend(member for member in group if member not in names)
+                break
+        tiers = [
+            profile_upstreams(member, models[member], settings["pools"].get(member))
+            for member in names
+            if models.get(member, {}).get("ANTHROPIC_BASE_URL")
+        ]
+        return cls(name, tiers, settings["failover_timeout_seconds"])
+
+
+class RequestTooLarge(HttpError):
+    pass
+
+
+class GatewayRequest:
+    def __init__(self, method, target, version, raw_headers, body):
+        self.method = method
+        self.target = target
+        self.version = version
+        self.raw_headers = raw_headers
+        self.headers = header_dict(raw_headers)
+        self.body = body
+        self._payload = None
+        connection = self.headers.get("connection", "").lower()
+        if version == "HTTP/1.0":
+            self.keep_alive = connection == "keep-alive"
+        else:
+            self.keep_alive = connection != "close"
+
+    def payload(self):
+        """Parsed JSON body, or {} when the body is not a JSON object"""
+        if self._payload is None:
+            try:
+                payload = json.loads(self.body) if self.body else {}
+            except ValueError:
+                payload = {}
+            self._payload = payload if isinstance(payload, dict) else {}
+        return self._payload
+
+    def streaming(self):
+        return self.payload().get("stream") is True
+
+    def token(self):
+        auth = self.headers.get("authorization", "")
+        if auth.lower().startswith("bearer "):
+            return auth[7:].strip()
+        return self.headers.get("x-api-key", "")
+
+    def upstream_headers(self, upstream):
+        headers = {
+            name: value for name, value in self.raw_headers
+            if name.lower() not in STRIPPED_REQUEST_HEADERS
+        }
+        headers["Authorization"] = f"Bearer {upstream.token}"
+        return headers
+
+
+def messages_request(request):
+    return request.method == "POST" and request.target.split("?", 1)[0] == "/v1/messages"
+
+
+def fan_out(callbacks):
+    """One on_chunk callback that feeds every tap, or None when there are none"""
+    if not callbacks:
+        return None
+    if len(callbacks) == 1:
+        return callbacks[0]
+
+    def feed(chunk):
+        for callback in callbacks:
+            callback(chunk)
+
+    return feed
+
+
+class GatewayStats:
+    __slots__ = ("requests", "errors", "in_flight", "client_connections",
+                 "upstream_connects", "upstream_reused", "failovers", "coalesced",
+                 "sticky_routed", "sticky_moved", "bytes_out", "started")
+
+    def __init__(self):
+        for name in self.__slots__:
+            setattr(self, name, 0)
+        self.started = time.time()
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class Gateway:
+    """Asyncio HTTP/1.1 proxy in front of the active profile
+
+    Every client request is authenticated with the gateway token, its
+    credentials are replaced with the route's, and the response (including
+    SSE streams) is relayed chunk by chunk with backpressure. Upstream
+    connections come from one shared keep-alive pool, so many Claude Code
+    sessions share a few TLS connections. set_route() is a plain reference
+    swap: requests already in flight finish on the route they started with.
+    """
+
+    def __init__(self, token, host=HOST, port=DEFAULT_PORT, client=None, cache=None, meter=None):
+        self.token = token
+        self.host = host
+        self.port = port
+        self.route = None
+        self.client = client or AsyncHttpClient(max_per_host=MAX_PER_HOST)
+        self.stats = GatewayStats()
+        self.server = None
+        # 熔断器与在途计数按上游 key 保存，切换路由后状态仍然保留
+        self.members = {}
+        self.picks = 0
+        self.cache = cache
+        self.meter = meter
+        self.metering = meter is not None
+        self.limiter = RateLimiter()
+        self.limiting = True
+        self.flights = {}
+        self.fills = set()
+        self.coalescing = False
+        self.sticky = True
+
+    def member_state(self, key):
+        state = self.members.get(key)
+        if state is None:
+            state = self.members[key] = MemberState(CircuitBreaker())
+        return state
+
+    def breaker_for(self, key):
+        return self.member_state(key).breaker
+
+    def set_route(self, route):
+        self.route = route
+
+    def apply_settings(self, settings):
+        """Create, resize or drop the response cache and usage meter to match gateway settings"""
+        self.metering = settings["usage_metering"]
+        self.limiting = settings["rate_limiting"]
+        self.coalescing = settings["coalesce_requests"]
+        self.sticky = settings["sticky_routing"]
+        self.limiter.max_wait = float(settings["rate_limit_max_wait_seconds"])
+        # 关闭计量时保留 meter，未写入的用量在 close() 时落盘
+        if self.metering and self.meter is None:
+            self.meter = UsageMeter(UsageStore())
+        if not settings["response_cache"]:
+            self.cache = None
+            return
+        max_bytes = int(settings["response_cache_mb"]) * 1024 * 1024
+        if self.cache is None:
+            self.cache = ResponseCache(max_bytes=max_bytes)
+        else:
+            self.cache.max_bytes = max_bytes
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle_client, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+        for task in list(self.fills):
+            task.cancel()
+        await asyncio.gather(*self.fills, return_exceptions=True)
+        # 先把用量落盘：等待客户端连接全部关闭可能超出 GatewayThread.stop 的等待时间
+        if self.meter is not None:
+            await self.meter.close()
+        if self.server is not None:
+            await self.server.wait_closed()
+        await self.client.close()
+
+    def snapshot(self):
+        data = self.stats.to_dict()
+        data["route"] = self.route.profile if self.route else None
+        data["upstreams"] = self.route.profiles() if self.route else []
+        data["port"] = self.port
+        data["breakers"] = {key: s.breaker.to_dict() for key, s in self.members.items()}
+        data["members"] = {
+            key: {"outstanding": s.outstanding, "requests": s.requests}
+            for key, s in self.members.items()
+        }
+        data["cache"] = self.cache.stats() if self.cache is not None else None
+        data["rate_limits"] = self.limiter.stats() if self.limiting else None
+        data["flights"] = len(self.flights)
+        data["transport"] = self.client.stats() if hasattr(self.client, "stats") else None
+        return data
+
+    # --- 客户端连接 ---
+    async def handle_client(self, reader, writer):
+        self.stats.client_connections += 1
+        try:
+            while True:
+                try:
+                    request = await self.read_request(reader)
+                except RequestTooLarge:
+                    await self.send_error(
+                        writer, 413, "request_too_large",
+                        f"请求体超过 {MAX_REQUEST_BYTES // (1024 * 1024)} MB",
+                    )
+                    break
+                except (HttpError, ValueError, asyncio.IncompleteReadError):
+                    break
+                if request is None:
+                    break
+                keep_alive = await self.dispatch(request, writer)
+                if not (keep_alive and request.keep_alive):
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            self.stats.client_connections -= 1
+            writer.close()
+
+    async def read_request(self, reader):
+        try:
+            start_line, raw_headers = await read_head(reader)
+        except HttpError:
+            if reader.at_eof():
+                return None
+            raise
+        method, target, version = start_line.split(" ", 2)
+        request = GatewayRequest(method, target, version, raw_headers, None)
+        if not self.authorized(request):
+            # 未通过鉴权的请求不读报文体，回复 401 后关闭连接
+            request.keep_alive = False
+            return request
+        if int(request.headers.get("content-length", 0)) > MAX_REQUEST_BYTES:
+            raise RequestTooLarge()
+        parts = []
+        size = 0
+        async for chunk in iter_body(reader, request.headers, read_to_eof=False):
+            size += len(chunk)
+            if size > MAX_REQUEST_BYTES:
+                raise RequestTooLarge()
+            parts.append(chunk)
+        request.body = b"".join(parts) or None
+        return request
+
+    def authorized(self, request):
+        return secrets.compare_digest(request.token().encode(), self.token.encode())
+
+    async def dispatch(self, request, writer):
+        """Answer one request; returns False when the client connection must close"""
+        if not self.authorized(request):
+            await self.send_error(writer, 401, "authentication_error", "本地网关 token 无效")
+            return True
+        if request.target == STATS_PATH:
+            await self.send_json(writer, 200, self.snapshot())
+            return True
+        route = self.route
+        if route is None:
+            await self.send_error(writer, 503, "api_error", "本地网关尚未选择模型")
+            return True
+        self.stats.requests += 1
+        cache = self.cache
+        recorder = None
+        if cache is not None and cacheable(request):
+            key = cache_key(route.profile, request)
+            cached = await cache.get(key)
+            if cached is not None:
+                await self.replay(cached, writer)
+                return True
+            recorder = CacheRecorder(key)
+        flight = None
+        if self.coalescing and messages_request(request):
+            key = recorder.key if recorder is not None else cache_key(route.profile, request)
+            leader = self.flights.get(key)
+            if leader is not None and leader.joinable():
+                self.stats.coalesced += 1
+                self.stats.in_flight += 1
+                try:
+                    keep_alive = await self.follow(leader, writer)
+                finally:
+                    self.stats.in_flight -= 1
+                if keep_alive is not None:
+                    return keep_alive
+            flight = self.flights[key] = Flight(key)
+        self.stats.in_flight += 1
+        try:
+            with tracer.span("gateway.request", profile=route.profile, target=request.target):
+                keep_alive = await self.forward(request, route, writer, recorder, flight)
+        finally:
+            self.stats.in_flight -= 1
+            if flight is not None and flight.state == Flight.PENDING:
+                # 没有拿到可共享的响应时，跟随者会各自重新转发；拿到响应后由读取任务收尾
+                flight.finish(ok=False)
+                self.land(flight)
+        cached = recorder.result() if recorder is not None else None
+        if cached is not None:
+            try:
+                await cache.put(recorder.key, cached)
+            except OSError:
+                pass
+        return keep_alive
+
+    # --- 转发 ---
+    async def forward(self, request, route, writer, recorder=None, flight=None):
+        """Send to the first healthy upstream, failing over while nothing reached the client
+
+        Within a tier a conversation first goes to its member on the hash ring
+        (sticky routing), otherwise to the least-loaded healthy member; then
+        the others are tried, then the next tier. Failures before the request
+        was sent and 429/529 move any request on to the next candidate;
+        idempotent requests also move on after head timeouts and 5xx. Once the
+        response head has been written the request is committed to that
+        upstream. A rate-limited member is skipped while another could take
+        the request; if none could, the request queues on the first one skipped.
+        """
+        errors = []
+        attempted = False
+        deferred = None
+        cost = estimate_tokens(request.body)
+
+        async def try_member(upstream, has_next):
+            state = self.member_state(upstream.key)
+            state.acquire()
+            try:
+                return await self.attempt(request, route, upstream, state.breaker, has_next,
+                                          writer, errors, recorder, flight)
+            finally:
+                state.release()
+
+        affinity = None
+        if self.sticky and any(route.rings) and messages_request(request):
+            affinity = conversation_key(request.payload())
+        for tier_index, tier in enumerate(route.tiers):
+            tried = set()
+            ring = route.rings[tier_index] if affinity is not None else None
+            while True:
+                upstream = ring.pick(affinity, self.member_state, tried) if ring else None
+                if upstream is None:
+                    upstream = least_outstanding(
+                        tier, self.member_state, tried, self.picks % len(tier)
+                    )
+                if upstream is None:
+                    break
+                if ring is not None and not tried:
+                    # 首选上游是否就是该会话在环上的归属成员
+                    if upstream is ring.home(affinity):
+                        self.stats.sticky_routed += 1
+                    else:
+                        self.stats.sticky_moved += 1
+                self.picks += 1
+                tried.add(upstream.key)
+                state = self.member_state(upstream.key)
+                if not state.breaker.allow():
+                    continue
+                has_next = self.has_fallback(route, tier_index, tried)
+                if self.limiting and has_next and self.limiter.delay(upstream.key, cost) > 0:
+                    # 该上游需要排队，而还有别的上游可用：先换下一个
+                    state.breaker.release_trial()
+                    errors.append(f"{upstream.key}: 限流中")
+                    deferred = deferred or upstream
+                    continue
+                attempted = True
+                outcome = await try_member(upstream, has_next)
+                if outcome is not None:
+                    return outcome
+            errors.extend(f"{u.key}: 熔断中" for u in tier if u.key not in tried)
+        if deferred is not None and self.member_state(deferred.key).breaker.allow():
+            # 其余候选也都限流或熔断了：回到第一个限流的上游排队
+            attempted = True
+            outcome = await try_member(deferred, False)
+            if outcome is not None:
+                return outcome
+        self.stats.errors += 1
+        # 全部处于熔断状态时返回 503，Claude Code 会稍后重试
+        await self.send_error(
+            writer, 502 if attempted else 503, "api_error", "所有上游均不可用: " + "；".join(errors)
+        )
+        return True
+
+    def has_fallback(self, route, tier_index, tried):
+        """Whether an untried member of this or a later tier could take the request now"""
+        candidates = [u for u in route.tiers[tier_index] if u.key not in tried]
+        for tier in route.tiers[tier_index + 1:]:
+            candidates.extend(tier)
+        return any(self.member_state(u.key).breaker.available() for u in candidates)
+
+    async def attempt(self, request, route, upstream, breaker, has_next, writer, errors,
+                      recorder=None, flight=None):
+        """Try one upstream; returns None to move on, else forward()'s result"""
+        # POST 发出后上游可能已在处理，超时或 5xx 时改发会重复执行（并重复计费）
+        idempotent = request.method in IDEMPOTENT_METHODS
+        # 还有备用上游时，幂等的流式请求缩短响应头等待时间，尽快转移
+        timeout = UPSTREAM_TIMEOUT
+        if has_next and idempotent and request.streaming():
+            timeout = route.failover_timeout
+        cost = estimate_tokens(request.body)
+        try:
+            if self.limiting:
+                await self.limiter.acquire(upstream.key, cost)
+            response = await self.open_upstream(request, upstream, timeout)
+        except RateLimited as e:
+            breaker.release_trial()
+            await self.send_error(
+                writer, 429, "rate_limit_error", f"{upstream.key} 已达到限额，{e}",
+                headers=[("retry-after", str(math.ceil(e.retry_after)))],
+            )
+            return True
+        except (HttpError, OSError) as e:
+            breaker.record_failure(str(e))
+            errors.append(f"{upstream.key}: {e}")
+            if not has_next:
+                return None
+            if idempotent or isinstance(e, RequestNotSent):
+                self.stats.failovers += 1
+                return None
+            self.stats.errors += 1
+            await self.send_error(
+                writer, 502, "api_error",
+                f"{upstream.key}: {e}（请求已发出，上游可能已在处理，未改发给其他上游）",
+            )
+            return True
+        except BaseException:
+            breaker.release_trial()
+            raise
+        if self.limiting:
+            self.limiter.observe(upstream.key, response.headers, response.status)
+        if response.status in BREAKER_FAILURE_STATUSES:
+            breaker.record_failure(f"HTTP {response.status}")
+        else:
+            breaker.record_success()
+        retryable = RETRYABLE_STATUSES if idempotent else OVERLOAD_STATUSES
+        if response.status in retryable and has_next:
+            response.release()
+            errors.append(f"{upstream.key}: HTTP {response.status}")
+            self.stats.failovers += 1
+            return None
+        taps = []
+        if recorder is not None:
+            recorder.start(response)
+            taps.append(recorder.feed)
+        usage = None
+        if self.metering and response.status == 200 and messages_request(request):
+            usage = self.meter.tap(upstream.profile, upstream.model or request.payload().get("model"),
+                                   request.streaming())
+            taps.append(usage.feed)
+        if flight is not None:
+            return await self.lead(flight, response, writer, fan_out(taps), breaker, usage, recorder)
+        ok = None
+        try:
+            ok = await self.relay(response, writer, fan_out(taps))
+        finally:
+            self.settle(ok, breaker, usage, recorder)
+        return ok
+
+    def settle(self, ok, breaker, usage, recorder):
+        """Book-keeping once an upstream body is done; ok is None if the client went away first"""
+        # 中途断开的流也已消耗 token，照样计入
+        if usage is not None:
+            self.meter.record(usage)
+        if ok is False:
+            breaker.record_failure("响应中断")
+        elif ok and recorder is not None:
+            recorder.complete = True
+
+    async def lead(self, flight, response, writer, on_chunk, breaker, usage, recorder):
+        """Share a response: a task fills the flight, the leader reads it like any follower
+
+        The upstream is read as fast as it sends, whatever the clients do, so
+        a slow leader no longer holds back its followers. Reading stops early
+        only when every reader has gone.
+        """
+        flight.start(response)
+        reader = flight.attach()
+
+        async def fill():
+            ok = False
+            try:
+                ok = await self.fill(response, flight, on_chunk)
+            finally:
+                self.settle(ok, breaker, usage, recorder)
+                flight.finish(ok)
+                self.land(flight)
+
+        task = asyncio.ensure_future(fill())
+        self.fills.add(task)
+        task.add_done_callback(self.fills.discard)
+        try:
+            return await self.stream_flight(flight, reader, writer)
+        finally:
+            flight.detach(reader)
+
+    async def fill(self, response, flight, on_chunk=None):
+        """Read the upstream body into flight; False if it broke off or nobody is left to read it"""
+        try:
+            async for chunk in response.iter_chunks():
+                if on_chunk is not None:
+                    on_chunk(chunk)
+                flight.feed(chunk)
+                if not flight.cursors:
+                    # 领头请求与所有跟随者都已断开，不再消耗上游
+                    return False
+            return True
+        except (HttpError, asyncio.IncompleteReadError):
+            self.stats.errors += 1
+            return False
+        finally:
+            response.release()
+
+    def land(self, flight):
+        if self.flights.get(flight.key) is flight:
+            del self.flights[flight.key]
+
+    async def open_upstream(self, request, upstream, timeout):
+        body = upstream.rewrite_body(request.target, request.body)
+        response = await self.client.open(
+            request.method, upstream.url_for(request.target),
+            request.upstream_headers(upstream), body, timeout,
+        )
+        if response.timings.reused:
+            self.stats.upstream_reused += 1
+        else:
+            self.stats.upstream_connects += 1
+        return response
+
+    def response_head(self, status, reason, raw_headers, has_body):
+        """Encoded head for relaying an upstream response, and whether the body is chunked"""
+        headers = [
+            (name, value) for name, value in raw_headers
+            if name.lower() not in STRIPPED_RESPONSE_HEADERS
+        ]
+        length = next((v for n, v in raw_headers if n.lower() == "content-length"), None)
+        chunked = length is None and has_body
+        headers.append(("Transfer-Encoding", "chunked") if chunked
+                       else ("Content-Length", length or "0"))
+        return self.encode_head(status, reason, headers), chunked
+
+    async def relay(self, response, writer, on_chunk=None):
+        """Copy an upstream response to the client, chunk by chunk; False if the upstream broke off"""
+        head, chunked = self.response_head(
+            response.status, response.reason, response.raw_headers, response.has_body
+        )
+        writer.write(head)
+        try:
+            async for chunk in response.iter_chunks():
+                if on_chunk is not None:
+                    on_chunk(chunk)
+                writer.write(b"%x\r\n%s\r\n" % (len(chunk), chunk) if chunked else chunk)
+                # drain 让慢客户端反压到上游读取
+                await writer.drain()
+                self.stats.bytes_out += len(chunk)
+        except (HttpError, asyncio.IncompleteReadError):
+            # 上游中途断开：客户端只能通过关闭连接得知响应不完整
+            self.stats.errors += 1
+            return False
+        finally:
+            response.release()
+        if chunked:
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+        return True
+
+    async def follow(self, flight, writer):
+        """Answer with another request's upstream response; None if the leader got none
+
+        Each follower replays the shared buffer from its own cursor and
+        drains its own writer, so a slow client only slows itself.
+        """
+        reader = flight.attach()
+        try:
+            if not await flight.wait_head():
+                return None
+            return await self.stream_flight(flight, reader, writer)
+        finally:
+            flight.detach(reader)
+
+    async def stream_flight(self, flight, reader, writer):
+        """Write a shared response from reader's cursor; False if the upstream broke off"""
+        head, chunked = self.response_head(
+            flight.status, flight.reason, flight.raw_headers, flight.has_body
+        )
+        writer.write(head)
+        while True:
+            chunks = await flight.read(reader)
+            if not chunks:
+                break
+            for chunk in chunks:
+                writer.write(b"%x\r\n%s\r\n" % (len(chunk), chunk) if chunked else chunk)
+                await writer.drain()
+                self.stats.bytes_out += len(chunk)
+        if flight.state == Flight.ABORTED:
+            return False
+        if chunked:
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+        return True
+
+    async def replay(self, cached, writer):
+        """Answer from the response cache, one SSE event per chunk as originally framed"""
+        headers = list(cached.headers) + [(CACHE_HEADER, "hit")]
+        streaming = cached.streaming()
+        headers.append(("Transfer-Encoding", "chunked") if streaming
+                       else ("Content-Length", str(len(cached.body))))
+        writer.write(self.encode_head(cached.status, cached.reason, headers))
+        for piece in cached.pieces():
+            writer.write(b"%x\r\n%s\r\n" % (len(piece), piece) if streaming else piece)
+            await writer.drain()
+            self.stats.bytes_out += len(piece)
+        if streaming:
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+
+    @staticmethod
+    def encode_head(status, reason, headers):
+        lines = [f"HTTP/1.1 {status} {reason}".rstrip()]
+        lines.extend(f"{name}: {value}" for name, value in headers)
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+    async def send_json(self, writer, status, payload, reason="", headers=()):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        writer.write(self.encode_head(status, reason, [
+            ("Content-Type", "application/json"), ("Content-Length", str(len(body))), *headers,
+        ]) + body)
+        await writer.drain()
+
+    async def send_error(self, writer, status, error_type, message, headers=()):
+        # 与 Anthropic API 相同的错误格式，Claude Code 能直接显示
+        await self.send_json(
+            writer, status, {"type": "error", "error": {"type": error_type, "message": message}},
+            headers=headers,
+        )
+
+
+class GatewayThread(QThread):
+    """Runs a Gateway on a private event loop until stop() is called
+
+    The route and settings are only applied from a callback on that loop,
+    never while a request coroutine is mid-step, and the response cache and
+    usage store they create are opened on the loop's thread.
+    """
+
+    started_ok = pyqtSignal(int)  # port
+    failed = pyqtSignal(str)
+
+    def __init__(self, gateway, route, settings, parent=None):
+        super().__init__(parent)
+        self.gateway = gateway
+        self.loop = None
+        self._stop_event = None
+        # 一次赋值替换 (route, settings)，事件循环总是读到配对的一组
+        self._config = (route, settings)
+
+    def configure(self, route, settings):
+        """Hand the gateway a new route and settings; applied on its event loop"""
+        self._config = (route, settings)
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self._apply)
+
+    def _apply(self):
+        route, settings = self._config
+        self.gateway.set_route(route)
+        self.gateway.apply_settings(settings)
+
+    def run(self):
+        asyncio.run(self._main())
+
+    async def _main(self):
+        self.loop = asyncio.get_running_loop()
+        self._stop_event = asyncio.Event()
+        self._apply()
+        try:
+            await self.gateway.start()
+        except OSError as e:
+            self.failed.emit(str(e))
+            return
+        self.started_ok.emit(self.gateway.port)
+        try:
+            await self._stop_event.wait()
+        finally:
+            await self.gateway.close()
+
+    def call(self, func, timeout=2.0):
+        """Run func() on the gateway's event loop and return its result"""
+        future = concurrent.futures.Future()
+
+        def run():
+            try:
+                future.set_result(func())
+            except Exception as e:
+                future.set_exception(e)
+
+        self.loop.call_soon_threadsafe(run)
+        return future.result(timeout)
+
+    def stop(self, timeout_ms=3000):
+        if self.loop is not None and self._stop_event is not None:
+            self.loop.call_soon_threadsafe(self._stop_event.set)
+        self.wait(timeout_ms)
+
+
+# --- 命令行：不启动界面，直接按配置运行网关 ---
+def main(argv=None):
+    import argparse
+    from pathlib import Path
+
+    parser = argparse.ArgumentParser(description="运行 Claude Model Manager 本地网关")
+    parser.add_argument("--port", type=int, help="监听端口（默认取配置）")
+    parser.add_argument("--profile", help="转发到指定模型配置（默认当前模型）")
+    args = parser.parse_args(argv)
+
+    config_file = Path.home() / ".claude-cli" / "config.json"
+    with open(config_file) as f:
+        config = json.load(f)
+    if args.profile:
+        if args.profile not in config.get("models", {}):
+            parser.error(f"未找到模型配置: {args.profile}")
+        config["active"] = args.profile
+    settings = gateway_settings(config)
+    if not settings["token"]:
+        parser.error("尚未生成网关 token，请先在界面中启用本地网关")
+
+    async def serve():
+        gateway = Gateway(
+            settings["token"], port=args.port or settings["port"], client=upstream_client(settings)
+        )
+        gateway.set_route(Route.from_config(config))
+        gateway.apply_settings(settings)
+        await gateway.start()
+        print(f"本地网关已启动: http://{HOST}:{gateway.port} → {config['active']}")
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await gateway.close()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Gateway service for Claude Model Manager
+Runs the local gateway for the GUI; the gateway module is only imported once it is enabled
+"""
+
+import concurrent.futures
+
+from PyQt6.QtCore import QObject, pyqtSignal
+
+
+def gateway_enabled(config):
+    # 与 gateway.gateway_settings 的默认值一致：未配置时为关闭、无 token
+    gateway = config.get("gateway", {})
+    return bool(gateway.get("enabled") and gateway.get("token"))
+
+
+class GatewayService(QObject):
+    """Starts, stops and re-routes the gateway as config["gateway"] and the active profile change
+
+    The gateway module (asyncio, ssl, sqlite3 and the transports) is only
+    imported when the gateway is enabled, so a disabled gateway costs
+    nothing at startup.
+    """
+
+    state_changed = pyqtSignal(str)
+
+    def __init__(self, config_getter, parent=None):
+        super().__init__(parent)
+        self.config_getter = config_getter
+        self.thread = None
+        self.requested_port = None
+        self.transport = None
+        self.running_port = None
+        self.error = None
+
+    def is_running(self):
+        return self.thread is not None and self.running_port is not None
+
+    def reconfigure(self):
+        """Apply config["gateway"]; restarts the server when the port, token or transport changed"""
+        config = self.config_getter()
+        if not gateway_enabled(config):
+            self.stop()
+            return
+        from gateway import (
+            Gateway, GatewayThread, Route, gateway_settings, transport_key, upstream_client,
+        )
+
+        settings = gateway_settings(config)
+        if self.thread is not None:
+            gateway = self.thread.gateway
+            if (gateway.token == settings["token"] and settings["port"] == self.requested_port
+                    and transport_key(settings) == self.transport):
+                self.sync()
+                return
+            self.stop()
+        self.requested_port = settings["port"]
+        self.transport = transport_key(settings)
+        self.error = None
+        gateway = Gateway(
+            settings["token"], port=settings["port"], client=upstream_client(settings)
+        )
+        self.thread = GatewayThread(gateway, Route.from_config(config), settings, self)
+        self.thread.started_ok.connect(self.on_started)
+        self.thread.failed.connect(self.on_failed)
+        self.thread.start()
+
+    def sync(self):
+        """Point the gateway at the current active profile and apply its settings; no restart"""
+        if self.thread is not None:
+            from gateway import Route, gateway_settings
+
+            config = self.config_getter()
+            # 交给网关的事件循环执行：缓存与用量库在网关线程中创建
+            self.thread.configure(Route.from_config(config), gateway_settings(config))
+
+    def stop(self):
+        if self.thread is not None:
+            self.thread.stop()
+            self.thread = None
+            self.running_port = None
+            self.state_changed.emit("stopped")
+
+    def stats(self):
+        # 统计数据在网关线程中读取，避免与正在进行的请求同时修改
+        if not self.is_running():
+            return None
+        try:
+            return self.thread.call(self.thread.gateway.snapshot)
+        except (concurrent.futures.TimeoutError, RuntimeError):
+            return None
+
+    def clear_cache(self):
+        """Delete every cached response, through the gateway when it is running"""
+        if self.is_running() and self.thread.gateway.cache is not None:
+            self.thread.call(self.thread.gateway.cache.clear, timeout=10.0)
+        else:
+            from response_cache import ResponseCache
+
+            ResponseCache().clear()
+
+    def on_started(self, port):
+        self.running_port = port
+        self.state_changed.emit("running")
+
+    def on_failed(self, error):
+        self.error = error
+        self.thread = None
+        self.running_port = None
+        self.state_changed.emit("failed")
@@ -0,0 +1,199 @@
+"""
+Endpoint health probe for Claude Model Manager
+Checks every profile's ANTHROPIC_BASE_URL concurrently with asyncio and records phase timings
+"""
+
+import asyncio
+import time
+
+from PyQt6.QtCore import QThread, pyqtSignal
+
+from http_client import AsyncHttpClient, HttpError
+from tracing import tracer
+
+MAX_CONCURRENCY = 64
+PROBE_TIMEOUT = 8.0
+
+
+class ProbeResult:
+    """Outcome of probing one profile's base URL"""
+
+    UP = "up"
+    DEGRADED = "degraded"
+    DOWN = "down"
+    UNKNOWN = "unknown"
+
+    def __init__(self, profile, url, status, http_status=None, timings=None, error=None):
+        self.profile = profile
+        self.url = url
+        self.status = status
+        self.http_status = http_status
+        self.timings = timings or {}
+        self.error = error
+        self.checked_at = time.time()
+
+    def summary(self):
+        if self.status == self.DOWN:
+            return f"{self.profile}: 不可用 ({self.error})"
+        parts = [f"HTTP {self.http_status}"]
+        for label, key in (("DNS", "dns_ms"), ("连接", "connect_ms"), ("TLS", "tls_ms"),
+                           ("首字节", "ttfb_ms"), ("总计", "total_ms")):
+            value = self.timings.get(key)
+            if value is not None:
+                parts.append(f"{label} {value:.0f}ms")
+        if self.timings.get("reused"):
+            parts.append("复用连接")
+        return f"{self.profile}: " + "，".join(parts)
+
+
+def classify(http_status):
+    # 任何 HTTP 响应都说明端点在线；鉴权失败等 4xx 交给凭证校验处理
+    return ProbeResult.DEGRADED if http_status >= 500 else ProbeResult.UP
+
+
+async def probe_url(client, url, timeout):
+    """Probe one URL; returns (status, http_status, timings, error)"""
+    try:
+        response, _ = await client.request("GET", url, timeout=timeout)
+    except (HttpError, OSError, ValueError) as e:
+        return ProbeResult.DOWN, None, {}, str(e) or type(e).__name__
+    return classify(response.status), response.status, response.timings.to_dict(), None
+
+
+async def probe_profiles(profiles, max_concurrency=MAX_CONCURRENCY, timeout=PROBE_TIMEOUT,
+                         client=None):
+    """Probe {name: base_url} concurrently; returns ProbeResults in input order
+
+    Profiles sharing a base URL are probed once. A semaphore bounds the number
+    of requests in flight and the client reuses connections per host.
+    """
+    by_url = {}
+    for name, url in profiles.items():
+        by_url.setdefault(url, []).append(name)
+    semaphore = asyncio.Semaphore(max_concurrency)
+    own_client = client is None
+    client = client or AsyncHttpClient()
+
+    async def bounded(url):
+        async with semaphore:
+            return url, await probe_url(client, url, timeout)
+
+    try:
+        outcomes = dict(await asyncio.gather(*(bounded(url) for url in by_url)))
+    finally:
+        if own_client:
+            await client.close()
+    results = {}
+    for url, names in by_url.items():
+        status, http_status, timings, error = outcomes[url]
+        for name in names:
+            results[name] = ProbeResult(name, url, status, http_status, timings, error)
+    return [results[name] for name in profiles]
+
+
+def profile_urls(config, names=None):
+    models = config.get("models", {})
+    names = models if names is None else names
+    return {
+        name: models[name]["ANTHROPIC_BASE_URL"]
+        for name in names
+        if models.get(name, {}).get("ANTHROPIC_BASE_URL")
+    }
+
+
+class HealthProbeThread(QThread):
+    """Runs one probe round on a private event loop and records latencies"""
+
+    results_ready = pyqtSignal(list)
+
+    def __init__(self, profiles, store=None, max_concurrency=MAX_CONCURRENCY,
+                 timeout=PROBE_TIMEOUT, parent=None):
+        super().__init__(parent)
+        self.profiles = profiles
+        self.store = store
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+
+    def run(self):
+        with tracer.span("health_probe", profiles=len(self.profiles)):
+            results = asyncio.run(
+                probe_profiles(self.profiles, self.max_concurrency, self.timeout)
+            )
+            if self.store is not None:
+                self.store.record_many(
+                    (r.profile, r.checked_at, r.timings.get("ttfb_ms"),
+                     r.timings.get("total_ms"), r.status != r.DOWN)
+                    for r in results
+                )
+                # 探测线程顺带清理过期样本，首轮探测即在启动后完成一次
+                self.store.prune_if_due()
+        self.results_ready.emit(results)
+
+
+# --- 命令行：探测已配置的模型，或对本地桩服务器压测 ---
+async def _stub_server(delay):
+    async def handle(reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                if delay:
+                    await asyncio.sleep(delay)
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nok")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, "127.0.0.1", 0)
+
+
+async def _run_stub(count, hosts, delay, max_concurrency):
+    servers = [await _stub_server(delay) for _ in range(hosts)]
+    ports = [server.sockets[0].getsockname()[1] for server in servers]
+    # 每个模型使用不同路径，避免按 URL 去重后只探测一次
+    profiles = {
+        f"stub-{i}": f"http://127.0.0.1:{ports[i % hosts]}/p{i}" for i in range(count)
+    }
+    started = time.perf_counter()
+    results = await probe_profiles(profiles, max_concurrency)
+    elapsed = time.perf_counter() - started
+    for server in servers:
+        server.close()
+        await server.wait_closed()
+    return results, elapsed
+
+
+def main(argv=None):
+    import argparse
+    import json
+    from pathlib import Path
+
+    parser = argparse.ArgumentParser(description="并发探测各模型 ANTHROPIC_BASE_URL 的可用性")
+    parser.add_argument("--stub", type=int, metavar="N", help="对本地桩服务器探测 N 个模型")
+    parser.add_argument("--stub-hosts", type=int, default=4, help="桩服务器数量")
+    parser.add_argument("--stub-delay", type=float, default=0.05, help="桩服务器响应延迟（秒）")
+    parser.add_argument("--concurrency", type=int, default=MAX_CONCURRENCY)
+    args = parser.parse_args(argv)
+
+    if args.stub:
+        results, elapsed = asyncio.run(
+            _run_stub(args.stub, args.stub_hosts, args.stub_delay, args.concurrency)
+        )
+        up = sum(1 for r in results if r.status == ProbeResult.UP)
+        reused = sum(1 for r in results if r.timings.get("reused"))
+        print(f"{len(results)} 个模型，{up} 个在线，{reused} 次复用连接，耗时 {elapsed:.2f} 秒")
+        return
+    config_file = Path.home() / ".claude-cli" / "config.json"
+    with open(config_file) as f:
+        config = json.load(f)
+    for result in asyncio.run(probe_profiles(profile_urls(config), args.concurrency)):
+        print(result.summary())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,430 @@
+"""
+HTTP/2 transport for Claude Model Manager
+Multiplexes gateway requests over a few h2 connections per host, falling back to HTTP/1.1
+"""
+
+import asyncio
+import ssl
+import time
+from http import HTTPStatus
+from urllib.parse import urlsplit
+
+try:
+    import h2.config
+    import h2.connection
+    import h2.errors
+    import h2.events
+    import h2.exceptions
+    import h2.settings
+except ImportError:  # h2 为可选依赖，未安装时只使用 HTTP/1.1
+    h2 = None
+
+from http_client import (
+    DEFAULT_TIMEOUT,
+    NO_BODY_STATUSES,
+    READ_CHUNK,
+    USER_AGENT,
+    AsyncHttpClient,
+    HttpError,
+    Timings,
+    header_dict,
+)
+
+DEFAULT_MAX_STREAMS = 100
+MAX_CONNECTIONS_PER_HOST = 4
+# 每个流的接收窗口：客户端读得慢时，上游在窗口用完后暂停发送该流
+STREAM_WINDOW = 1024 * 1024
+CONNECTION_WINDOW = 16 * 1024 * 1024
+# HTTP/2 中不允许出现的连接级请求头
+CONNECTION_HEADERS = {
+    "connection", "keep-alive", "proxy-connection", "transfer-encoding", "upgrade", "host", "te",
+}
+
+
+def available():
+    return h2 is not None
+
+
+class Http2Stream:
+    def __init__(self, stream_id):
+        self.stream_id = stream_id
+        # 结果是响应头；连接出错时结果为 None，错误放在 error 中
+        self.head = asyncio.get_running_loop().create_future()
+        self.chunks = asyncio.Queue()
+        self.error = None
+        self.ended = False
+
+    def respond(self, headers):
+        if not self.head.done():
+            self.head.set_result(headers)
+
+    def fail(self, error):
+        self.error = error
+        if not self.head.done():
+            self.head.set_result(None)
+        self.chunks.put_nowait(error)
+
+
+class Http2Connection:
+    """One h2 connection: a reader task dispatches frames to its open streams"""
+
+    def __init__(self, key, reader, writer, max_streams, on_change):
+        self.key = key
+        self.reader = reader
+        self.writer = writer
+        self.max_streams = max_streams
+        self.on_change = on_change
+        self.streams = {}
+        self.closed = False
+        self.window_open = asyncio.Event()
+        self.conn = h2.connection.H2Connection(
+            config=h2.config.H2Configuration(client_side=True, header_encoding="utf-8")
+        )
+        self.conn.initiate_connection()
+        self.conn.update_settings({
+            h2.settings.SettingCodes.ENABLE_PUSH: 0,
+            h2.settings.SettingCodes.INITIAL_WINDOW_SIZE: STREAM_WINDOW,
+        })
+        self.conn.increment_flow_control_window(CONNECTION_WINDOW - 65535)
+        self.flush()
+        self.task = asyncio.ensure_future(self._read_loop())
+
+    def capacity(self):
+        """Streams that may still be opened, within our cap and the server's"""
+        if self.closed:
+            return 0
+        limit = min(self.max_streams, self.conn.remote_settings.max_concurrent_streams)
+        return limit - len(self.streams)
+
+    def flush(self):
+        data = self.conn.data_to_send()
+        if data:
+            self.writer.write(data)
+
+    async def send_request(self, method, scheme, authority, target, headers, body):
+        stream = Http2Stream(self.conn.get_next_available_stream_id())
+        self.streams[stream.stream_id] = stream
+        try:
+            fields = [
+                (":method", method), (":scheme", scheme),
+                (":authority", authority), (":path", target),
+            ]
+            fields.extend(
+                (name.lower(), str(value)) for name, value in headers.items()
+                if name.lower() not in CONNECTION_HEADERS
+            )
+            names = {name for name, _ in fields}
+            if "user-agent" not in names:
+                fields.append(("user-agent", USER_AGENT))
+            if body and "content-length" not in names:
+                fields.append(("content-length", str(len(body))))
+            self.conn.send_headers(stream.stream_id, fields, end_stream=not body)
+            self.flush()
+            if body:
+                await self._send_body(stream.stream_id, body)
+            await self.writer.drain()
+        except (h2.exceptions.ProtocolError, ConnectionError) as e:
+            self.close_stream(stream, reset=True)
+            raise HttpError(f"HTTP/2 请求发送失败: {e}") from e
+        except BaseException:
+            self.close_stream(stream, reset=True)
+            raise
+        return stream
+
+    async def _send_body(self, stream_id, body):
+        view = memoryview(body)
+        while view:
+            window = min(
+                self.conn.local_flow_control_window(stream_id), self.conn.max_outbound_frame_size
+            )
+            if window <= 0:
+                # 等对端的 WINDOW_UPDATE；长上下文的请求体可能超过初始窗口
+                self.window_open.clear()
+                await self.writer.drain()
+                await self.window_open.wait()
+                if self.closed:
+                    raise HttpError("HTTP/2 连接已关闭")
+                continue
+            self.conn.send_data(stream_id, view[:window].tobytes())
+            view = view[window:]
+            self.flush()
+        self.conn.end_stream(stream_id)
+        self.flush()
+
+    def consumed(self, stream_id, length):
+        """The reader took `length` flow-controlled bytes; let the server send more"""
+        if not length or self.closed:
+            return
+        try:
+            self.conn.acknowledge_received_data(length, stream_id)
+        except h2.exceptions.ProtocolError:
+            return
+        self.flush()
+
+    def close_stream(self, stream, reset):
+        if self.streams.pop(stream.stream_id, None) is None:
+            return
+        if reset and not self.closed:
+            try:
+                self.conn.reset_stream(stream.stream_id, h2.errors.ErrorCodes.CANCEL)
+                self.flush()
+            except h2.exceptions.ProtocolError:
+                pass
+        self.on_change(self.key)
+
+    def close(self):
+        self.task.cancel()
+        self.writer.close()
+
+    async def _read_loop(self):
+        error = "连接已关闭"
+        try:
+            while True:
+                data = await self.reader.read(READ_CHUNK)
+                if not data:
+                    break
+                for event in self.conn.receive_data(data):
+                    self._handle(event)
+                self.flush()
+        except (OSError, ssl.SSLError, h2.exceptions.ProtocolError) as e:
+            error = str(e) or type(e).__name__
+        finally:
+            self.closed = True
+            self.window_open.set()
+            for stream in list(self.streams.values()):
+                stream.fail(HttpError(f"HTTP/2 连接中断: {error}"))
+            self.streams.clear()
+            self.writer.close()
+            self.on_change(self.key)
+
+    def _handle(self, event):
+        stream = self.streams.get(getattr(event, "stream_id", None))
+        if isinstance(event, h2.events.ResponseReceived):
+            if stream is not None:
+                stream.respond(event.headers)
+        elif isinstance(event, h2.events.DataReceived):
+            if stream is not None:
+                stream.chunks.put_nowait((event.data, event.flow_controlled_length))
+            else:
+                # 流已被放弃：立即归还窗口，避免占住整个连接
+                self.consumed(event.stream_id, event.flow_controlled_length)
+        elif isinstance(event, h2.events.StreamEnded):
+            if stream is not None:
+                stream.ended = True
+                stream.chunks.put_nowait(None)
+        elif isinstance(event, h2.events.StreamReset):
+            if stream is not None:
+                stream.fail(HttpError(f"上游重置了 HTTP/2 流（错误码 {event.error_code}）"))
+        elif isinstance(event, (h2.events.WindowUpdated, h2.events.RemoteSettingsChanged)):
+            self.window_open.set()
+            self.on_change(self.key)
+        elif isinstance(event, h2.events.ConnectionTerminated):
+            # GOAWAY：不再开新流，编号更大的流不会被处理
+            self.closed = True
+            for stream_id, other in list(self.streams.items()):
+                if event.last_stream_id is not None and stream_id > event.last_stream_id:
+                    other.fail(HttpError("上游关闭了 HTTP/2 连接"))
+            self.on_change(self.key)
+
+
+class Http2Response:
+    """Response on an HTTP/2 stream, with the interface of http_client.Response"""
+
+    def __init__(self, conn, stream, method, headers, timings, started):
+        self._conn = conn
+        self._stream = stream
+        self.method = method
+        self.status = int(next(value for name, value in headers if name == ":status"))
+        try:
+            self.reason = HTTPStatus(self.status).phrase
+        except ValueError:
+            self.reason = ""
+        self.raw_headers = [(name, value) for name, value in headers if not name.startswith(":")]
+        self.headers = header_dict(self.raw_headers)
+        self.timings = timings
+        self._started = started
+        self._done = False
+        self._has_body = method != "HEAD" and self.status not in NO_BODY_STATUSES
+
+    @property
+    def has_body(self):
+        return self._has_body
+
+    async def iter_chunks(self):
+        if self._done:
+            return
+        try:
+            while True:
+                item = await self._stream.chunks.get()
+                if item is None:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                data, length = item
+                if data:
+                    yield data
+                # 调用方处理完这一块才归还窗口，慢客户端会反压到上游
+                self._conn.consumed(self._stream.stream_id, length)
+        except BaseException:
+            self._finish(reset=True)
+            raise
+        self._finish(reset=False)
+
+    async def read(self):
+        return b"".join([chunk async for chunk in self.iter_chunks()])
+
+    def release(self):
+        self._finish(reset=not self._stream.ended)
+
+    def _finish(self, reset):
+        if self._done:
+            return
+        self._done = True
+        self.timings.total_ms = (time.perf_counter() - self._started) * 1000
+        self._conn.close_stream(self._stream, reset)
+
+
+class Http2Client:
+    """HTTP/2 client with the open() interface of AsyncHttpClient
+
+    HTTPS hosts are offered h2 and http/1.1 through ALPN. A host that picks
+    h2 gets at most max_connections connections, each carrying up to
+    max_streams concurrent streams (fewer if the server says so), and a new
+    connection is only opened when every existing one is full. A host that
+    picks http/1.1 is served by the wrapped HTTP/1.1 client from then on,
+    and the connection just negotiated is handed to its pool. Plain http://
+    URLs also use HTTP/1.1 unless cleartext is set (h2c with prior
+    knowledge, used by the benchmark stub).
+    """
+
+    def __init__(self, max_streams=DEFAULT_MAX_STREAMS, fallback=None, ssl_context=None,
+                 cleartext=False, max_connections=MAX_CONNECTIONS_PER_HOST):
+        self.max_streams = max_streams
+        self.fallback = fallback or AsyncHttpClient()
+        self.ssl_context = ssl_context or ssl.create_default_context()
+        self.ssl_context.set_alpn_protocols(["h2", "http/1.1"])
+        self.cleartext = cleartext
+        self.max_connections = max_connections
+        self.protocols = {}  # (scheme, host, port) → "h2" / "http/1.1"
+        self.connects = 0
+        self._conns = {}
+        self._connecting = set()
+        self._changed = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def request(self, method, url, headers=None, body=None, timeout=DEFAULT_TIMEOUT):
+        response = await self.open(method, url, headers, body, timeout)
+        data = await asyncio.wait_for(response.read(), timeout)
+        return response, data
+
+    async def open(self, method, url, headers=None, body=None, timeout=DEFAULT_TIMEOUT):
+        """Send a request and return once the response head has arrived"""
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise HttpError(f"不支持的 URL: {url}")
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        key = (parts.scheme, parts.hostname, port)
+        if (h2 is None or self.protocols.get(key) == "http/1.1"
+                or (parts.scheme == "http" and not self.cleartext)):
+            return await self.fallback.open(method, url, headers, body, timeout)
+        target = parts.path or "/"
+        if parts.query:
+            target += "?" + parts.query
+        authority = parts.hostname if parts.port is None else f"{parts.hostname}:{port}"
+        try:
+            response = await asyncio.wait_for(
+                self._open(key, method, authority, target, headers or {}, body), timeout
+            )
+        except asyncio.TimeoutError:
+            raise HttpError(f"请求超时（{timeout:g} 秒）")
+        if response is None:
+            return await self.fallback.open(method, url, headers, body, timeout)
+        return response
+
+    async def close(self):
+        conns = [conn for conns in self._conns.values() for conn in conns]
+        self._conns.clear()
+        for conn in conns:
+            conn.close()
+        await asyncio.gather(*(conn.task for conn in conns), return_exceptions=True)
+        await self.fallback.close()
+
+    def stats(self):
+        hosts = {}
+        for (scheme, host, port), protocol in self.protocols.items():
+            conns = self._conns.get((scheme, host, port), [])
+            hosts[f"{host}:{port}"] = {
+                "protocol": protocol,
+                "connections": len(conns),
+                "streams": sum(len(conn.streams) for conn in conns),
+            }
+        return {"connects": self.connects, "hosts": hosts}
+
+    # --- 内部实现 ---
+    async def _open(self, key, method, authority, target, headers, body):
+        timings = Timings()
+        started = time.perf_counter()
+        conn = await self._acquire(key, timings)
+        if conn is None:
+            return None
+        stream = await conn.send_request(method, key[0], authority, target, headers, body)
+        sent = time.perf_counter()
+        try:
+            head = await stream.head
+        except BaseException:
+            conn.close_stream(stream, reset=True)
+            raise
+        if head is None:
+            conn.close_stream(stream, reset=False)
+            raise stream.error
+        timings.ttfb_ms = (time.perf_counter() - sent) * 1000
+        return Http2Response(conn, stream, method, head, timings, started)
+
+    async def _acquire(self, key, timings):
+        """A connection with a free stream slot; None once the host chose HTTP/1.1"""
+        while True:
+            if self.protocols.get(key) == "http/1.1":
+                return None
+            conns = [conn for conn in self._conns.get(key, []) if not conn.closed]
+            self._conns[key] = conns
+            best = max(conns, key=lambda conn: conn.capacity(), default=None)
+            if best is not None and best.capacity() > 0:
+                timings.reused = True
+                return best
+            # 只有在所有连接都满、且没有正在建立的连接时才新建
+            if key not in self._connecting and len(conns) < self.max_connections:
+                self._connecting.add(key)
+                try:
+                    return await self._connect(key, timings)
+                finally:
+                    self._connecting.discard(key)
+                    self._notify(key)
+            changed = self._changed.setdefault(key, asyncio.Event())
+            await changed.wait()
+
+    async def _connect(self, key, timings):
+        conn = await self.fallback.connect(key, timings, self.ssl_context)
+        self.connects += 1
+        if key[0] == "https":
+            ssl_object = conn.writer.get_extra_info("ssl_object")
+            protocol = ssl_object.selected_alpn_protocol() if ssl_object else None
+            if protocol != "h2":
+                # 对端只支持 HTTP/1.1：刚建好的连接交给 HTTP/1.1 连接池继续用
+                self.protocols[key] = "http/1.1"
+                self.fallback.adopt(key, conn.reader, conn.writer)
+                return None
+        self.protocols[key] = "h2"
+        h2_conn = Http2Connection(key, conn.reader, conn.writer, self.max_streams, self._notify)
+        self._conns.setdefault(key, []).append(h2_conn)
+        return h2_conn
+
+    def _notify(self, key):
+        # 有流结束、连接建立或断开时唤醒等待空闲流的请求
+        changed = self._changed.pop(key, None)
+        if changed is not None:
+            changed.set()
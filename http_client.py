@@ -0,0 +1,444 @@
+"""
+Asyncio HTTP/1.1 client for Claude Model Manager
+Stdlib-only keep-alive client with per-host connection reuse and per-phase timings
+"""
+
+import asyncio
+import socket
+import ssl
+import time
+from urllib.parse import urlsplit
+
+DEFAULT_TIMEOUT = 10.0
+IDLE_TIMEOUT = 30.0
+DNS_TTL = 60.0
+MAX_PER_HOST = 8
+READ_CHUNK = 64 * 1024
+USER_AGENT = "Claude-Model-Manager"
+NO_BODY_STATUSES = (204, 304)
+# 只有这些方法在请求可能已送达后还能安全重发
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+
+
+class HttpError(Exception):
+    """Connection, protocol or timeout failure before a complete response head"""
+
+
+class RequestNotSent(HttpError):
+    """Failure before any byte of the request was written; safe to send it elsewhere"""
+
+
+# --- 报文解析（客户端与本地网关共用） ---
+async def read_head(reader, start=None):
+    """Read a start line and headers; returns (start_line, [(name, value), ...])
+
+    start is the first line when the caller has already read it.
+    """
+    if start is None:
+        start = await reader.readline()
+    if not start:
+        raise HttpError("连接已关闭")
+    headers = []
+    while True:
+        line = await reader.readline()
+        if not line:
+            raise HttpError("报文头不完整")
+        if line in (b"\r\n", b"\n"):
+            break
+        name, sep, value = line.decode("latin-1").partition(":")
+        if not sep:
+            raise HttpError(f"无效的报文头: {line[:80]!r}")
+        headers.append((name.strip(), value.strip()))
+    return start.decode("latin-1").rstrip("\r\n"), headers
+
+
+def header_dict(headers):
+    """Lower-cased lookup dict; repeated headers are joined with ", " """
+    result = {}
+    for name, value in headers:
+        key = name.lower()
+        result[key] = f"{result[key]}, {value}" if key in result else value
+    return result
+
+
+async def iter_body(reader, headers, read_to_eof=True):
+    """Yield body chunks framed by chunked encoding, Content-Length or EOF"""
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        while True:
+            size_line = await reader.readline()
+            if not size_line:
+                raise HttpError("chunked 报文体不完整")
+            size = int(size_line.split(b";", 1)[0].strip() or b"0", 16)
+            if size == 0:
+                # 跳过 trailer
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                return
+            yield await reader.readexactly(size)
+            await reader.readexactly(2)
+    elif "content-length" in headers:
+        remaining = int(headers["content-length"])
+        while remaining > 0:
+            chunk = await reader.read(min(READ_CHUNK, remaining))
+            if not chunk:
+                raise HttpError("报文体不完整")
+            remaining -= len(chunk)
+            yield chunk
+    elif read_to_eof:
+        while True:
+            chunk = await reader.read(READ_CHUNK)
+            if not chunk:
+                return
+            yield chunk
+
+
+class SseParser:
+    """Incremental text/event-stream parser; feed() bytes, get (event, data) pairs"""
+
+    def __init__(self):
+        self._buffer = b""
+        self._event = None
+        self._data = []
+
+    def feed(self, chunk):
+        self._buffer += chunk
+        events = []
+        while True:
+            line, sep, rest = self._buffer.partition(b"\n")
+            if not sep:
+                return events
+            self._buffer = rest
+            line = line.rstrip(b"\r").decode("utf-8", "replace")
+            if not line:
+                # 空行结束一个事件
+                if self._data or self._event:
+                    events.append((self._event or "message", "\n".join(self._data)))
+                self._event = None
+                self._data = []
+            elif line.startswith(":"):
+                continue
+            else:
+                field, _, value = line.partition(":")
+                value = value[1:] if value.startswith(" ") else value
+                if field == "event":
+                    self._event = value
+                elif field == "data":
+                    self._data.append(value)
+
+
+class Timings:
+    """Milliseconds spent in each phase; reused connections skip dns/connect/tls"""
+
+    __slots__ = ("dns_ms", "connect_ms", "tls_ms", "ttfb_ms", "total_ms", "reused")
+
+    def __init__(self):
+        self.dns_ms = None
+        self.connect_ms = None
+        self.tls_ms = None
+        self.ttfb_ms = None
+        self.total_ms = None
+        self.reused = False
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class Connection:
+    def __init__(self, key, reader, writer):
+        self.key = key
+        self.reader = reader
+        self.writer = writer
+        self.last_used = time.monotonic()
+
+    def usable(self, idle_timeout):
+        return (
+            not self.reader.at_eof()
+            and not self.writer.is_closing()
+            and time.monotonic() - self.last_used < idle_timeout
+        )
+
+    def close(self):
+        self.writer.close()
+
+
+class Response:
+    """Response whose head has been read; the body is read on demand
+
+    Call read() or iterate iter_chunks() to the end, or release(); the
+    connection goes back to the pool only after the body was fully read.
+    """
+
+    def __init__(self, client, conn, method, status, reason, raw_headers, timings, started):
+        self._client = client
+        self._conn = conn
+        self.method = method
+        self.status = status
+        self.reason = reason
+        self.raw_headers = raw_headers
+        self.headers = header_dict(raw_headers)
+        self.timings = timings
+        self._started = started
+        self._done = False
+        connection = self.headers.get("connection", "").lower()
+        framed = "content-length" in self.headers or "chunked" in self.headers.get(
+            "transfer-encoding", ""
+        ).lower()
+        self._has_body = method != "HEAD" and status not in NO_BODY_STATUSES and status >= 200
+        self._keep_alive = connection != "close" and (framed or not self._has_body)
+
+    @property
+    def has_body(self):
+        return self._has_body
+
+    async def iter_chunks(self):
+        if self._done:
+            return
+        try:
+            if self._has_body:
+                async for chunk in iter_body(self._conn.reader, self.headers):
+                    yield chunk
+        except BaseException:
+            self._finish(reusable=False)
+            raise
+        self._finish(reusable=self._keep_alive)
+
+    async def read(self):
+        return b"".join([chunk async for chunk in self.iter_chunks()])
+
+    def release(self):
+        """Give the connection back (or close it if the body was not consumed)"""
+        self._finish(reusable=False)
+
+    def _finish(self, reusable):
+        if self._done:
+            return
+        self._done = True
+        self.timings.total_ms = (time.perf_counter() - self._started) * 1000
+        self._client._release(self._conn, reusable)
+
+
+class AsyncHttpClient:
+    """Keep-alive HTTP/1.1 client
+
+    Idle connections are pooled per (scheme, host, port) and at most
+    max_per_host requests run against one host at a time. DNS answers are
+    cached for DNS_TTL so probing many profiles on one gateway resolves once.
+    """
+
+    def __init__(self, max_per_host=MAX_PER_HOST, ssl_context=None, idle_timeout=IDLE_TIMEOUT):
+        self.max_per_host = max_per_host
+        self.ssl_context = ssl_context or ssl.create_default_context()
+        self.idle_timeout = idle_timeout
+        self._idle = {}
+        self._limits = {}
+        self._dns = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def request(self, method, url, headers=None, body=None, timeout=DEFAULT_TIMEOUT):
+        """Send a request and read the whole body; returns (Response, bytes)"""
+        response = await self.open(method, url, headers, body, timeout)
+        data = await asyncio.wait_for(response.read(), timeout)
+        return response, data
+
+    async def open(self, method, url, headers=None, body=None, timeout=DEFAULT_TIMEOUT):
+        """Send a request and return once the response head has arrived"""
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise HttpError(f"不支持的 URL: {url}")
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        key = (parts.scheme, parts.hostname, port)
+        target = parts.path or "/"
+        if parts.query:
+            target += "?" + parts.query
+        host_header = parts.hostname if parts.port is None else f"{parts.hostname}:{port}"
+        payload = self._encode_request(method, target, host_header, headers or {}, body)
+
+        limit = self._limits.get(key)
+        if limit is None:
+            limit = self._limits[key] = asyncio.Semaphore(self.max_per_host)
+        await limit.acquire()
+        progress = {"written": False}
+        try:
+            return await asyncio.wait_for(self._send(key, method, payload, progress), timeout)
+        except asyncio.TimeoutError:
+            limit.release()
+            error = HttpError if progress["written"] else RequestNotSent
+            raise error(f"请求超时（{timeout:g} 秒）")
+        except BaseException:
+            limit.release()
+            raise
+
+    def adopt(self, key, reader, writer):
+        """Pool a connection opened elsewhere (e.g. one whose ALPN chose HTTP/1.1)"""
+        self._idle.setdefault(key, []).append(Connection(key, reader, writer))
+
+    async def close(self):
+        conns = [conn for idle in self._idle.values() for conn in idle]
+        self._idle.clear()
+        for conn in conns:
+            conn.close()
+        for conn in conns:
+            try:
+                await conn.writer.wait_closed()
+            except (OSError, ssl.SSLError):
+                pass
+
+    # --- 内部实现 ---
+    def _encode_request(self, method, target, host_header, headers, body):
+        names = {name.lower() for name in headers}
+        lines = [f"{method} {target} HTTP/1.1"]
+        if "host" not in names:
+            lines.append(f"Host: {host_header}")
+        if "user-agent" not in names:
+            lines.append(f"User-Agent: {USER_AGENT}")
+        if "accept-encoding" not in names:
+            lines.append("Accept-Encoding: identity")
+        if body is not None and "content-length" not in names:
+            lines.append(f"Content-Length: {len(body)}")
+        lines.extend(f"{name}: {value}" for name, value in headers.items())
+        head = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+        return head + body if body else head
+
+    async def _send(self, key, method, payload, progress):
+        """Write the request and read the response head
+
+        A reused connection may have been closed by the peer while idle. An
+        idempotent request is resent once on a new connection if writing
+        failed or the connection ended before any response byte. Any other
+        request that was written is never resent, because the peer may
+        already have processed it.
+        """
+        retry = method in IDEMPOTENT_METHODS
+        for attempt in range(2):
+            timings = Timings()
+            started = time.perf_counter()
+            conn = self._take_idle(key)
+            if conn is None:
+                conn = await self.connect(key, timings)
+            else:
+                timings.reused = True
+            stale = retry and timings.reused and attempt == 0
+            try:
+                progress["written"] = True
+                conn.writer.write(payload)
+                await conn.writer.drain()
+            except ConnectionError as e:
+                conn.close()
+                if stale:
+                    continue
+                # 新连接上写入失败：对端没有收到完整请求
+                error = HttpError if timings.reused else RequestNotSent
+                raise error(str(e) or type(e).__name__) from e
+            except BaseException:
+                conn.close()
+                raise
+            sent = time.perf_counter()
+            try:
+                try:
+                    start = await conn.reader.readline()
+                except ConnectionError:
+                    start = b""
+                if not start and stale:
+                    # 复用的连接在返回任何响应字节之前就已关闭
+                    conn.close()
+                    continue
+                start_line, raw_headers = await read_head(conn.reader, start)
+            except (ConnectionError, HttpError, asyncio.IncompleteReadError) as e:
+                conn.close()
+                raise HttpError(str(e) or type(e).__name__) from e
+            except BaseException:
+                conn.close()
+                raise
+            timings.ttfb_ms = (time.perf_counter() - sent) * 1000
+            version, _, rest = start_line.partition(" ")
+            status_text, _, reason = rest.partition(" ")
+            if not version.startswith("HTTP/") or not status_text.isdigit():
+                conn.close()
+                raise HttpError(f"无效的状态行: {start_line[:80]}")
+            return Response(
+                self, conn, method, int(status_text), reason, raw_headers, timings, started
+            )
+
+    def _take_idle(self, key):
+        conns = self._idle.get(key)
+        while conns:
+            conn = conns.pop()
+            if conn.usable(self.idle_timeout):
+                return conn
+            conn.close()
+        return None
+
+    def _release(self, conn, reusable):
+        limit = self._limits.get(conn.key)
+        if limit is not None:
+            limit.release()
+        if reusable and not conn.writer.is_closing():
+            conn.last_used = time.monotonic()
+            self._idle.setdefault(conn.key, []).append(conn)
+        else:
+            conn.close()
+
+    async def _start_tls(self, loop, writer, protocol, reader, host, ssl_context):
+        if hasattr(writer, "start_tls"):
+            await writer.start_tls(ssl_context, server_hostname=host)
+            return writer
+        # Python 3.10 及更早版本没有 StreamWriter.start_tls
+        transport = await loop.start_tls(
+            writer.transport, protocol, ssl_context, server_hostname=host
+        )
+        return asyncio.StreamWriter(transport, protocol, reader, loop)
+
+    async def _resolve(self, host, port, timings):
+        cached = self._dns.get((host, port))
+        if cached and cached[0] > time.monotonic():
+            timings.dns_ms = 0.0
+            return cached[1]
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        infos = await loop.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        timings.dns_ms = (time.perf_counter() - started) * 1000
+        addresses = [(info[0], info[4]) for info in infos]
+        self._dns[(host, port)] = (time.monotonic() + DNS_TTL, addresses)
+        return addresses
+
+    async def connect(self, key, timings, ssl_context=None):
+        """Open a new connection for (scheme, host, port); ssl_context overrides the client's"""
+        scheme, host, port = key
+        loop = asyncio.get_running_loop()
+        try:
+            addresses = await self._resolve(host, port, timings)
+        except OSError as e:
+            raise RequestNotSent(f"DNS 解析失败: {e}") from e
+
+        error = None
+        for family, sockaddr in addresses:
+            reader = asyncio.StreamReader(limit=READ_CHUNK)
+            protocol = asyncio.StreamReaderProtocol(reader)
+            started = time.perf_counter()
+            try:
+                transport, _ = await loop.create_connection(
+                    lambda: protocol, sockaddr[0], sockaddr[1], family=family
+                )
+            except OSError as e:
+                error = e
+                continue
+            timings.connect_ms = (time.perf_counter() - started) * 1000
+            writer = asyncio.StreamWriter(transport, protocol, reader, loop)
+            if scheme == "https":
+                # TCP 建连与 TLS 握手分开进行，才能分别计时
+                started = time.perf_counter()
+                try:
+                    writer = await self._start_tls(
+                        loop, writer, protocol, reader, host, ssl_context or self.ssl_context
+                    )
+                except (OSError, ssl.SSLError) as e:
+                    writer.close()
+                    raise RequestNotSent(f"TLS 握手失败: {e}") from e
+                timings.tls_ms = (time.perf_counter() - started) * 1000
+            return Connection(key, reader, writer)
+        raise RequestNotSent(f"无法连接 {host}:{port}: {error}")
@@ -0,0 +1,410 @@
+"""
+Latency dashboard for Claude Model Manager
+Plots per-profile TTFB and total latency from the local store with LTTB downsampling
+"""
+
+import math
+import time
+
+from PyQt6.QtCore import QPointF, QRectF, Qt, QThread, QTimer, pyqtSignal
+from PyQt6.QtGui import QColor, QPainter, QPainterPath, QPen, QPixmap, QTransform
+from PyQt6.QtWidgets import (
+    QComboBox,
+    QDialog,
+    QHBoxLayout,
+    QLabel,
+    QVBoxLayout,
+    QWidget,
+)
+
+
+def lttb(points, threshold):
+    """Largest-Triangle-Three-Buckets downsampling of (x, y) points sorted by x
+
+    Keeps the first and last point and, from each bucket in between, the point
+    forming the largest triangle with the previously kept point and the average
+    of the next bucket. Peaks survive, which plain striding would drop.
+    """
+    n = len(points)
+    if threshold >= n or threshold < 3:
+        return list(points)
+    sampled = [points[0]]
+    every = (n - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        avg_start = int((i + 1) * every) + 1
+        avg_end = min(int((i + 2) * every) + 1, n)
+        avg_count = avg_end - avg_start
+        avg_x = sum(p[0] for p in points[avg_start:avg_end]) / avg_count
+        avg_y = sum(p[1] for p in points[avg_start:avg_end]) / avg_count
+
+        ax, ay = points[a]
+        best, best_area = a + 1, -1.0
+        for j in range(int(i * every) + 1, int((i + 1) * every) + 1):
+            x, y = points[j]
+            area = abs((ax - avg_x) * (y - ay) - (ax - x) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        sampled.append(points[best])
+        a = best
+    sampled.append(points[-1])
+    return sampled
+
+
+def nice_ceiling(value):
+    """Round up to 1, 2 or 5 times a power of ten"""
+    if value <= 0:
+        return 1.0
+    magnitude = 10 ** math.floor(math.log10(value))
+    for step in (1, 2, 5, 10):
+        if value <= step * magnitude:
+            return step * magnitude
+    return 10 * magnitude
+
+
+class LatencyLoadThread(QThread):
+    """Query one profile's window from the store and downsample it off the GUI thread"""
+
+    loaded = pyqtSignal(int, object)  # token, result dict
+
+    def __init__(self, store, profile, since, max_points, token, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.profile = profile
+        self.since = since
+        self.max_points = max_points
+        self.token = token
+
+    def run(self):
+        rows = self.store.query(self.profile, since=self.since)
+        ttfb = [(ts, v) for ts, v, _ in rows if v is not None]
+        total = [(ts, v) for ts, _, v in rows if v is not None]
+        self.loaded.emit(
+            self.token,
+            {
+                "count": len(rows),
+                "last_ts": rows[-1][0] if rows else self.since,
+                "ttfb": lttb(ttfb, self.max_points),
+                "total": lttb(total, self.max_points),
+            },
+        )
+
+
+class LatencyChart(QWidget):
+    """Line chart drawn with QPainter
+
+    Paths are kept in data coordinates and mapped with a QTransform, so new
+    samples are appended with lineTo() and only the rectangle they cover is
+    repainted. Axes and grid live in a cached pixmap that is rebuilt only when
+    the size or the visible range changes.
+    """
+
+    MARGIN_LEFT = 64
+    MARGIN_TOP = 12
+    MARGIN_RIGHT = 12
+    MARGIN_BOTTOM = 28
+    HEADROOM = 0.05  # 右侧预留的时间比例，减少新样本导致的整体重绘
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setMinimumSize(480, 240)
+        self.series = {}
+        self.origin = time.time()
+        self.span = 3600.0
+        self.x_min = -self.span
+        self.x_max = 0.0
+        self.y_max = 100.0
+        self.background = None
+
+    def add_series(self, key, color):
+        self.series[key] = {"color": QColor(color), "points": [], "path": QPainterPath()}
+
+    def plot_rect(self):
+        return QRectF(
+            self.MARGIN_LEFT,
+            self.MARGIN_TOP,
+            max(1, self.width() - self.MARGIN_LEFT - self.MARGIN_RIGHT),
+            max(1, self.height() - self.MARGIN_TOP - self.MARGIN_BOTTOM),
+        )
+
+    def plot_width(self):
+        return int(self.plot_rect().width())
+
+    def transform(self):
+        rect = self.plot_rect()
+        sx = rect.width() / (self.x_max - self.x_min)
+        sy = rect.height() / self.y_max
+        return QTransform(sx, 0, 0, -sy, rect.left() - self.x_min * sx, rect.bottom())
+
+    # --- 数据 ---
+    def set_window(self, span, now=None):
+        """Show the last span seconds ending at now, dropping all points"""
+        now = now or time.time()
+        # 路径坐标相对 origin，避免 epoch 秒数过大损失精度
+        self.origin = now
+        self.span = float(span)
+        self.x_max = self.span * self.HEADROOM
+        self.x_min = self.x_max - self.span * (1 + self.HEADROOM)
+        self.y_max = 100.0
+        for series in self.series.values():
+            series["points"] = []
+            series["path"] = QPainterPath()
+        self.invalidate()
+
+    def set_points(self, key, points):
+        series = self.series[key]
+        series["points"] = [(ts - self.origin, v) for ts, v in points]
+        path = QPainterPath()
+        for i, (x, y) in enumerate(series["points"]):
+            if i:
+                path.lineTo(x, y)
+            else:
+                path.moveTo(x, y)
+        series["path"] = path
+        self.fit_y()
+        self.invalidate()
+
+    def append_points(self, key, points):
+        if not points:
+            return
+        series = self.series[key]
+        new = [(ts - self.origin, v) for ts, v in points]
+        dirty = list(new)
+        if series["points"]:
+            dirty.append(series["points"][-1])
+        for x, y in new:
+            if series["path"].elementCount():
+                series["path"].lineTo(x, y)
+            else:
+                series["path"].moveTo(x, y)
+        series["points"].extend(new)
+
+        changed = False
+        last_x = new[-1][0]
+        if last_x > self.x_max:
+            self.x_max = last_x + self.span * self.HEADROOM
+            self.x_min = self.x_max - self.span * (1 + self.HEADROOM)
+            changed = True
+        peak = max(y for _, y in new)
+        if peak > self.y_max:
+            self.y_max = nice_ceiling(peak * 1.1)
+            changed = True
+        if changed:
+            self.invalidate()
+            return
+        # 坐标范围未变：只重绘新线段覆盖的区域
+        transform = self.transform()
+        mapped = [transform.map(QPointF(x, y)) for x, y in dirty]
+        xs = [p.x() for p in mapped]
+        ys = [p.y() for p in mapped]
+        rect = QRectF(min(xs), min(ys), max(xs) - min(xs), max(ys) - min(ys))
+        self.update(rect.adjusted(-3, -3, 3, 3).toAlignedRect())
+
+    def compact(self, max_points):
+        """Drop points left of the window and re-downsample once appends pile up"""
+        for key, series in self.series.items():
+            if len(series["points"]) <= max_points * 4:
+                continue
+            visible = [(x + self.origin, y) for x, y in series["points"] if x >= self.x_min]
+            self.set_points(key, lttb(visible, max_points))
+
+    def fit_y(self):
+        peak = 0.0
+        for series in self.series.values():
+            for x, y in series["points"]:
+                if x >= self.x_min and y > peak:
+                    peak = y
+        self.y_max = nice_ceiling(peak * 1.1) if peak else 100.0
+
+    def invalidate(self):
+        self.background = None
+        self.update()
+
+    # --- 绘制 ---
+    def resizeEvent(self, event):
+        self.background = None
+        super().resizeEvent(event)
+
+    def paintEvent(self, event):
+        if self.background is None or self.background.size() != self.size():
+            self.background = self.render_background()
+        painter = QPainter(self)
+        painter.drawPixmap(0, 0, self.background)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        painter.setClipRect(self.plot_rect().intersected(QRectF(event.rect())))
+        painter.setTransform(self.transform())
+        for series in self.series.values():
+            pen = QPen(series["color"], 1.5)
+            # cosmetic 画笔宽度不随坐标变换缩放
+            pen.setCosmetic(True)
+            painter.setPen(pen)
+            painter.drawPath(series["path"])
+        painter.end()
+
+    def render_background(self):
+        pixmap = QPixmap(self.size())
+        pixmap.fill(self.palette().color(self.backgroundRole()))
+        painter = QPainter(pixmap)
+        rect = self.plot_rect()
+        painter.fillRect(rect, QColor("white"))
+        grid_pen = QPen(QColor("#e0e0e0"))
+        text_color = self.palette().color(self.foregroundRole())
+
+        # 纵轴：毫秒
+        for i in range(5):
+            value = self.y_max * i / 4
+            y = rect.bottom() - rect.height() * i / 4
+            painter.setPen(grid_pen)
+            painter.drawLine(QPointF(rect.left(), y), QPointF(rect.right(), y))
+            painter.setPen(text_color)
+            painter.drawText(
+                QRectF(0, y - 8, self.MARGIN_LEFT - 6, 16),
+                Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter,
+                f"{value:.0f} ms",
+            )
+
+        # 横轴：时间
+        fmt = "%H:%M" if self.span <= 86400 else "%m-%d %H:%M"
+        for i in range(5):
+            x_value = self.x_min + (self.x_max - self.x_min) * i / 4
+            x = rect.left() + rect.width() * i / 4
+            painter.setPen(grid_pen)
+            painter.drawLine(QPointF(x, rect.top()), QPointF(x, rect.bottom()))
+            painter.setPen(text_color)
+            label = time.strftime(fmt, time.localtime(self.origin + x_value))
+            painter.drawText(
+                QRectF(min(x - 50, self.width() - 100), rect.bottom() + 4, 100, 20),
+                Qt.AlignmentFlag.AlignHCenter | Qt.AlignmentFlag.AlignTop,
+                label,
+            )
+        painter.setPen(QPen(QColor("#999999")))
+        painter.drawRect(rect)
+        painter.end()
+        return pixmap
+
+
+class LatencyDashboard(QDialog):
+    """Per-profile latency panel; polls the store for new samples while visible"""
+
+    RANGES = [
+        ("最近 1 小时", 3600),
+        ("最近 24 小时", 24 * 3600),
+        ("最近 7 天", 7 * 24 * 3600),
+    ]
+    REFRESH_MS = 5000
+    SERIES = [("ttfb", "首字节 (TTFB)", "#1f77b4"), ("total", "总耗时", "#ff7f0e")]
+
+    def __init__(self, store, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("延迟面板")
+        self.resize(720, 420)
+        self.store = store
+        self.load_token = 0
+        self.last_ts = None
+        self.sample_count = 0
+
+        layout = QVBoxLayout(self)
+        controls = QHBoxLayout()
+        self.profile_combo = QComboBox()
+        self.profile_combo.setMinimumWidth(220)
+        self.range_combo = QComboBox()
+        for label, span in self.RANGES:
+            self.range_combo.addItem(label, span)
+        controls.addWidget(QLabel("模型:"))
+        controls.addWidget(self.profile_combo, 1)
+        controls.addWidget(QLabel("时间范围:"))
+        controls.addWidget(self.range_combo)
+        layout.addLayout(controls)
+
+        self.chart = LatencyChart()
+        legend = QHBoxLayout()
+        for key, label, color in self.SERIES:
+            self.chart.add_series(key, color)
+            legend.addWidget(QLabel(f'<span style="color:{color}">■</span> {label}'))
+        legend.addStretch()
+        layout.addLayout(legend)
+        layout.addWidget(self.chart, 1)
+        self.status_label = QLabel()
+        layout.addWidget(self.status_label)
+
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(self.REFRESH_MS)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.profile_combo.currentIndexChanged.connect(self.reload)
+        self.range_combo.currentIndexChanged.connect(self.reload)
+
+    def set_profiles(self, names, current=None):
+        """Fill the profile selector; profiles that only exist in the store are kept too"""
+        selected = current or self.profile_combo.currentText()
+        names = list(dict.fromkeys(list(names) + self.store.profiles()))
+        self.profile_combo.blockSignals(True)
+        self.profile_combo.clear()
+        self.profile_combo.addItems(names)
+        if selected in names:
+            self.profile_combo.setCurrentIndex(names.index(selected))
+        self.profile_combo.blockSignals(False)
+        self.reload()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.refresh_timer.start()
+
+    def hideEvent(self, event):
+        self.refresh_timer.stop()
+        super().hideEvent(event)
+
+    def reload(self):
+        """Full reload of the selected window in a background thread"""
+        profile = self.profile_combo.currentText()
+        span = self.range_combo.currentData()
+        now = time.time()
+        self.chart.set_window(span, now)
+        # 旧线程的结果通过 token 丢弃
+        self.load_token += 1
+        self.last_ts = None
+        self.sample_count = 0
+        if not profile:
+            self.status_label.setText("暂无数据")
+            return
+        self.status_label.setText("加载中...")
+        thread = LatencyLoadThread(
+            self.store, profile, now - span, self.chart.plot_width(), self.load_token, self
+        )
+        thread.loaded.connect(self.on_loaded)
+        thread.finished.connect(thread.deleteLater)
+        thread.start()
+
+    def on_loaded(self, token, result):
+        if token != self.load_token:
+            return
+        self.last_ts = result["last_ts"]
+        self.sample_count = result["count"]
+        for key, _, _ in self.SERIES:
+            self.chart.set_points(key, result[key])
+        self.update_status()
+
+    def refresh(self):
+        """Append samples newer than the last one seen"""
+        profile = self.profile_combo.currentText()
+        if not profile or self.last_ts is None:
+            return
+        rows = self.store.query(profile, since=self.last_ts)
+        if not rows:
+            return
+        self.last_ts = rows[-1][0]
+        self.sample_count += len(rows)
+        self.chart.append_points("ttfb", [(ts, v) for ts, v, _ in rows if v is not None])
+        self.chart.append_points("total", [(ts, v) for ts, _, v in rows if v is not None])
+        self.chart.compact(self.chart.plot_width())
+        self.update_status()
+
+    def update_status(self):
+        if not self.sample_count:
+            self.status_label.setText("该时间范围内暂无样本")
+            return
+        latest = self.chart.series["total"]["points"] or self.chart.series["ttfb"]["points"]
+        shown = sum(len(s["points"]) for s in self.chart.series.values())
+        text = f"样本数 {self.sample_count}，绘制 {shown} 个点"
+        if latest:
+            text += f"，最近一次 {latest[-1][1]:.0f} ms"
+        self.status_label.setText(text)
@@ -0,0 +1,96 @@
+"""
+Latency time-series store for Claude Model Manager
+Per-profile TTFB and total request latency samples kept in a local SQLite file
+"""
+
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+DB_FILE = Path.home() / ".claude-cli" / "latency.db"
+RETENTION_SECONDS = 30 * 24 * 3600
+PRUNE_INTERVAL = 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS samples (
+    profile TEXT NOT NULL,
+    ts REAL NOT NULL,
+    ttfb_ms REAL,
+    total_ms REAL,
+    ok INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS samples_profile_ts ON samples (profile, ts);
+"""
+
+
+class LatencyStore:
+    """Append-only samples table indexed by (profile, ts)
+
+    One connection shared by the GUI thread and background writers; every
+    call holds a lock, so each statement runs alone. WAL keeps readers and the
+    writer from blocking each other across processes.
+    """
+
+    def __init__(self, path=DB_FILE):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._pruned_at = None
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+
+    def record(self, profile, ttfb_ms, total_ms, ok=True, ts=None):
+        self.record_many([(profile, ts or time.time(), ttfb_ms, total_ms, ok)])
+
+    def record_many(self, rows):
+        """rows: iterable of (profile, ts, ttfb_ms, total_ms, ok)"""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO samples (profile, ts, ttfb_ms, total_ms, ok) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(p, ts, ttfb, total, int(bool(ok))) for p, ts, ttfb, total, ok in rows],
+            )
+
+    def query(self, profile, since=None, until=None):
+        """Successful samples as (ts, ttfb_ms, total_ms), oldest first
+
+        since is exclusive so callers can poll with the last ts they have seen.
+        """
+        sql = "SELECT ts, ttfb_ms, total_ms FROM samples WHERE profile = ? AND ok = 1"
+        params = [profile]
+        if since is not None:
+            sql += " AND ts > ?"
+            params.append(since)
+        if until is not None:
+            sql += " AND ts <= ?"
+            params.append(until)
+        sql += " ORDER BY ts"
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def profiles(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT DISTINCT profile FROM samples").fetchall()
+        return sorted(row[0] for row in rows)
+
+    def prune(self, max_age=RETENTION_SECONDS):
+        with self._lock, self._conn:
+            self._pruned_at = time.time()
+            cursor = self._conn.execute(
+                "DELETE FROM samples WHERE ts < ?", (self._pruned_at - max_age,)
+            )
+            return cursor.rowcount
+
+    def prune_if_due(self, interval=PRUNE_INTERVAL):
+        """Prune on first use and then at most once per interval; call off the GUI thread"""
+        if self._pruned_at is not None and time.time() - self._pruned_at < interval:
+            return 0
+        return self.prune()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
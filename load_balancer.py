@@ -0,0 +1,149 @@
+"""
+Load balancing for Claude Model Manager
+Chooses among the credentials/base URLs of one profile for the local gateway
+"""
+
+import bisect
+import hashlib
+import json
+import math
+
+# 每单位权重在哈希环上的虚拟节点数，节点越多分布越均匀
+VIRTUAL_NODES = 160
+# 有界负载：成员的在途请求超过平均值的这个倍数时，会话改派到环上的下一个成员
+LOAD_FACTOR = 2.0
+
+
+class MemberState:
+    """Per-member counters kept by the gateway across route swaps"""
+
+    __slots__ = ("outstanding", "requests", "breaker")
+
+    def __init__(self, breaker):
+        self.outstanding = 0
+        self.requests = 0
+        self.breaker = breaker
+
+    def acquire(self):
+        self.outstanding += 1
+        self.requests += 1
+
+    def release(self):
+        self.outstanding -= 1
+
+
+def least_outstanding(members, state_of, exclude=(), start=0):
+    """Weighted least-outstanding-requests choice, or None if no member is available
+
+    A member's load is (outstanding + 1) / weight, i.e. the share it would
+    carry after taking this request, so a weight-2 key takes about twice the
+    concurrent requests of a weight-1 key. Ties go to the first member at or
+    after `start`, which callers rotate so idle members are used in turn.
+    Counters are updated in O(1) by MemberState; choosing is a scan over the
+    few members of one profile.
+    """
+    best = None
+    best_load = None
+    count = len(members)
+    for offset in range(count):
+        member = members[(start + offset) % count]
+        if member.key in exclude:
+            continue
+        state = state_of(member.key)
+        if not state.breaker.available():
+            continue
+        load = (state.outstanding + 1) / member.weight
+        if best is None or load < best_load:
+            best = member
+            best_load = load
+    return best
+
+
+def _hash(data):
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "big")
+
+
+def _strip_cache_control(value):
+    # Claude Code 每轮都会把缓存断点移到最新的消息上，断点位置不应影响会话归属
+    if isinstance(value, dict):
+        return {k: _strip_cache_control(v) for k, v in value.items() if k != "cache_control"}
+    if isinstance(value, list):
+        return [_strip_cache_control(v) for v in value]
+    return value
+
+
+def conversation_key(payload):
+    """Hash of the part of a Messages request that stays the same for a whole conversation
+
+    That is the model, the system prompt and the first message: later turns
+    only append to messages, so every turn of one conversation gets the same
+    key. None when there is no message to go by.
+    """
+    messages = payload.get("messages")
+    if not isinstance(messages, list) or not messages:
+        return None
+    prefix = [payload.get("model"), payload.get("system"), messages[0]]
+    data = json.dumps(
+        _strip_cache_control(prefix), sort_keys=True, separators=(",", ":"), ensure_ascii=False
+    )
+    return _hash(data.encode("utf-8"))
+
+
+class HashRing:
+    """Consistent-hash ring over the members of one profile
+
+    Each member gets VIRTUAL_NODES points per unit of weight, placed by
+    hashing its key. Keys come from the member's own base URL and token
+    (gateway.member_key), not its position in the pool, so a conversation
+    keeps its member when other members are added, removed or reweighted:
+    removing a member only moves the conversations it owned, adding one
+    takes about 1/n of them.
+    """
+
+    def __init__(self, members, replicas=VIRTUAL_NODES):
+        points = []
+        for member in members:
+            for i in range(max(1, round(replicas * member.weight))):
+                points.append((_hash(f"{member.key}#{i}".encode("utf-8")), member))
+        points.sort(key=lambda point: point[0])
+        self.hashes = [point[0] for point in points]
+        self.points = [point[1] for point in points]
+        self.members = list(members)
+
+    def walk(self, key):
+        """Members in ring order starting from the one that owns key, each once"""
+        seen = set()
+        count = len(self.points)
+        start = bisect.bisect(self.hashes, key)
+        for offset in range(count):
+            member = self.points[(start + offset) % count]
+            if member.key not in seen:
+                seen.add(member.key)
+                yield member
+                if len(seen) == len(self.members):
+                    return
+
+    def home(self, key):
+        return next(self.walk(key), None)
+
+    def pick(self, key, state_of, exclude=(), load_factor=LOAD_FACTOR):
+        """The first member from key's position that is available and not overloaded, or None
+
+        Bounded-load consistent hashing: a member may carry at most
+        load_factor times its weighted share of the requests in flight on
+        this ring. A hot conversation therefore spills over to the next
+        member on the ring (the same one every time) instead of piling onto
+        one credential; None means the caller should fall back to
+        least_outstanding.
+        """
+        states = {member.key: state_of(member.key) for member in self.members}
+        in_flight = sum(state.outstanding for state in states.values()) + 1
+        total_weight = sum(member.weight for member in self.members)
+        for member in self.walk(key):
+            state = states[member.key]
+            if member.key in exclude or not state.breaker.available():
+                continue
+            bound = math.ceil(load_factor * in_flight * member.weight / total_weight)
+            if state.outstanding + 1 <= bound:
+                return member
+        return None
@@ -0,0 +1,280 @@
+"""
+Model catalog for Claude Model Manager
+Discovers the model IDs each gateway serves via its models listing endpoint, cached per endpoint
+"""
+
+import asyncio
+import json
+import os
+import time
+from pathlib import Path
+from urllib.parse import urlencode, urlsplit
+
+from PyQt6.QtCore import QThread, pyqtSignal
+
+from http_client import AsyncHttpClient, HttpError
+from tracing import tracer
+
+CACHE_FILE = Path.home() / ".claude-cli" / "model_catalog.json"
+# 过期后先带 If-None-Match 重新验证，未变化时服务端只返回 304
+TTL_SECONDS = 6 * 3600
+MAX_CONCURRENCY = 16
+TIMEOUT = 15.0
+PAGE_LIMIT = 1000
+MAX_PAGES = 10
+ANTHROPIC_VERSION = "2023-06-01"
+
+
+def endpoint_key(base_url):
+    """Cache key: scheme, lower-cased host and base path of ANTHROPIC_BASE_URL"""
+    parts = urlsplit(base_url.strip())
+    return f"{parts.scheme}://{parts.netloc.lower()}{parts.path.rstrip('/')}"
+
+
+def models_url(base_url, after_id=None):
+    query = {"limit": PAGE_LIMIT}
+    if after_id:
+        query["after_id"] = after_id
+    return base_url.rstrip("/") + "/v1/models?" + urlencode(query)
+
+
+def parse_models(data):
+    """(model_ids, next_after_id) from an Anthropic or OpenAI style listing"""
+    payload = json.loads(data)
+    items = payload.get("data", []) if isinstance(payload, dict) else payload
+    ids = [item["id"] for item in items if isinstance(item, dict) and item.get("id")]
+    after = payload.get("last_id") if isinstance(payload, dict) and payload.get("has_more") else None
+    return ids, after
+
+
+class CatalogResult:
+    """Model IDs served behind one profile's base URL"""
+
+    def __init__(self, profile, endpoint, models=None, error=None, fetched_at=None,
+                 cached=False, revalidated=False):
+        self.profile = profile
+        self.endpoint = endpoint
+        self.models = models or []
+        self.error = error
+        self.fetched_at = fetched_at or time.time()
+        self.cached = cached
+        self.revalidated = revalidated
+
+    def summary(self, limit=None):
+        if self.error and not self.models:
+            return f"获取失败: {self.error}"
+        if not self.models:
+            return "端点未返回任何模型"
+        shown = self.models if limit is None else self.models[:limit]
+        text = "，".join(shown)
+        if len(shown) < len(self.models):
+            text += f" 等 {len(self.models)} 个"
+        if self.error:
+            text += f"（刷新失败，显示旧目录: {self.error}）"
+        return text
+
+
+class CatalogCache:
+    """JSON file of {endpoint: {models, etag, fetched_at}}"""
+
+    def __init__(self, path=CACHE_FILE):
+        self.path = Path(path)
+        try:
+            with open(self.path) as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def fresh(self, entry, now=None):
+        return (now or time.time()) - entry["fetched_at"] <= TTL_SECONDS
+
+    def put(self, key, models, etag, fetched_at):
+        self.entries[key] = {"models": models, "etag": etag, "fetched_at": fetched_at}
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.path.with_suffix(".json.tmp")
+        with open(tmp_file, "w") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_file, self.path)
+
+
+def request_headers(model_data, etag=None):
+    token = model_data["ANTHROPIC_AUTH_TOKEN"]
+    # Anthropic 官方接口认 x-api-key，多数兼容网关认 Bearer，两者都带上
+    headers = {
+        "x-api-key": token,
+        "Authorization": f"Bearer {token}",
+        "anthropic-version": ANTHROPIC_VERSION,
+        "Accept": "application/json",
+    }
+    if etag:
+        headers["If-None-Match"] = etag
+    return headers
+
+
+async def fetch_models(client, model_data, etag=None, timeout=TIMEOUT):
+    """List every model behind one base URL
+
+    Returns (models, etag), or (None, etag) when the server answered 304 Not
+    Modified to the conditional request. Pages are followed via has_more.
+    """
+    base_url = model_data["ANTHROPIC_BASE_URL"]
+    response, data = await client.request(
+        "GET", models_url(base_url), request_headers(model_data, etag), timeout=timeout
+    )
+    if response.status == 304:
+        return None, etag
+    if response.status != 200:
+        raise HttpError(f"HTTP {response.status}")
+    new_etag = response.headers.get("etag")
+    models, after = parse_models(data)
+    for _ in range(MAX_PAGES - 1):
+        if not after:
+            break
+        response, data = await client.request(
+            "GET", models_url(base_url, after), request_headers(model_data), timeout=timeout
+        )
+        if response.status != 200:
+            raise HttpError(f"HTTP {response.status}")
+        page, after = parse_models(data)
+        models.extend(page)
+    return models, new_etag
+
+
+async def discover(models, cache, max_concurrency=MAX_CONCURRENCY, timeout=TIMEOUT,
+                   client=None, refresh=False):
+    """Catalog for {name: model_data}; returns CatalogResults in input order
+
+    Profiles sharing an endpoint are fetched once. Fresh cache entries are
+    used as is, stale ones are revalidated with their ETag, and refresh=True
+    revalidates every entry. The cache is updated but not saved.
+    """
+    by_key = {}
+    for name, model in models.items():
+        if model.get("ANTHROPIC_AUTH_TOKEN") and model.get("ANTHROPIC_BASE_URL"):
+            by_key.setdefault(endpoint_key(model["ANTHROPIC_BASE_URL"]), []).append(name)
+
+    outcomes = {}
+    pending = []
+    for key, names in by_key.items():
+        entry = cache.get(key)
+        if entry is not None and not refresh and cache.fresh(entry):
+            outcomes[key] = (entry["models"], None, entry["fetched_at"], True, False)
+        else:
+            pending.append(key)
+
+    if pending:
+        semaphore = asyncio.Semaphore(max_concurrency)
+        own_client = client is None
+        client = client or AsyncHttpClient()
+
+        async def bounded(key):
+            entry = cache.get(key)
+            async with semaphore:
+                try:
+                    fetched, etag = await fetch_models(
+                        client, models[by_key[key][0]], entry and entry.get("etag"), timeout
+                    )
+                except (HttpError, OSError, ValueError) as e:
+                    error = str(e) or type(e).__name__
+                    if entry is not None:
+                        # 刷新失败时继续使用旧目录，并附上错误
+                        return key, (entry["models"], error, entry["fetched_at"], True, False)
+                    return key, (None, error, None, False, False)
+            now = time.time()
+            revalidated = fetched is None
+            if revalidated:
+                fetched = entry["models"]
+            cache.put(key, fetched, etag, now)
+            return key, (fetched, None, now, False, revalidated)
+
+        try:
+            outcomes.update(await asyncio.gather(*(bounded(key) for key in pending)))
+        finally:
+            if own_client:
+                await client.close()
+
+    results = {}
+    for key, names in by_key.items():
+        found, error, fetched_at, cached, revalidated = outcomes[key]
+        for name in names:
+            results[name] = CatalogResult(name, key, found, error, fetched_at, cached, revalidated)
+    return [results[name] for name in models if name in results]
+
+
+class CatalogThread(QThread):
+    """Discovers catalogs on a private event loop and persists the cache"""
+
+    results_ready = pyqtSignal(list)
+
+    def __init__(self, models, cache_file=CACHE_FILE, refresh=False, parent=None):
+        super().__init__(parent)
+        self.models = models
+        self.cache_file = cache_file
+        self.refresh = refresh
+
+    def run(self):
+        with tracer.span("catalog.discover", profiles=len(self.models)):
+            cache = CatalogCache(self.cache_file)
+            results = asyncio.run(discover(self.models, cache, refresh=self.refresh))
+            if any(not r.cached for r in results if not r.error):
+                try:
+                    cache.save()
+                except OSError as e:
+                    print(f"无法写入模型目录缓存 {self.cache_file}: {e}")
+        self.results_ready.emit(results)
+
+
+def cached_models(base_url, cache_file=CACHE_FILE):
+    """Model IDs cached for base_url (possibly stale), for completing ANTHROPIC_MODEL"""
+    entry = CatalogCache(cache_file).get(endpoint_key(base_url))
+    return entry["models"] if entry else []
+
+
+# --- 命令行：列出各模型配置可用的模型 ID ---
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="列出各模型配置的网关提供的模型 ID")
+    parser.add_argument("names", nargs="*", metavar="NAME", help="只查询指定的模型配置")
+    parser.add_argument("--refresh", action="store_true", help="忽略缓存有效期，重新向网关确认")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出")
+    args = parser.parse_args(argv)
+
+    config_file = Path.home() / ".claude-cli" / "config.json"
+    with open(config_file) as f:
+        config = json.load(f)
+    all_models = config.get("models", {})
+    unknown = [name for name in args.names if name not in all_models]
+    if unknown:
+        parser.error(f"未找到模型配置: {', '.join(unknown)}")
+    names = args.names or list(all_models)
+    cache = CatalogCache()
+    results = asyncio.run(
+        discover({name: all_models[name] for name in names}, cache, refresh=args.refresh)
+    )
+    cache.save()
+    if args.json:
+        print(json.dumps(
+            {r.profile: {"endpoint": r.endpoint, "models": r.models, "error": r.error}
+             for r in results},
+            indent=2, ensure_ascii=False,
+        ))
+        return
+    for result in results:
+        if result.error:
+            print(f"{result.profile}  [{result.endpoint}]")
+            print(f"  获取失败: {result.error}")
+        else:
+            source = "缓存" if result.cached else ("304 未变化" if result.revalidated else "网关")
+            print(f"{result.profile}  [{result.endpoint}，来自{source}]")
+        for model_id in result.models:
+            print(f"  {model_id}")
+
+
+if __name__ == "__main__":
+    main()
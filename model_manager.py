@@ -1,5 +1,29 @@
-import sys, os, json, subprocess, requests
+import time
+
+_STARTUP_T0 = time.perf_counter()
+
+import sys, os, json, subprocess
 from pathlib import Path
+
+from startup_profile import StartupProfile
+
+startup_profile = StartupProfile(_STARTUP_T0, enabled="--startup-profile" in sys.argv)
+startup_profile.mark("import stdlib")
+
+if __name__ == "__main__":
+    # 已有实例在运行时把参数转交给它并立即退出，不加载界面
+    from single_instance import forward_to_running_instance
+
+    if forward_to_running_instance(sys.argv[1:]):
+        sys.exit(0)
+    startup_profile.mark("single-instance check")
+
+    if "--trace-memory" in sys.argv:
+        # 尽早启动 tracemalloc，诊断包才能看到整个会话的内存增长
+        from diagnostics import start_memory_tracing
+
+        start_memory_tracing()
+
 from PyQt6.QtWidgets import (
     QMainWindow,
     QApplication,
@@ -7,25 +31,36 @@ from PyQt6.QtWidgets import (
     QVBoxLayout,
     QHBoxLayout,
     QPushButton,
-    QListWidget,
+    QListView,
     QLineEdit,
     QLabel,
     QMessageBox,
     QTextEdit,
-    QMenu,
     QDialog,
     QDialogButtonBox,
     QFormLayout,
-    QProgressBar,
     QFrame,
-    QGroupBox,
-    QRadioButton,
+    QSystemTrayIcon,
+    QCheckBox,
+    QComboBox,
 )
-from PyQt6.QtGui import QClipboard, QIcon, QAction, QColor, QFont
-from PyQt6.QtCore import QThread, pyqtSignal, QTimer, Qt
+from PyQt6.QtGui import QIcon, QAction
+from PyQt6.QtCore import Qt, QTimer
 
-# 导入更新检查器
-from update_checker import UpdateManager
+startup_profile.mark("import PyQt6")
+
+# 更新检查器（及其依赖的 requests）在窗口显示后才导入，见 finish_startup
+from terminal_launcher import TerminalLauncher
+from profile_switcher import ProfileSwitcher
+from profile_model import ProfileListModel
+from profile_search import SearchIndexBuildThread
+from persistence import ConfigWriter
+from usage_ranking import UsageRanking
+from tracing import tracer
+from auto_select import AUTO_PROFILE, AutoSwitcher, auto_settings, set_auto_enabled
+from gateway_service import GatewayService, gateway_enabled
+
+startup_profile.mark("import app modules")
 
 CONFIG_DIR = Path.home() / ".claude-cli"
 CONFIG_FILE = CONFIG_DIR / "config.json"
@@ -43,6 +78,66 @@ DEFAULT_CONFIG = {
 
 os.makedirs(CONFIG_DIR, exist_ok=True)
 
+# 官方文档内容文本
+DOC_TEXT = (
+    "步骤 1：安装 Claude Code\n\n"
+    "NPM 安装\n"
+    "如果您已安装 Node.js 18 或更新版本：\n"
+    "npm install -g @anthropic-ai/claude-code\n\n"
+    "原生安装\n"
+    "或者，尝试我们新的原生安装，现在处于测试版。\n\n"
+    "macOS、Linux、WSL：\n"
+    "curl -fsSL claude.ai/install.sh | bash\n"
+    "Windows PowerShell：\n"
+    "irm https://claude.ai/install.ps1 | iex\n\n"
+    "步骤 2：开始您的第一个会话\n"
+    "在任何项目目录中打开终端并启动 Claude Code：\n"
+    "cd /path/to/your/project\n"
+    "claude\n"
+    "您将在新的交互式会话中看到 Claude Code 提示符：\n"
+    "✻ 欢迎使用 Claude Code！\n\n"
+    "官方地址: https://docs.anthropic.com/zh-CN/docs/claude-code/quickstart"
+)
+
+# Claude Code 命令说明
+MANUAL_TEXT = (
+    "/add-dir 添加新的工作目录\n"
+    "/agents 管理代理配置\n"
+    "/bashes 列出并管理后台bash shell\n"
+    "/bug 提交关于Claude Code的反馈\n"
+    "/clear 清除对话历史并释放上下文\n"
+    "/compact 清除对话历史但在上下文中保留摘要。可选：/compact [摘要指令]\n"
+    "/config 打开配置面板\n"
+    "/cost 显示当前会话的总成本和持续时间\n"
+    "/doctor 诊断并验证您的Claude Code安装和设置\n"
+    "/exit 退出REPL\n"
+    "/export 将当前对话导出到文件或剪贴板\n"
+    "/help 显示帮助和可用命令\n"
+    "/hooks 管理工具事件的钩子配置\n"
+    "/ide 管理IDE集成并显示状态\n"
+    "/init 使用代码库文档初始化新的CLAUDE.md文件\n"
+    "/install-github-app 为仓库设置Claude GitHub Actions\n"
+    "/login 使用您的Anthropic账户登录\n"
+    "/logout 从您的Anthropic账户登出\n"
+    "/mcp 管理MCP服务器\n"
+    "/memory 编辑Claude内存文件\n"
+    "/migrate-installer 从全局npm安装迁移到本地安装\n"
+    "/model 设置Claude Code的AI模型\n"
+    "/output-style 直接设置输出样式或从选择菜单中设置\n"
+    "/output-style:new 创建自定义输出样式\n"
+    "/permissions 管理允许和拒绝工具权限规则\n"
+    "/pr-comments 获取GitHub拉取请求的评论\n"
+    "/release-notes 查看发布说明\n"
+    "/resume 恢复对话\n"
+    "/review 审查拉取请求\n"
+    "/security-review 完成当前分支上待处理更改的安全审查\n"
+    "/status 显示Claude Code状态，包括版本、模型、账户、API连接和工具状态\n"
+    "/statusline 设置Claude Code的状态行UI\n"
+    "/terminal-setup 安装Shift+Enter键绑定用于换行\n"
+    "/upgrade 升级到Max以获得更高的速率限制和更多的Opus\n"
+    "/vim 在Vim和普通编辑模式之间切换\n"
+)
+
 
 # --- 配置文件读写 ---
 def load_config():
@@ -54,12 +149,18 @@ def load_config():
 
 
 def save_config(config):
-    with open(CONFIG_FILE, "w") as f:
-        json.dump(config, f, indent=2)
+    # 先写临时文件并 fsync，再原子替换，避免中途退出留下损坏的配置
+    tmp_file = CONFIG_FILE.with_suffix(".json.tmp")
+    with tracer.span("save_config", profiles=len(config.get("models", {}))):
+        with open(tmp_file, "w") as f:
+            json.dump(config, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, CONFIG_FILE)
 
 
 # --- 更新 env.sh ---
-def update_env_file(active_model, model_data):
+def render_env_file(model_data):
     lines = [f'export {k}="{v}"' for k, v in model_data.items()]
     content = "\n".join(lines)
     echo_lines = [
@@ -67,24 +168,160 @@ def update_env_file(active_model, model_data):
     ]
     for k in model_data.keys():
         echo_lines.append(f'echo "{k}=${k}"')
-    content = content + "\n\n" + "\n".join(echo_lines) + "\n"
-    with open(ENV_FILE, "w") as f:
-        f.write(content)
+    return content + "\n\n" + "\n".join(echo_lines) + "\n"
+
+
+def env_data_for(config):
+    """env.sh 的变量：启用本地网关时固定指向网关，否则为当前模型的配置"""
+    if not gateway_enabled(config):
+        return config["models"][config["active"]]
+    from gateway import env_for
+
+    return env_for(config)
+
+
+def update_env_file(active_model, model_data):
+    with tracer.span("update_env_file", profile=active_model):
+        content = render_env_file(model_data)
+        with open(ENV_FILE, "w") as f:
+            f.write(content)
     print(f"✅ 已更新环境变量文件: {ENV_FILE}")
 
 
+# --- 命令行参数 ---
+def parse_args(argv):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Claude CLI 模型管理工具")
+    parser.add_argument("--switch", metavar="NAME", help="切换到指定模型")
+    parser.add_argument(
+        "--startup-profile", action="store_true", help="输出导入与启动各阶段耗时"
+    )
+    parser.add_argument(
+        "--trace", action="store_true", help="启动时即记录各操作阶段耗时（性能面板）"
+    )
+    parser.add_argument(
+        "--diagnostics",
+        nargs="?",
+        const="",
+        metavar="PATH",
+        help="导出诊断包（默认保存到 ~/.claude-cli/diagnostics/）",
+    )
+    parser.add_argument(
+        "--trace-memory", action="store_true", help="启动时即开启 tracemalloc，便于诊断内存增长"
+    )
+    parser.add_argument(
+        "--tray", action="store_true", help="常驻系统托盘，需要时再打开主窗口"
+    )
+    # Qt 自身的参数（如 -platform）交给 QApplication 处理
+    args, _ = parser.parse_known_args(argv)
+    return args
+
+
 # --- GUI 主窗口 ---
 class ModelManager(QMainWindow):
-    def __init__(self):
+    def __init__(self, tray=None):
         super().__init__()
         self.setWindowTitle("Claude / Kimi-K2 模型管理")
         self.resize(600, 700)
-        self.config = load_config()
+        # 托盘常驻模式下窗口按需创建，配置、写入线程和终端启动器与托盘共用
+        self.tray = tray
+        self.config = tray.config if tray else load_config()
+        self.usage = tray.usage if tray else UsageRanking.from_dict(self.config.get("usage"))
         self.current_model = None
-        self.update_manager = UpdateManager(self)
+        # 更新检查、终端探测和搜索索引都推迟到窗口首次显示之后
+        self.update_manager = None
+        self.startup_finished = False
+        self.doc_dialog = None
+        self.manual_dialog = None
+        self.latency_store = None
+        self.latency_dialog = None
+        self.usage_dialog = None
+        self.trace_panel = None
+        self.health_thread = None
+        self.health_results = {}
+        self.health_pending = set()
+        self.health_timer = QTimer(self)
+        self.health_timer.timeout.connect(lambda: self.start_health_probe())
+        self.credential_thread = None
+        self.credential_results = {}
+        self.credential_pending = set()
+        self.catalog_thread = None
+        self.catalog_results = {}
+        self.catalog_pending = set()
+        self.compare_dialog = None
+        self.last_generation = 0
+        self.source_after_generation = None
+        if tray:
+            self.terminal_launcher = tray.terminal_launcher
+            self.config_writer = tray.config_writer
+            self.auto_switcher = tray.auto_switcher
+            self.gateway_service = tray.gateway_service
+            self.switcher = tray.switcher
+        else:
+            # 自动选择最快端点：自行定时探测分组内的模型，评分差距超过阈值时切换
+            self.auto_switcher = AutoSwitcher(lambda: self.config, parent=self)
+            self.auto_switcher.switch_requested.connect(self.apply_auto_switch)
+            self.terminal_launcher = TerminalLauncher()
+            # 配置与 env.sh 的写入在后台线程合并执行，退出前确保落盘
+            self.config_writer = ConfigWriter(
+                save_config, update_env_file, parent=self, env_data=env_data_for
+            )
+            QApplication.instance().aboutToQuit.connect(self.config_writer.stop)
+            # 本地网关：切换模型只替换网关的转发目标，env.sh 不再变化
+            self.gateway_service = GatewayService(lambda: self.config, parent=self)
+            QApplication.instance().aboutToQuit.connect(self.gateway_service.stop)
+            self.switcher = ProfileSwitcher(
+                lambda: self.config, lambda: self.usage, self.config_writer,
+                self.gateway_service, ENV_FILE, render_env_file, self,
+            )
+        self.switcher.propagation_started.connect(
+            lambda hosts: self.statusBar().showMessage(f"正在同步 env.sh 到 {hosts} 台远程主机...")
+        )
+        self.switcher.propagation_finished.connect(self.on_propagation_done)
+        self.switcher.propagation_failed.connect(
+            lambda error: QMessageBox.warning(self, "远程同步", error)
+        )
+        self.gateway_service.state_changed.connect(self.on_gateway_state)
+        self.config_writer.saved.connect(self.on_config_saved)
+        self.config_writer.failed.connect(self.on_config_save_failed)
         self.init_ui()
         self.init_menu()
-        self.update_manager.start_auto_check()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        if not self.startup_finished:
+            self.startup_finished = True
+            startup_profile.mark("window shown")
+            # 0 毫秒定时器在首帧绘制之后、事件循环空闲时触发
+            QTimer.singleShot(0, self.finish_startup)
+
+    def finish_startup(self):
+        """窗口显示后的延迟初始化"""
+        startup_profile.mark("first idle tick")
+        self.terminal_launcher.warm_up()
+        self.start_search_index_build()
+        self.start_health_probe()
+        # 凭证校验结果按 token+主机的哈希缓存，启动时通常全部命中缓存
+        self.start_credential_check()
+        self.start_catalog_discovery()
+        if self.auto_switcher.store is None:
+            self.auto_switcher.store = self.ensure_latency_store()
+        self.auto_switcher.reconfigure()
+        self.gateway_service.reconfigure()
+        interval = self.config.get("health", {}).get("interval_minutes", 5)
+        if interval > 0:
+            self.health_timer.start(int(interval * 60 * 1000))
+        self.ensure_update_manager().start_auto_check()
+        startup_profile.mark("update subsystem ready")
+        startup_profile.report()
+
+    def ensure_update_manager(self):
+        if self.update_manager is None:
+            from update_checker import UpdateManager
+
+            self.update_manager = UpdateManager(self)
+        return self.update_manager
 
     def init_menu(self):
         # 获取菜单栏
@@ -112,6 +349,62 @@ class ModelManager(QMainWindow):
         update_settings_action.triggered.connect(self.show_update_settings)
         app_menu.addAction(update_settings_action)
 
+        app_menu.addSeparator()
+
+        # 远程主机同步
+        propagate_action = QAction("同步到远程主机", self)
+        propagate_action.triggered.connect(lambda: self.propagate_env(manual=True))
+        app_menu.addAction(propagate_action)
+
+        remote_settings_action = QAction("远程主机设置", self)
+        remote_settings_action.triggered.connect(self.show_remote_settings)
+        app_menu.addAction(remote_settings_action)
+
+        app_menu.addSeparator()
+
+        # 端点健康检查
+        health_action = QAction("检查端点状态", self)
+        health_action.triggered.connect(lambda: self.start_health_probe(manual=True))
+        app_menu.addAction(health_action)
+
+        credential_action = QAction("校验凭证", self)
+        credential_action.triggered.connect(lambda: self.start_credential_check(manual=True))
+        app_menu.addAction(credential_action)
+
+        catalog_action = QAction("刷新模型目录", self)
+        catalog_action.triggered.connect(lambda: self.start_catalog_discovery(manual=True))
+        app_menu.addAction(catalog_action)
+
+        compare_action = QAction("对比模型...", self)
+        compare_action.triggered.connect(self.show_compare_dialog)
+        app_menu.addAction(compare_action)
+
+        gateway_action = QAction("本地网关...", self)
+        gateway_action.triggered.connect(self.show_gateway_settings)
+        app_menu.addAction(gateway_action)
+
+        auto_action = QAction("自动选择最快端点...", self)
+        auto_action.triggered.connect(self.show_auto_settings)
+        app_menu.addAction(auto_action)
+
+        usage_action = QAction("用量统计", self)
+        usage_action.triggered.connect(self.show_usage_dialog)
+        app_menu.addAction(usage_action)
+
+        # 延迟面板
+        latency_action = QAction("延迟面板", self)
+        latency_action.triggered.connect(self.show_latency_dashboard)
+        app_menu.addAction(latency_action)
+
+        # 性能面板：各操作阶段耗时
+        trace_action = QAction("性能面板", self)
+        trace_action.triggered.connect(self.show_trace_panel)
+        app_menu.addAction(trace_action)
+
+        diagnostics_action = QAction("导出诊断包", self)
+        diagnostics_action.triggered.connect(lambda: self.export_diagnostics(manual=True))
+        app_menu.addAction(diagnostics_action)
+
     def show_about_dialog(self):
         from version import get_current_version
 
@@ -127,11 +420,11 @@ class ModelManager(QMainWindow):
 
     def check_for_updates_manual(self):
         """手动触发更新检查"""
-        self.update_manager.check_for_updates(manual=True)
+        self.ensure_update_manager().check_for_updates(manual=True)
 
     def show_update_settings(self):
         """显示更新设置对话框"""
-        self.update_manager.show_update_settings()
+        self.ensure_update_manager().show_update_settings()
 
     def init_ui(self):
         central = QWidget()
@@ -139,27 +432,6 @@ class ModelManager(QMainWindow):
         central.setLayout(layout)
         self.setCentralWidget(central)
 
-        # 官方文档内容文本
-        self.doc_text = (
-            "步骤 1：安装 Claude Code\n\n"
-            "NPM 安装\n"
-            "如果您已安装 Node.js 18 或更新版本：\n"
-            "npm install -g @anthropic-ai/claude-code\n\n"
-            "原生安装\n"
-            "或者，尝试我们新的原生安装，现在处于测试版。\n\n"
-            "macOS、Linux、WSL：\n"
-            "curl -fsSL claude.ai/install.sh | bash\n"
-            "Windows PowerShell：\n"
-            "irm https://claude.ai/install.ps1 | iex\n\n"
-            "步骤 2：开始您的第一个会话\n"
-            "在任何项目目录中打开终端并启动 Claude Code：\n"
-            "cd /path/to/your/project\n"
-            "claude\n"
-            "您将在新的交互式会话中看到 Claude Code 提示符：\n"
-            "✻ 欢迎使用 Claude Code！\n\n"
-            "官方地址: https://docs.anthropic.com/zh-CN/docs/claude-code/quickstart"
-        )
-
         # 分隔线
         line = QFrame()
         line.setFrameShape(QFrame.Shape.HLine)
@@ -189,81 +461,26 @@ class ModelManager(QMainWindow):
         dir_layout.addWidget(manual_btn)
         layout.addLayout(dir_layout)
 
-        def show_doc_dialog():
-            dialog = QDialog(self)
-            dialog.setWindowTitle("官方文档与安装步骤")
-            dialog.setMinimumWidth(500)
-            vbox = QVBoxLayout(dialog)
-            doc_view = QTextEdit()
-            doc_view.setReadOnly(True)
-            doc_view.setPlainText(self.doc_text)
-            doc_view.setMinimumHeight(400)
-            vbox.addWidget(doc_view)
-            button_box = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok)
-            button_box.accepted.connect(dialog.accept)
-            vbox.addWidget(button_box)
-            dialog.exec()
-
-        doc_btn.clicked.connect(show_doc_dialog)
-
-        def show_manual_dialog():
-            info_text = (
-                "/add-dir 添加新的工作目录\n"
-                "/agents 管理代理配置\n"
-                "/bashes 列出并管理后台bash shell\n"
-                "/bug 提交关于Claude Code的反馈\n"
-                "/clear 清除对话历史并释放上下文\n"
-                "/compact 清除对话历史但在上下文中保留摘要。可选：/compact [摘要指令]\n"
-                "/config 打开配置面板\n"
-                "/cost 显示当前会话的总成本和持续时间\n"
-                "/doctor 诊断并验证您的Claude Code安装和设置\n"
-                "/exit 退出REPL\n"
-                "/export 将当前对话导出到文件或剪贴板\n"
-                "/help 显示帮助和可用命令\n"
-                "/hooks 管理工具事件的钩子配置\n"
-                "/ide 管理IDE集成并显示状态\n"
-                "/init 使用代码库文档初始化新的CLAUDE.md文件\n"
-                "/install-github-app 为仓库设置Claude GitHub Actions\n"
-                "/login 使用您的Anthropic账户登录\n"
-                "/logout 从您的Anthropic账户登出\n"
-                "/mcp 管理MCP服务器\n"
-                "/memory 编辑Claude内存文件\n"
-                "/migrate-installer 从全局npm安装迁移到本地安装\n"
-                "/model 设置Claude Code的AI模型\n"
-                "/output-style 直接设置输出样式或从选择菜单中设置\n"
-                "/output-style:new 创建自定义输出样式\n"
-                "/permissions 管理允许和拒绝工具权限规则\n"
-                "/pr-comments 获取GitHub拉取请求的评论\n"
-                "/release-notes 查看发布说明\n"
-                "/resume 恢复对话\n"
-                "/review 审查拉取请求\n"
-                "/security-review 完成当前分支上待处理更改的安全审查\n"
-                "/status 显示Claude Code状态，包括版本、模型、账户、API连接和工具状态\n"
-                "/statusline 设置Claude Code的状态行UI\n"
-                "/terminal-setup 安装Shift+Enter键绑定用于换行\n"
-                "/upgrade 升级到Max以获得更高的速率限制和更多的Opus\n"
-                "/vim 在Vim和普通编辑模式之间切换\n"
-            )
-            dialog = QDialog(self)
-            dialog.setWindowTitle("Claude Code 命令说明书")
-            dialog.setMinimumWidth(500)
-            vbox = QVBoxLayout(dialog)
-            text_view = QTextEdit()
-            text_view.setReadOnly(True)
-            text_view.setPlainText(info_text)
-            text_view.setMinimumHeight(400)
-            vbox.addWidget(text_view)
-            button_box = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok)
-            button_box.accepted.connect(dialog.accept)
-            vbox.addWidget(button_box)
-            dialog.exec()
-
-        manual_btn.clicked.connect(show_manual_dialog)
+        doc_btn.clicked.connect(self.show_doc_dialog)
+
+        manual_btn.clicked.connect(self.show_manual_dialog)
 
         # 模型列表
-        self.model_list = QListWidget()
-        self.model_list.itemClicked.connect(self.show_model_details)
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("搜索模型名称 / 主机 / 环境变量")
+        self.search_edit.setClearButtonEnabled(True)
+        self.search_edit.textChanged.connect(self.apply_search)
+        self.search_index = None
+        self.pending_index_updates = []
+
+        self.profile_model = ProfileListModel(self.config, self)
+        self.model_list = QListView()
+        # 行高一致时视图只需计算可见区域，配合模型的分批加载支持大量配置
+        self.model_list.setUniformItemSizes(True)
+        self.model_list.setModel(self.profile_model)
+        self.model_list.clicked.connect(self.show_model_details)
         layout.addWidget(QLabel("模型列表:"))
+        layout.addWidget(self.search_edit)
         layout.addWidget(self.model_list)
 
         # 模型详情只读
@@ -300,23 +517,102 @@ class ModelManager(QMainWindow):
         bottom_layout.addWidget(copy_btn)
         layout.addLayout(bottom_layout)
 
-        self.refresh_model_list()
+    def start_search_index_build(self):
+        """在后台线程中构建搜索索引，构建期间的修改暂存后回放"""
+        self.search_index = None
+        self.pending_index_updates = []
+        # 以 self 为 parent，重新构建时旧线程不会在运行中被销毁
+        self.search_index_thread = SearchIndexBuildThread(self.config["models"], self)
+        self.search_index_thread.index_ready.connect(self.on_search_index_ready)
+        self.search_index_thread.start()
+
+    def on_search_index_ready(self, index):
+        if self.sender() is not self.search_index_thread:
+            return
+        self.search_index = index
+        for name in self.pending_index_updates:
+            self.index_profile(name)
+        self.pending_index_updates = []
+        if self.search_edit.text().strip():
+            self.apply_search()
+
+    def index_profile(self, name):
+        """增量更新单个模型的搜索索引（新增、修改或删除）"""
+        if self.search_index is None:
+            self.pending_index_updates.append(name)
+            return
+        with tracer.span("search.index", profile=name):
+            if name in self.config["models"]:
+                self.search_index.update(name, self.config["models"][name])
+            else:
+                self.search_index.remove(name)
+        if self.search_edit.text().strip():
+            self.apply_search()
+
+    def apply_search(self):
+        query = self.search_edit.text().strip()
+        if not query:
+            self.profile_model.set_filter(None)
+        elif self.search_index is not None:
+            self.profile_model.set_filter(self.search_index.search(query))
+        else:
+            # 索引仍在构建，完成后会自动重新搜索
+            return
+        self.clear_model_details()
+
+    def show_doc_dialog(self):
+        if self.doc_dialog is None:
+            self.doc_dialog = self.build_text_dialog("官方文档与安装步骤", DOC_TEXT)
+        self.doc_dialog.exec()
+
+    def show_manual_dialog(self):
+        if self.manual_dialog is None:
+            self.manual_dialog = self.build_text_dialog(
+                "Claude Code 命令说明书", MANUAL_TEXT
+            )
+        self.manual_dialog.exec()
+
+    def build_text_dialog(self, title, text):
+        """首次打开时才构建只读文本对话框，之后复用"""
+        dialog = QDialog(self)
+        dialog.setWindowTitle(title)
+        dialog.setMinimumWidth(500)
+        vbox = QVBoxLayout(dialog)
+        text_view = QTextEdit()
+        text_view.setReadOnly(True)
+        text_view.setPlainText(text)
+        text_view.setMinimumHeight(400)
+        vbox.addWidget(text_view)
+        button_box = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok)
+        button_box.accepted.connect(dialog.accept)
+        vbox.addWidget(button_box)
+        return dialog
 
-    def refresh_model_list(self):
-        self.model_list.clear()
-        for name in self.config["models"]:
-            active_mark = " (Active)" if name == self.config.get("active") else ""
-            self.model_list.addItem(name + active_mark)
+    def clear_model_details(self):
+        self.model_list.clearSelection()
         self.detail_text.clear()
         self.current_model = None
 
-    def show_model_details(self, item):
-        name = item.text().replace(" (Active)", "")
+    def show_model_details(self, index):
+        self.show_details_for(self.profile_model.name_at(index))
+
+    def show_details_for(self, name):
         self.current_model = name
         model = self.config["models"].get(name, {})
         detail = f"模型名称: {name}\n"
         for k, v in model.items():
             detail += f"{k}: {v}\n"
+        health = self.health_results.get(name)
+        if health is not None:
+            checked = time.strftime("%H:%M:%S", time.localtime(health.checked_at))
+            detail += f"\n端点状态（{checked}）: {health.summary()}\n"
+        credential = self.credential_results.get(name)
+        if credential is not None:
+            checked = time.strftime("%m-%d %H:%M", time.localtime(credential.checked_at))
+            detail += f"凭证校验（{checked}）: {credential.summary()}\n"
+        catalog = self.catalog_results.get(name)
+        if catalog is not None:
+            detail += f"\n可用模型（{len(catalog.models)}）: {catalog.summary(limit=30)}\n"
         self.detail_text.setText(detail)
 
     def edit_model_dialog(self):
@@ -339,6 +635,16 @@ class ModelManager(QMainWindow):
         url_edit.setMinimumWidth(min_width)
         form.addRow("ANTHROPIC_AUTH_TOKEN:", token_edit)
         form.addRow("ANTHROPIC_BASE_URL:", url_edit)
+        # 候选项来自模型目录缓存，留空表示不设置 ANTHROPIC_MODEL
+        from model_catalog import cached_models
+
+        model_combo = QComboBox()
+        model_combo.setEditable(True)
+        model_combo.setMinimumWidth(min_width)
+        model_combo.addItem("")
+        model_combo.addItems(cached_models(url_edit.text()))
+        model_combo.setCurrentText(model.get("ANTHROPIC_MODEL", ""))
+        form.addRow("ANTHROPIC_MODEL:", model_combo)
 
         # 按钮：取消、确定修改、修改并切换当前模型
         button_box = QDialogButtonBox()
@@ -360,19 +666,41 @@ class ModelManager(QMainWindow):
                     "ANTHROPIC_AUTH_TOKEN 和 ANTHROPIC_BASE_URL 不能为空",
                 )
                 return
-            self.config["models"][name] = {
-                "ANTHROPIC_AUTH_TOKEN": token,
-                "ANTHROPIC_BASE_URL": url,
-            }
-            if set_active:
-                self.config["active"] = name
-            save_config(self.config)
-            # 更新 env.sh
-            active = self.config["active"]
-            update_env_file(active, self.config["models"][active])
-            self.refresh_model_list()
+            with tracer.span("edit", profile=name, switch=set_active):
+                # 保留其他环境变量，只更新对话框中的字段
+                updated = dict(model)
+                updated["ANTHROPIC_AUTH_TOKEN"] = token
+                updated["ANTHROPIC_BASE_URL"] = url
+                model_id = model_combo.currentText().strip()
+                if model_id:
+                    updated["ANTHROPIC_MODEL"] = model_id
+                else:
+                    updated.pop("ANTHROPIC_MODEL", None)
+                self.config["models"][name] = updated
+                if set_active:
+                    self.disable_auto_selection()
+                    self.config["active"] = name
+                    self.switcher.record_usage(name)
+                active = self.config["active"]
+                # 保存配置，修改的是当前模型时同时更新 env.sh
+                self.persist(env_changed=active == name)
+                with tracer.span("list.update"):
+                    self.profile_model.profile_changed(name)
+                    self.profile_model.set_active(active)
+                self.index_profile(name)
+                self.health_results.pop(name, None)
+                self.credential_results.pop(name, None)
+                self.show_details_for(name)
+                self.start_health_probe([name])
+                # token 与主机未变时直接命中缓存，不会产生请求
+                self.start_credential_check([name])
+                self.start_catalog_discovery([name])
+                # 修改的是当前模型时，env.sh 内容已变化，需要同步到远程主机
+                if active == name:
+                    self.propagate_env()
+                if set_active:
+                    self.auto_source_terminal()
             if set_active:
-                self.auto_source_terminal()
                 QMessageBox.information(
                     self,
                     "提示",
@@ -392,24 +720,49 @@ class ModelManager(QMainWindow):
         dialog.exec()
 
     def select_model(self):
-        item = self.model_list.currentItem()
-        if item:
-            name = item.text().replace(" (Active)", "")
-            self.config["active"] = name
-            save_config(self.config)
-            # 更新 env.sh
-            update_env_file(name, self.config["models"][name])
-            self.refresh_model_list()
-            # 自动在新终端执行 source（跨平台支持）
-            self.auto_source_terminal()
+        name = self.profile_model.name_at(self.model_list.currentIndex())
+        if name:
+            self.activate_model(name)
             QMessageBox.information(
                 self, "提示", f"已切换到模型: {name} 并在新终端刷新环境变量"
             )
 
+    def activate_model(self, name):
+        """切换当前模型：保存配置、更新 env.sh、刷新终端并同步远程主机"""
+        if name not in self.config["models"]:
+            self.statusBar().showMessage(f"未找到模型: {name}", 5000)
+            return False
+        # 手动切换优先于自动选择
+        self.disable_auto_selection()
+        with tracer.span("switch", profile=name):
+            # 保存配置、更新 env.sh 并同步远程主机
+            self.last_generation = self.switcher.switch(name)
+            with tracer.span("list.update"):
+                self.profile_model.set_active(name)
+            # 自动在新终端执行 source（跨平台支持）；经由本地网关时无需刷新终端
+            if not self.gateway_service.is_running():
+                self.auto_source_terminal()
+        return True
+
+    def handle_command_line(self, argv):
+        """处理启动参数，包括其他实例转交过来的参数"""
+        args = parse_args(argv)
+        if args.diagnostics is not None:
+            self.export_diagnostics(args.diagnostics or None)
+        elif args.switch == AUTO_PROFILE and AUTO_PROFILE not in self.config["models"]:
+            self.enable_auto_selection()
+        elif args.switch:
+            if self.activate_model(args.switch):
+                self.statusBar().showMessage(f"已切换到模型: {args.switch}", 5000)
+        else:
+            # 重复启动时把已有窗口带到前台
+            self.showNormal()
+            self.raise_()
+            self.activateWindow()
+
     def delete_model(self):
-        item = self.model_list.currentItem()
-        if item:
-            name = item.text().replace(" (Active)", "")
+        name = self.profile_model.name_at(self.model_list.currentIndex())
+        if name:
             reply = QMessageBox.question(
                 self,
                 "确认删除",
@@ -419,17 +772,24 @@ class ModelManager(QMainWindow):
             )
             if reply == QMessageBox.StandardButton.Yes:
                 if name in self.config["models"]:
-                    del self.config["models"][name]
-                    if self.config.get("active") == name:
-                        self.config["active"] = next(iter(self.config["models"]), None)
-                        # 更新 env.sh
-                        if self.config.get("active"):
-                            update_env_file(
-                                self.config["active"],
-                                self.config["models"][self.config["active"]],
-                            )
-                    save_config(self.config)
-                    self.refresh_model_list()
+                    with tracer.span("delete", profile=name):
+                        del self.config["models"][name]
+                        self.switcher.forget_usage(name)
+                        env_changed = self.config.get("active") == name
+                        if env_changed:
+                            self.config["active"] = next(iter(self.config["models"]), None)
+                        # 删除的是当前模型时同时更新 env.sh
+                        self.persist(env_changed=env_changed)
+                        if env_changed and self.config.get("active"):
+                            self.propagate_env()
+                        with tracer.span("list.update"):
+                            self.profile_model.remove_profile(name)
+                            self.profile_model.set_active(self.config.get("active"))
+                        self.clear_model_details()
+                        self.index_profile(name)
+                        self.health_results.pop(name, None)
+                        self.credential_results.pop(name, None)
+                        self.catalog_results.pop(name, None)
                     QMessageBox.information(self, "提示", f"已删除模型: {name}")
 
     def add_model(self):
@@ -464,12 +824,18 @@ class ModelManager(QMainWindow):
                     "模型名称、ANTHROPIC_AUTH_TOKEN 和 ANTHROPIC_BASE_URL 不能为空",
                 )
                 return
-            self.config["models"][name] = {
-                "ANTHROPIC_AUTH_TOKEN": token,
-                "ANTHROPIC_BASE_URL": base_url,
-            }
-            save_config(self.config)
-            self.refresh_model_list()
+            with tracer.span("add", profile=name):
+                self.config["models"][name] = {
+                    "ANTHROPIC_AUTH_TOKEN": token,
+                    "ANTHROPIC_BASE_URL": base_url,
+                }
+                self.persist(env_changed=False)
+                with tracer.span("list.update"):
+                    self.profile_model.add_profile(name)
+                self.index_profile(name)
+                self.start_health_probe([name])
+                self.start_credential_check([name])
+                self.start_catalog_discovery([name])
             QMessageBox.information(self, "提示", f"模型 {name} 添加成功")
             dialog.accept()
 
@@ -479,11 +845,15 @@ class ModelManager(QMainWindow):
 
     def init_config(self):
         self.config = DEFAULT_CONFIG
-        save_config(self.config)
-        # 更新 env.sh
-        active = self.config["active"]
-        update_env_file(active, self.config["models"][active])
-        self.refresh_model_list()
+        self.usage = UsageRanking()
+        if self.tray:
+            self.tray.config = self.config
+            self.tray.usage = self.usage
+        # 保存配置并更新 env.sh
+        self.persist(env_changed=True)
+        self.profile_model.reset(self.config)
+        self.clear_model_details()
+        self.start_search_index_build()
         # 自动写入 shell 配置文件，确保每次新终端自动加载
         shell_configs = [Path.home() / ".zshrc", Path.home() / ".bashrc"]
         source_line = f"source {ENV_FILE}\n"
@@ -508,152 +878,612 @@ class ModelManager(QMainWindow):
             self, "提示", "已复制刷新终端命令到剪贴板:\n" + f"source {ENV_FILE}"
         )
 
+    def persist(self, env_changed=True):
+        """提交配置到后台写入线程，连续多次修改只会合并写入一次"""
+        with tracer.span("persist.submit") as span:
+            self.last_generation = self.config_writer.submit(self.config, env_changed)
+            span.set(generation=self.last_generation)
+        self.gateway_service.sync()
+
+    def on_config_saved(self, generation):
+        self.statusBar().showMessage("配置已保存", 3000)
+        # env.sh 写入完成后再打开终端，确保 source 到的是最新内容
+        pending = self.source_after_generation
+        if pending is not None and generation >= pending:
+            self.source_after_generation = None
+            self.terminal_launcher.launch(ENV_FILE)
+
+    def on_config_save_failed(self, error):
+        QMessageBox.warning(self, "保存失败", f"无法写入配置文件：\n{error}")
+
     def auto_source_terminal(self):
-        """自动在新终端中执行source命令（跨平台支持）"""
-        env_file = str(ENV_FILE)
+        """自动在新终端中执行source命令（跨平台支持，后台线程执行不阻塞界面）"""
+        self.source_after_generation = self.last_generation
 
-        try:
-            if sys.platform == "darwin":
-                # macOS: 智能检测iTerm或Terminal并执行source
-                self._macos_auto_source(env_file)
-                subprocess.run("env | grep ANTHROPIC", shell=True, check=False)
-
-            elif sys.platform.startswith("win"):
-                # Windows: 使用PowerShell打开新窗口并执行source
-                # 注意：Windows使用Git Bash或WSL时需要不同的处理方式
-                ps_script = f"""
-$env_file = "{env_file}"
-if (Test-Path "$env:USERPROFILE\\scoop\\apps\\git\\current\\bin\\bash.exe") {{
-    # Git Bash via Scoop
-    Start-Process "$env:USERPROFILE\\scoop\\apps\\git\\current\\bin\\bash.exe" -ArgumentList "-c", "source $env_file && echo 'Environment refreshed' && sleep 3"
-}} elseif (Test-Path "$env:ProgramFiles\\Git\\bin\\bash.exe") {{
-    # Git Bash
-    Start-Process "$env:ProgramFiles\\Git\\bin\\bash.exe" -ArgumentList "-c", "source $env_file && echo 'Environment refreshed' && sleep 3"
-}} elseif (Test-Path "$env:SystemRoot\\System32\\wsl.exe") {{
-    # WSL
-    Start-Process "$env:SystemRoot\\System32\\wsl.exe" -ArgumentList "bash", "-c", "source {env_file} && echo 'Environment refreshed' && sleep 3"
-}} else {{
-    # 普通cmd
-    Start-Process "cmd.exe" -ArgumentList "/k", "echo Please manually run: source {env_file}"
-}}
-"""
-                subprocess.run(["powershell", "-Command", ps_script], check=True)
-
-            elif sys.platform.startswith("linux"):
-                # Linux: 根据桌面环境选择终端
-                terminals = [
-                    [
-                        "gnome-terminal",
-                        "--",
-                        "bash",
-                        "-c",
-                        f"source {env_file}; echo 'Environment refreshed'; read -p 'Press Enter to close...'",
-                    ],
-                    [
-                        "konsole",
-                        "-e",
-                        "bash",
-                        "-c",
-                        f"source {env_file}; echo 'Environment refreshed'; read -p 'Press Enter to close...'",
-                    ],
-                    [
-                        "xterm",
-                        "-e",
-                        "bash",
-                        "-c",
-                        f"source {env_file}; echo 'Environment refreshed'; read -p 'Press Enter to close...'",
-                    ],
-                    [
-                        "xfce4-terminal",
-                        "-e",
-                        "bash",
-                        "-c",
-                        f"source {env_file}; echo 'Environment refreshed'; read -p 'Press Enter to close...'",
-                    ],
-                ]
-
-                for terminal_cmd in terminals:
-                    try:
-                        subprocess.run(terminal_cmd, check=True)
-                        break
-                    except (subprocess.CalledProcessError, FileNotFoundError):
-                        continue
-                else:
-                    # 如果没有找到支持的终端，使用x-terminal-emulator（Debian/Ubuntu默认）
-                    try:
-                        subprocess.run(
-                            [
-                                "x-terminal-emulator",
-                                "-e",
-                                "bash",
-                                "-c",
-                                f"source {env_file}; echo 'Environment refreshed'; read -p 'Press Enter to close...'",
-                            ],
-                            check=True,
-                        )
-                    except (subprocess.CalledProcessError, FileNotFoundError):
-                        # 最后尝试使用默认的shell
-                        subprocess.run(
-                            [
-                                "xterm",
-                                "-e",
-                                "bash",
-                                "-c",
-                                f"source {env_file}; echo 'Environment refreshed'; read -p 'Press Enter to close...'",
-                            ],
-                            check=False,
+    def propagate_env(self, manual=False):
+        """将当前 env.sh 并发推送到配置的远程主机"""
+        if not self.switcher.propagate(manual) and manual:
+            QMessageBox.information(self, "提示", "尚未配置远程主机，请先在“远程主机设置”中添加")
+
+    def on_propagation_done(self, results, manual):
+        failed = [r for r in results if r.status == r.FAILED]
+        pushed = sum(1 for r in results if r.status == r.PUSHED)
+        skipped = sum(1 for r in results if r.status == r.SKIPPED)
+        self.statusBar().showMessage(
+            f"远程同步完成: 推送 {pushed}，跳过 {skipped}，失败 {len(failed)}", 10000
+        )
+        if manual or failed:
+            report = "\n".join(r.summary() for r in results)
+            if failed:
+                QMessageBox.warning(self, "远程同步", report)
+            else:
+                QMessageBox.information(self, "远程同步", report)
+
+    def ensure_latency_store(self):
+        if self.latency_store is None:
+            from latency_store import LatencyStore
+
+            self.latency_store = LatencyStore()
+        return self.latency_store
+
+    def start_health_probe(self, names=None, manual=False):
+        """并发探测各模型的 BASE_URL，结果显示为列表中的状态圆点并写入延迟库"""
+        from health_probe import HealthProbeThread, profile_urls
+
+        if self.health_thread and self.health_thread.isRunning():
+            # 正在探测时记下待探测的模型，本轮结束后补上
+            self.health_pending.update(self.config["models"] if names is None else names)
+            if manual:
+                self.statusBar().showMessage("端点检查正在进行中...", 3000)
+            return
+        profiles = profile_urls(self.config, names)
+        if not profiles:
+            return
+        self.health_thread = HealthProbeThread(profiles, self.ensure_latency_store(), parent=self)
+        self.health_thread.results_ready.connect(
+            lambda results: self.on_health_results(results, manual)
+        )
+        if manual:
+            self.statusBar().showMessage(f"正在检查 {len(profiles)} 个模型的端点...")
+        self.health_thread.start()
+
+    def start_credential_check(self, names=None, manual=False):
+        """并发校验各模型的 ANTHROPIC_AUTH_TOKEN，无效的在列表中直接标出"""
+        from credentials import CredentialCheckThread
+
+        models = self.config["models"]
+        names = list(models) if names is None else [n for n in names if n in models]
+        if self.credential_thread and self.credential_thread.isRunning():
+            # 正在校验时记下待校验的模型，本轮结束后补上
+            self.credential_pending.update(names)
+            if manual:
+                self.statusBar().showMessage("凭证校验正在进行中...", 3000)
+            return
+        if not names:
+            return
+        # 手动校验忽略缓存，便于确认刚在服务端修复的凭证
+        self.credential_thread = CredentialCheckThread(
+            {name: dict(models[name]) for name in names}, refresh=manual, parent=self
+        )
+        self.credential_thread.results_ready.connect(
+            lambda results: self.on_credential_results(results, manual)
+        )
+        if manual:
+            self.statusBar().showMessage(f"正在校验 {len(names)} 个模型的凭证...")
+        self.credential_thread.start()
+
+    def on_credential_results(self, results, manual):
+        models = self.config["models"]
+        # 校验期间已删除的模型不再显示
+        results = [r for r in results if r.profile in models]
+        for result in results:
+            self.credential_results[result.profile] = result
+        self.profile_model.set_credentials(
+            {r.profile: r.status for r in results},
+            {r.profile: r.summary() for r in results},
+        )
+        if self.current_model in self.credential_results:
+            self.show_details_for(self.current_model)
+        if self.credential_pending:
+            pending = self.credential_pending
+            self.credential_pending = set()
+            QTimer.singleShot(0, lambda: self.start_credential_check(pending))
+        if not manual:
+            return
+        invalid = [r for r in results if r.status == "invalid"]
+        cached = sum(1 for r in results if r.cached)
+        self.statusBar().showMessage(
+            f"凭证校验完成: 无效 {len(invalid)}，共 {len(results)} 个（{cached} 个来自缓存）",
+            10000,
+        )
+        if invalid:
+            lines = [f"{r.profile}: {r.summary()}" for r in invalid[:20]]
+            if len(invalid) > 20:
+                lines.append(f"... 另有 {len(invalid) - 20} 个")
+            QMessageBox.warning(self, "凭证校验", "\n".join(lines))
+
+    def start_catalog_discovery(self, names=None, manual=False):
+        """并发查询各网关的模型列表，按端点缓存（过期后用 ETag 重新验证）"""
+        from model_catalog import CatalogThread
+
+        models = self.config["models"]
+        names = list(models) if names is None else [n for n in names if n in models]
+        if self.catalog_thread and self.catalog_thread.isRunning():
+            self.catalog_pending.update(names)
+            if manual:
+                self.statusBar().showMessage("模型目录正在刷新中...", 3000)
+            return
+        if not names:
+            return
+        self.catalog_thread = CatalogThread(
+            {name: dict(models[name]) for name in names}, refresh=manual, parent=self
+        )
+        self.catalog_thread.results_ready.connect(
+            lambda results: self.on_catalog_results(results, manual)
+        )
+        if manual:
+            self.statusBar().showMessage(f"正在刷新 {len(names)} 个模型的模型目录...")
+        self.catalog_thread.start()
+
+    def on_catalog_results(self, results, manual):
+        models = self.config["models"]
+        for result in results:
+            if result.profile in models:
+                self.catalog_results[result.profile] = result
+        if self.current_model in self.catalog_results:
+            self.show_details_for(self.current_model)
+        if self.catalog_pending:
+            pending = self.catalog_pending
+            self.catalog_pending = set()
+            QTimer.singleShot(0, lambda: self.start_catalog_discovery(pending))
+        if manual:
+            endpoints = {r.endpoint for r in results}
+            failed = {r.endpoint for r in results if r.error}
+            self.statusBar().showMessage(
+                f"模型目录已刷新: {len(endpoints)} 个端点，失败 {len(failed)}", 10000
+            )
+
+    def on_health_results(self, results, manual):
+        for result in results:
+            self.health_results[result.profile] = result
+        self.profile_model.set_statuses(
+            {r.profile: r.status for r in results},
+            {r.profile: r.summary() for r in results},
+        )
+        if self.current_model in self.health_results:
+            self.show_details_for(self.current_model)
+        if self.health_pending:
+            pending = self.health_pending
+            self.health_pending = set()
+            QTimer.singleShot(0, lambda: self.start_health_probe(pending))
+        if not manual:
+            return
+        bad = [r for r in results if r.status != r.UP]
+        self.statusBar().showMessage(
+            f"端点检查完成: 在线 {len(results) - len(bad)}，异常 {len(bad)}", 10000
+        )
+        if bad:
+            lines = [r.summary() for r in bad[:20]]
+            if len(bad) > 20:
+                lines.append(f"... 另有 {len(bad) - 20} 个")
+            QMessageBox.warning(self, "端点检查", "\n".join(lines))
+
+    def enable_auto_selection(self):
+        if len(self.auto_switcher.members()) < 2:
+            self.statusBar().showMessage("请先在“自动选择最快端点”中设置至少两个成员", 5000)
+            return
+        if set_auto_enabled(self.config, True):
+            self.persist(env_changed=False)
+        self.auto_switcher.reconfigure()
+        self.statusBar().showMessage("已开启自动选择最快端点", 5000)
+
+    def disable_auto_selection(self):
+        if set_auto_enabled(self.config, False):
+            self.auto_switcher.reconfigure()
+            self.statusBar().showMessage("已手动切换，自动选择最快端点已关闭", 5000)
+
+    def apply_auto_switch(self, name, reason):
+        """自动选择切换当前模型：更新 env.sh 并同步远程主机，但不弹出新终端"""
+        if name not in self.config["models"]:
+            return
+        with tracer.span("auto_switch", profile=name):
+            self.last_generation = self.switcher.switch(name, record=False)
+            with tracer.span("list.update"):
+                self.profile_model.set_active(name)
+        self.statusBar().showMessage(f"已自动切换到更快的端点 {name}（{reason}）", 10000)
+
+    def show_auto_settings(self):
+        settings = auto_settings(self.config)
+        dialog = QDialog(self)
+        dialog.setWindowTitle("自动选择最快端点")
+        dialog.setMinimumWidth(460)
+        form = QFormLayout(dialog)
+        enabled_check = QCheckBox("启用（手动切换模型时自动关闭）")
+        enabled_check.setChecked(settings["enabled"])
+        members_edit = QTextEdit()
+        members_edit.setPlainText("\n".join(settings["members"]))
+        members_edit.setPlaceholderText("每行一个模型名称，至少两个，指向等价的后端")
+        hysteresis_edit = QLineEdit(f"{settings['hysteresis'] * 100:g}")
+        interval_edit = QLineEdit(str(settings["interval_seconds"]))
+        scores_label = QLabel()
+        scores_label.setWordWrap(True)
+
+        def refresh_scores():
+            lines = self.auto_switcher.describe()
+            scores_label.setText("\n".join(lines) if lines else "尚无评分数据")
+
+        refresh_scores()
+        self.auto_switcher.scores_updated.connect(refresh_scores)
+        dialog.finished.connect(lambda: self.auto_switcher.scores_updated.disconnect(refresh_scores))
+        form.addRow(enabled_check)
+        form.addRow("成员:", members_edit)
+        form.addRow("切换阈值 (%):", hysteresis_edit)
+        form.addRow("探测间隔 (秒):", interval_edit)
+        form.addRow("当前评分:", scores_label)
+        button_box = QDialogButtonBox(
+            QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel
+        )
+        form.addRow(button_box)
+
+        def on_accept():
+            try:
+                hysteresis = float(hysteresis_edit.text().strip()) / 100
+                interval = int(interval_edit.text().strip())
+            except ValueError:
+                QMessageBox.warning(dialog, "错误", "切换阈值和探测间隔必须是数字")
+                return
+            members = [
+                line.strip()
+                for line in members_edit.toPlainText().splitlines()
+                if line.strip()
+            ]
+            unknown = [name for name in members if name not in self.config["models"]]
+            if unknown:
+                QMessageBox.warning(dialog, "错误", "未找到模型: " + ", ".join(unknown))
+                return
+            if enabled_check.isChecked() and len(members) < 2:
+                QMessageBox.warning(dialog, "错误", "自动选择至少需要两个成员")
+                return
+            auto = self.config.setdefault("auto", {})
+            auto["enabled"] = enabled_check.isChecked()
+            auto["members"] = members
+            auto["hysteresis"] = min(max(hysteresis, 0.0), 0.9)
+            auto["interval_seconds"] = max(5, interval)
+            self.persist(env_changed=False)
+            self.auto_switcher.reconfigure()
+            dialog.accept()
+
+        button_box.accepted.connect(on_accept)
+        button_box.rejected.connect(dialog.reject)
+        dialog.exec()
+
+    def show_latency_dashboard(self):
+        """显示各模型的 TTFB 与请求耗时曲线"""
+        if self.latency_dialog is None:
+            from latency_dashboard import LatencyDashboard
+
+            self.latency_dialog = LatencyDashboard(self.ensure_latency_store(), self)
+        self.latency_dialog.set_profiles(self.config["models"], self.config.get("active"))
+        self.latency_dialog.show()
+        self.latency_dialog.raise_()
+        self.latency_dialog.activateWindow()
+
+    def show_usage_dialog(self):
+        """显示经本地网关转发的 token 用量"""
+        if self.usage_dialog is None:
+            from usage_dialog import UsageDialog
+            from usage_meter import UsageStore
+
+            self.usage_dialog = UsageDialog(UsageStore(), self)
+        self.usage_dialog.show()
+        self.usage_dialog.raise_()
+        self.usage_dialog.activateWindow()
+
+    def show_gateway_settings(self):
+        from gateway import DEFAULT_PORT, ensure_token, gateway_settings, gateway_url
+        from http2_client import available as http2_available
+
+        settings = gateway_settings(self.config)
+        dialog = QDialog(self)
+        dialog.setWindowTitle("本地网关")
+        dialog.setMinimumWidth(480)
+        form = QFormLayout(dialog)
+        enabled_check = QCheckBox("启用（env.sh 固定指向本地网关，切换模型无需刷新终端）")
+        enabled_check.setChecked(settings["enabled"])
+        port_edit = QLineEdit(str(settings["port"]))
+        groups_edit = QTextEdit()
+        groups_edit.setPlainText("\n".join(", ".join(g) for g in settings["failover_groups"]))
+        groups_edit.setPlaceholderText("每行一组，按优先级用逗号分隔，例如：kimi-k2, glm-4.5, internal")
+        groups_edit.setMaximumHeight(90)
+        pools_edit = QTextEdit()
+        pools_edit.setPlainText("\n".join(
+            " | ".join([
+                name, entry.get("ANTHROPIC_AUTH_TOKEN", ""), entry.get("ANTHROPIC_BASE_URL", ""),
+                f"{entry.get('weight', 1):g}",
+            ])
+            for name, entries in settings["pools"].items() for entry in entries
+        ))
+        pools_edit.setPlaceholderText(
+            "每行一个额外凭证：模型名称 | token | 地址（留空沿用模型地址） | 权重（默认 1）"
+        )
+        pools_edit.setMaximumHeight(90)
+        sticky_check = QCheckBox("同一会话固定使用同一凭证（提高上游提示缓存命中率）")
+        sticky_check.setChecked(settings["sticky_routing"])
+        cache_check = QCheckBox("缓存 temperature 为 0 的请求，相同请求直接回放")
+        cache_check.setChecked(settings["response_cache"])
+        cache_size_edit = QLineEdit(str(settings["response_cache_mb"]))
+        clear_cache_button = QPushButton("清空响应缓存")
+        metering_check = QCheckBox("记录 token 用量（菜单“用量统计”中查看）")
+        metering_check.setChecked(settings["usage_metering"])
+        limiting_check = QCheckBox("按上游返回的限流头在本地排队，避免触发 429")
+        limiting_check.setChecked(settings["rate_limiting"])
+        coalesce_check = QCheckBox("合并同时进行的相同请求（共享同一个上游响应）")
+        coalesce_check.setChecked(settings["coalesce_requests"])
+        http2_check = QCheckBox("上游使用 HTTP/2 多路复用（协商失败时回退 HTTP/1.1）")
+        http2_check.setChecked(settings["http2"])
+        if not http2_available():
+            http2_check.setText(http2_check.text() + "（未安装 h2）")
+            http2_check.setEnabled(False)
+        streams_edit = QLineEdit(str(settings["http2_max_streams"]))
+        cache_row = QHBoxLayout()
+        cache_row.addWidget(cache_size_edit)
+        cache_row.addWidget(clear_cache_button)
+        status_label = QLabel()
+        status_label.setTextInteractionFlags(Qt.TextInteractionFlag.TextSelectableByMouse)
+        form.addRow(enabled_check)
+        form.addRow("端口:", port_edit)
+        form.addRow("故障转移组:", groups_edit)
+        form.addRow("负载均衡凭证:", pools_edit)
+        form.addRow(sticky_check)
+        form.addRow(metering_check)
+        form.addRow(limiting_check)
+        form.addRow(coalesce_check)
+        form.addRow(http2_check)
+        form.addRow("每连接最大流数:", streams_edit)
+        form.addRow(cache_check)
+        form.addRow("缓存上限 (MB):", cache_row)
+        form.addRow("状态:", status_label)
+
+        def refresh_status():
+            stats = self.gateway_service.stats()
+            if stats is None:
+                error = self.gateway_service.error
+                status_label.setText(f"启动失败: {error}" if error else "未运行")
+                return
+            lines = [
+                f"{gateway_url({'port': stats['port']})} → {' → '.join(stats['upstreams']) or '-'}",
+                f"请求 {stats['requests']}，进行中 {stats['in_flight']}，错误 {stats['errors']}，"
+                f"故障转移 {stats['failovers']}，合并 {stats['coalesced']}",
+                f"上游新建连接 {stats['upstream_connects']}，复用 {stats['upstream_reused']}",
+            ]
+            if stats["sticky_routed"] or stats["sticky_moved"]:
+                lines.append(
+                    f"会话粘滞：按会话归属转发 {stats['sticky_routed']}，"
+                    f"因熔断或负载过高改派 {stats['sticky_moved']}"
+                )
+            transport = stats["transport"]
+            if transport is not None:
+                for host, info in transport["hosts"].items():
+                    if info["protocol"] == "h2":
+                        lines.append(
+                            f"{host}: HTTP/2，{info['connections']} 个连接，{info['streams']} 个流"
                         )
+                    else:
+                        lines.append(f"{host}: HTTP/1.1（未协商出 h2）")
+            cache = stats["cache"]
+            if cache is not None:
+                lines.append(
+                    f"响应缓存：命中率 {cache['hit_rate']:.0%}（命中 {cache['hits']}，"
+                    f"未命中 {cache['misses']}），{cache['entries']} 条，"
+                    f"{cache['bytes'] / 1024 / 1024:.1f}/{cache['max_bytes'] / 1024 / 1024:.0f} MB"
+                )
+            limits = stats["rate_limits"]
+            if limits is not None:
+                lines.append(
+                    f"限流排队：当前 {limits['queue_depth']}，累计 {limits['queued']}，"
+                    f"平均等待 {limits['wait_avg_seconds']:.1f} 秒，最长 {limits['wait_max_seconds']:.1f} 秒，"
+                    f"超时拒绝 {limits['rejected']}"
+                )
+                for key, upstream in limits["upstreams"].items():
+                    parts = [
+                        f"{label} {upstream[name]['available']}/{upstream[name]['limit']}"
+                        for name, label in (("requests", "请求"), ("tokens", "token"))
+                        if name in upstream
+                    ]
+                    if upstream["blocked_for"]:
+                        parts.append(f"{upstream['blocked_for']:.0f} 秒后恢复")
+                    lines.append(f"{key} 剩余额度：{'，'.join(parts)}")
+            states = {"closed": "正常", "open": "熔断", "half_open": "试探中"}
+            for name, breaker in stats["breakers"].items():
+                member = stats["members"][name]
+                line = (
+                    f"{name}: {states[breaker['state']]}，错误率 {breaker['error_rate']:.0%}，"
+                    f"在途 {member['outstanding']}，累计 {member['requests']}"
+                )
+                if breaker["state"] == "open":
+                    line += f"，{breaker['retry_in']:.0f} 秒后重试"
+                lines.append(line)
+            status_label.setText("\n".join(lines))
 
-        except subprocess.CalledProcessError as e:
-            print(f"自动刷新终端失败: {e}")
-            # 静默失败，不显示错误对话框，因为这不是核心功能
+        def clear_cache():
+            self.gateway_service.clear_cache()
+            refresh_status()
 
-    def _macos_auto_source(self, env_file):
-        """macOS专用：智能检测iTerm或Terminal并执行source"""
-        try:
-            # 首先尝试iTerm
-            iterm_script = f"""
-tell application "iTerm"
-    if it is running then
-        create window with default profile
-        tell current window
-            tell current session
-                write text "source {env_file}"
-            end tell
-        end tell
-    else
-        create window with default profile
-        tell current window
-            tell current session
-                write text "source {env_file}"
-            end tell
-        end tell
-    end if
-    activate
-end tell
-"""
-            subprocess.run(["osascript", "-e", iterm_script], check=True)
-        except subprocess.CalledProcessError:
-            # iTerm失败，尝试Terminal
+        clear_cache_button.clicked.connect(clear_cache)
+        refresh_status()
+        timer = QTimer(dialog)
+        timer.timeout.connect(refresh_status)
+        timer.start(1000)
+        button_box = QDialogButtonBox(
+            QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel
+        )
+        form.addRow(button_box)
+
+        def on_accept():
+            try:
+                port = int(port_edit.text().strip() or DEFAULT_PORT)
+            except ValueError:
+                QMessageBox.warning(dialog, "错误", "端口必须是整数")
+                return
+            if not 1 <= port <= 65535:
+                QMessageBox.warning(dialog, "错误", "端口范围为 1-65535")
+                return
             try:
-                terminal_script = f"""
-tell application "Terminal"
-    if it is running then
-        do script "source {env_file}"
-    else
-        do script "source {env_file}"
-    end if
-    activate
-end tell
-"""
-                subprocess.run(["osascript", "-e", terminal_script], check=True)
-            except subprocess.CalledProcessError as e:
-                print(f"macOS终端自动source失败: {e}")
-                # 最后尝试使用open命令
+                cache_mb = int(cache_size_edit.text().strip() or 256)
+            except ValueError:
+                cache_mb = 0
+            if cache_mb <= 0:
+                QMessageBox.warning(dialog, "错误", "缓存上限必须是正整数")
+                return
+            try:
+                max_streams = int(streams_edit.text().strip() or 100)
+            except ValueError:
+                max_streams = 0
+            if max_streams <= 0:
+                QMessageBox.warning(dialog, "错误", "每连接最大流数必须是正整数")
+                return
+            groups = []
+            for line in groups_edit.toPlainText().splitlines():
+                members = [name.strip() for name in line.split(",") if name.strip()]
+                if len(members) >= 2:
+                    groups.append(members)
+            unknown = sorted({m for g in groups for m in g if m not in self.config["models"]})
+            if unknown:
+                QMessageBox.warning(dialog, "错误", f"未找到模型: {', '.join(unknown)}")
+                return
+            pools = {}
+            for number, line in enumerate(pools_edit.toPlainText().splitlines(), 1):
+                if not line.strip():
+                    continue
+                fields = [field.strip() for field in line.split("|")] + ["", "", ""]
+                name, token, base_url, weight = fields[:4]
+                if name not in self.config["models"]:
+                    QMessageBox.warning(dialog, "错误", f"第 {number} 行：未找到模型 {name}")
+                    return
+                if not token and not base_url:
+                    QMessageBox.warning(dialog, "错误", f"第 {number} 行：token 与地址至少填写一项")
+                    return
                 try:
-                    subprocess.run(["open", "-a", "Terminal", env_file], check=False)
-                except:
-                    pass
+                    weight = float(weight or 1)
+                except ValueError:
+                    weight = 0
+                if weight <= 0:
+                    QMessageBox.warning(dialog, "错误", f"第 {number} 行：权重必须是正数")
+                    return
+                entry = {"weight": weight}
+                if token:
+                    entry["ANTHROPIC_AUTH_TOKEN"] = token
+                if base_url:
+                    entry["ANTHROPIC_BASE_URL"] = base_url
+                pools.setdefault(name, []).append(entry)
+            enabled = enabled_check.isChecked()
+            previous = gateway_settings(self.config)
+            ensure_token(self.config)
+            self.config["gateway"].update(
+                {
+                    "enabled": enabled, "port": port, "failover_groups": groups, "pools": pools,
+                    "sticky_routing": sticky_check.isChecked(),
+                    "response_cache": cache_check.isChecked(), "response_cache_mb": cache_mb,
+                    "usage_metering": metering_check.isChecked(),
+                    "rate_limiting": limiting_check.isChecked(),
+                    "coalesce_requests": coalesce_check.isChecked(),
+                    "http2": http2_check.isChecked(), "http2_max_streams": max_streams,
+                }
+            )
+            env_changed = (previous["enabled"], previous["port"]) != (enabled, port)
+            self.persist(env_changed=env_changed)
+            self.gateway_service.reconfigure()
+            if env_changed:
+                # env.sh 在网关与直连之间切换，需要重新 source 一次
+                self.auto_source_terminal()
+            dialog.accept()
+
+        button_box.accepted.connect(on_accept)
+        button_box.rejected.connect(dialog.reject)
+        dialog.exec()
+
+    def on_gateway_state(self, state):
+        if state == "running":
+            self.statusBar().showMessage(
+                f"本地网关已启动，端口 {self.gateway_service.running_port}", 5000
+            )
+        elif state == "failed":
+            QMessageBox.warning(
+                self, "本地网关", f"本地网关启动失败：\n{self.gateway_service.error}"
+            )
+
+    def show_compare_dialog(self):
+        """同一提示并发发给多个模型配置，对比首 token、生成速度与输出"""
+        if self.compare_dialog is None:
+            from compare_dialog import CompareDialog
+
+            self.compare_dialog = CompareDialog(lambda: self.config, self)
+        checked = [name for name in (self.current_model, self.config.get("active")) if name]
+        self.compare_dialog.set_profiles(self.config["models"], checked)
+        self.compare_dialog.show()
+        self.compare_dialog.raise_()
+        self.compare_dialog.activateWindow()
+
+    def show_trace_panel(self):
+        if self.trace_panel is None:
+            from trace_panel import TracePanel
+
+            self.trace_panel = TracePanel(self)
+        self.trace_panel.show()
+        self.trace_panel.raise_()
+        self.trace_panel.activateWindow()
+
+    def export_diagnostics(self, path=None, manual=False):
+        """写出诊断包：内存快照、Qt 对象数量、最近的 span、脱敏配置与环境信息"""
+        from diagnostics import write_bundle
+
+        try:
+            bundle = write_bundle(self.config, path, started=_STARTUP_T0)
+        except OSError as e:
+            QMessageBox.warning(self, "导出失败", f"无法写入诊断包：\n{e}")
+            return None
+        if manual:
+            QMessageBox.information(self, "提示", f"诊断包已保存到:\n{bundle}")
+        else:
+            self.statusBar().showMessage(f"诊断包已保存到: {bundle}", 10000)
+        return bundle
+
+    def show_remote_settings(self):
+        remote = self.config.setdefault("remote", {})
+        dialog = QDialog(self)
+        dialog.setWindowTitle("远程主机设置")
+        dialog.setMinimumWidth(420)
+        form = QFormLayout(dialog)
+        hosts_edit = QTextEdit()
+        hosts_edit.setPlainText("\n".join(remote.get("hosts", [])))
+        hosts_edit.setPlaceholderText("每行一个主机，例如 user@devbox-1")
+        parallel_edit = QLineEdit(str(remote.get("max_parallel", 4)))
+        form.addRow("远程主机:", hosts_edit)
+        form.addRow("最大并发数:", parallel_edit)
+        button_box = QDialogButtonBox(
+            QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel
+        )
+        form.addRow(button_box)
+
+        def on_accept():
+            try:
+                max_parallel = int(parallel_edit.text().strip())
+            except ValueError:
+                QMessageBox.warning(dialog, "错误", "最大并发数必须是整数")
+                return
+            hosts = [
+                line.strip()
+                for line in hosts_edit.toPlainText().splitlines()
+                if line.strip()
+            ]
+            remote["hosts"] = hosts
+            remote["max_parallel"] = max(1, max_parallel)
+            self.persist(env_changed=False)
+            dialog.accept()
+
+        button_box.accepted.connect(on_accept)
+        button_box.rejected.connect(dialog.reject)
+        dialog.exec()
 
     # Claude CLI 管理区域和相关功能已移除，改为仅显示官方文档和安装步骤
 
@@ -661,11 +1491,57 @@ end tell
 if __name__ == "__main__":
 
     app = QApplication(sys.argv)
+    startup_profile.mark("QApplication")
     # app.setApplicationName("Claude Model Manager")
     # app.setApplicationVersion("1.0.0")
     # app.setOrganizationName("Claude CLI Tools")
     # app.setWindowIcon(QIcon("assets/icon.icns"))
 
-    window = ModelManager()
-    window.show()
+    from single_instance import InstanceServer
+
+    args = parse_args(sys.argv[1:])
+    instance_server = InstanceServer(app)
+
+    if args.tray and QSystemTrayIcon.isSystemTrayAvailable():
+        from tray import TrayController
+
+        # 托盘模式下关闭主窗口不退出，窗口在首次打开时才创建
+        app.setQuitOnLastWindowClosed(False)
+        config_writer = ConfigWriter(save_config, update_env_file, env_data=env_data_for)
+        app.aboutToQuit.connect(config_writer.stop)
+        controller = TrayController(
+            load_config(),
+            config_writer,
+            TerminalLauncher(),
+            ModelManager,
+            render_env_file,
+            ENV_FILE,
+            app,
+        )
+
+        def on_command_line(argv):
+            command = parse_args(argv)
+            if command.diagnostics is not None:
+                controller.export_diagnostics(command.diagnostics or None)
+            elif command.switch:
+                controller.switch_to(command.switch)
+            else:
+                controller.show_window()
+
+        instance_server.message_received.connect(on_command_line)
+        instance_server.listen()
+        controller.show()
+        startup_profile.mark("tray shown")
+        startup_profile.report()
+        if args.switch or args.diagnostics is not None:
+            on_command_line(sys.argv[1:])
+    else:
+        window = ModelManager()
+        startup_profile.mark("window constructed")
+        instance_server.message_received.connect(window.handle_command_line)
+        instance_server.listen()
+
+        window.show()
+        if args.switch or args.diagnostics is not None:
+            window.handle_command_line(sys.argv[1:])
     sys.exit(app.exec())
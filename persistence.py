@@ -0,0 +1,120 @@
+"""
+Background persistence for Claude Model Manager
+Coalesces bursts of config changes into one durable write off the GUI thread
+"""
+
+import threading
+import time
+
+from PyQt6.QtCore import QObject, pyqtSignal
+
+from tracing import tracer
+
+
+def snapshot_config(config):
+    """Copy config deep enough that the writer thread never sees it mutate
+
+    Profiles in config["models"] are always replaced as a whole dict, never
+    edited in place, so copying the containers one level down is enough.
+    The usage ranking's list and counts are updated in place and copied too.
+    """
+    snapshot = {
+        key: dict(value) if isinstance(value, dict) else value
+        for key, value in config.items()
+    }
+    usage = snapshot.get("usage")
+    if usage:
+        snapshot["usage"] = {
+            key: value.copy() if isinstance(value, (dict, list)) else value
+            for key, value in usage.items()
+        }
+    return snapshot
+
+
+class ConfigWriter(QObject):
+    """Writes config.json and env.sh on a background thread
+
+    submit() only records the latest snapshot and wakes the writer. The writer
+    waits coalesce_delay for further submissions, then writes whatever is newest,
+    so N rapid switches cost a single write.
+    """
+
+    saved = pyqtSignal(int)  # generation written
+    failed = pyqtSignal(str)
+
+    def __init__(self, save_func, env_func, coalesce_delay=0.05, parent=None, env_data=None):
+        super().__init__(parent)
+        self.save_func = save_func
+        self.env_func = env_func
+        # 从配置快照中取出 env.sh 的变量，默认为当前模型的配置
+        self.env_data = env_data or (lambda config: config["models"][config["active"]])
+        self.coalesce_delay = coalesce_delay
+        self._cond = threading.Condition()
+        self._pending = None
+        self._pending_env = False
+        self._generation = 0
+        self._written = 0  # 最后一次写入成功的版本
+        self._attempted = 0  # 最后一次尝试写入的版本，无论成败
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, config, env_changed=True):
+        """Queue config for writing; returns the generation number"""
+        snapshot = snapshot_config(config)
+        with self._cond:
+            self._generation += 1
+            self._pending = snapshot
+            self._pending_env = self._pending_env or env_changed
+            self._cond.notify_all()
+            return self._generation
+
+    def flush(self, timeout=5.0):
+        """Block until everything submitted so far was written; False on timeout or failure"""
+        with self._cond:
+            target = self._generation
+            self._cond.wait_for(lambda: self._attempted >= target, timeout)
+            return self._written >= target
+
+    def stop(self, timeout=5.0):
+        self.flush(timeout)
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending is not None or self._stopped)
+                if self._stopped and self._pending is None:
+                    return
+                # 固定合并窗口：窗口内的新提交会覆盖旧快照
+                deadline = time.monotonic() + self.coalesce_delay
+                while not self._stopped:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                snapshot, write_env = self._pending, self._pending_env
+                generation = self._generation
+                self._pending = None
+                self._pending_env = False
+            try:
+                with tracer.span("config_writer.write", generation=generation):
+                    self.save_func(snapshot)
+                    active = snapshot.get("active")
+                    if write_env and active in snapshot["models"]:
+                        self.env_func(active, self.env_data(snapshot))
+            except Exception as e:
+                with self._cond:
+                    # 写入失败时保留 env.sh 待更新的标记，下一次提交仍会写 env.sh
+                    self._pending_env = self._pending_env or write_env
+                    self._attempted = generation
+                    self._cond.notify_all()
+                self.failed.emit(str(e))
+            else:
+                with self._cond:
+                    self._attempted = self._written = generation
+                    self._cond.notify_all()
+                self.saved.emit(generation)
@@ -0,0 +1,227 @@
+"""
+Profile list model for Claude Model Manager
+Exposes config["models"] to a QListView lazily, with the active profile as a role
+"""
+
+from PyQt6.QtCore import QAbstractListModel, QModelIndex, Qt
+from PyQt6.QtGui import QColor, QFont, QIcon, QPainter, QPixmap
+
+
+class ProfileListModel(QAbstractListModel):
+    """List model over the profiles in config["models"]
+
+    Rows are handed to the view in batches through canFetchMore/fetchMore, and
+    every mutation emits the narrowest signal possible instead of a reset.
+    """
+
+    NameRole = Qt.ItemDataRole.UserRole + 1
+    ActiveRole = Qt.ItemDataRole.UserRole + 2
+    StatusRole = Qt.ItemDataRole.UserRole + 3
+    CredentialRole = Qt.ItemDataRole.UserRole + 4
+
+    BATCH_SIZE = 500
+    ACTIVE_SUFFIX = " (Active)"
+    INVALID_CREDENTIAL_SUFFIX = "  · 凭证无效"
+    # 端点健康状态对应的圆点颜色，见 health_probe.ProbeResult
+    STATUS_COLORS = {
+        "up": "#2ca02c",
+        "degraded": "#ff9f1a",
+        "down": "#d62728",
+        "unknown": "#b0b0b0",
+    }
+
+    def __init__(self, config, parent=None):
+        super().__init__(parent)
+        self._bold_font = QFont()
+        self._bold_font.setBold(True)
+        # 状态与列表内容独立保存，重置或过滤后仍然保留
+        self._statuses = {}
+        self._status_tips = {}
+        self._credentials = {}
+        self._credential_tips = {}
+        self._badges = {}
+        self._load(config)
+
+    def _load(self, config, names=None):
+        self._config = config
+        self._names = list(config["models"]) if names is None else list(names)
+        self._rows = {name: row for row, name in enumerate(self._names)}
+        self._loaded = min(self.BATCH_SIZE, len(self._names))
+        self._active = config.get("active")
+
+    # --- Qt 模型接口 ---
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return self._loaded
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self._loaded < len(self._names)
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+        count = min(self.BATCH_SIZE, len(self._names) - self._loaded)
+        if count <= 0:
+            return
+        self.beginInsertRows(QModelIndex(), self._loaded, self._loaded + count - 1)
+        self._loaded += count
+        self.endInsertRows()
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or index.row() >= self._loaded:
+            return None
+        name = self._names[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            text = name + self.ACTIVE_SUFFIX if name == self._active else name
+            if self._credentials.get(name) == "invalid":
+                text += self.INVALID_CREDENTIAL_SUFFIX
+            return text
+        if role == self.NameRole:
+            return name
+        if role == self.ActiveRole:
+            return name == self._active
+        if role == Qt.ItemDataRole.FontRole and name == self._active:
+            return self._bold_font
+        if role == self.StatusRole:
+            return self._statuses.get(name)
+        if role == Qt.ItemDataRole.DecorationRole:
+            status = self._statuses.get(name)
+            return self._badge(status) if status else None
+        if role == self.CredentialRole:
+            return self._credentials.get(name)
+        if role == Qt.ItemDataRole.ForegroundRole and self._credentials.get(name) == "invalid":
+            return QColor("#d62728")
+        if role == Qt.ItemDataRole.ToolTipRole:
+            tips = [self._status_tips.get(name), self._credential_tips.get(name)]
+            return "\n".join(tip for tip in tips if tip) or None
+        return None
+
+    def _badge(self, status):
+        icon = self._badges.get(status)
+        if icon is None:
+            pixmap = QPixmap(12, 12)
+            pixmap.fill(Qt.GlobalColor.transparent)
+            painter = QPainter(pixmap)
+            painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+            painter.setPen(Qt.PenStyle.NoPen)
+            painter.setBrush(QColor(self.STATUS_COLORS.get(status, "#b0b0b0")))
+            painter.drawEllipse(1, 1, 10, 10)
+            painter.end()
+            icon = self._badges[status] = QIcon(pixmap)
+        return icon
+
+    def roleNames(self):
+        roles = super().roleNames()
+        roles[self.NameRole] = b"name"
+        roles[self.ActiveRole] = b"active"
+        roles[self.StatusRole] = b"status"
+        roles[self.CredentialRole] = b"credential"
+        return roles
+
+    # --- 查询 ---
+    def name_at(self, index):
+        if not index.isValid():
+            return None
+        return index.data(self.NameRole)
+
+    def index_of(self, name):
+        """QModelIndex for name, or an invalid index if not yet fetched"""
+        row = self._rows.get(name)
+        if row is None or row >= self._loaded:
+            return QModelIndex()
+        return self.index(row)
+
+    # --- 细粒度更新 ---
+    def reset(self, config):
+        self.beginResetModel()
+        self._load(config)
+        self.endResetModel()
+
+    def set_filter(self, names):
+        """Show only names, in the given order; None shows every profile"""
+        self.beginResetModel()
+        self._load(self._config, names)
+        self.endResetModel()
+
+    def add_profile(self, name):
+        if name in self._rows:
+            self.profile_changed(name)
+            return
+        row = len(self._names)
+        # 尚未加载完时新行留给 fetchMore，视图无需立即知道
+        visible = self._loaded == row
+        if visible:
+            self.beginInsertRows(QModelIndex(), row, row)
+        self._names.append(name)
+        self._rows[name] = row
+        if visible:
+            self._loaded += 1
+            self.endInsertRows()
+
+    def remove_profile(self, name):
+        row = self._rows.get(name)
+        if row is None:
+            return
+        visible = row < self._loaded
+        if visible:
+            self.beginRemoveRows(QModelIndex(), row, row)
+        del self._names[row]
+        del self._rows[name]
+        for offset, moved in enumerate(self._names[row:]):
+            self._rows[moved] = row + offset
+        if visible:
+            self._loaded -= 1
+            self.endRemoveRows()
+        if name == self._active:
+            self._active = None
+        for per_name in (self._statuses, self._status_tips, self._credentials, self._credential_tips):
+            per_name.pop(name, None)
+
+    def profile_changed(self, name):
+        index = self.index_of(name)
+        if index.isValid():
+            self.dataChanged.emit(index, index)
+
+    def set_statuses(self, statuses, tips=None):
+        """Update health badges for {name: status}, with one dataChanged per batch"""
+        self._statuses.update(statuses)
+        if tips:
+            self._status_tips.update(tips)
+        self._rows_changed(
+            statuses,
+            [Qt.ItemDataRole.DecorationRole, Qt.ItemDataRole.ToolTipRole, self.StatusRole],
+        )
+
+    def set_credentials(self, credentials, tips=None):
+        """Update credential validity for {name: status}; invalid ones are marked inline"""
+        self._credentials.update(credentials)
+        if tips:
+            self._credential_tips.update(tips)
+        self._rows_changed(
+            credentials,
+            [
+                Qt.ItemDataRole.DisplayRole,
+                Qt.ItemDataRole.ForegroundRole,
+                Qt.ItemDataRole.ToolTipRole,
+                self.CredentialRole,
+            ],
+        )
+
+    def _rows_changed(self, names, roles):
+        rows = [self._rows[name] for name in names if name in self._rows]
+        rows = [row for row in rows if row < self._loaded]
+        if rows:
+            self.dataChanged.emit(self.index(min(rows)), self.index(max(rows)), roles)
+
+    def status_of(self, name):
+        return self._statuses.get(name)
+
+    def set_active(self, name):
+        previous, self._active = self._active, name
+        if previous == name:
+            return
+        for changed in (previous, name):
+            index = self.index_of(changed)
+            if index.isValid():
+                self.dataChanged.emit(index, index)
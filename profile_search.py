@@ -0,0 +1,255 @@
+"""
+Profile search index for Claude Model Manager
+Incremental trigram and prefix index over profile names, base URL hosts and env keys
+"""
+
+import bisect
+import heapq
+import re
+from collections import Counter, defaultdict
+from itertools import chain
+from urllib.parse import urlparse
+
+from PyQt6.QtCore import QThread, pyqtSignal
+
+DEFAULT_LIMIT = 200
+# 模糊匹配从最稀有的三元组开始计数，累计 posting 数量超过预算即停止
+FUZZY_BUDGET = 50000
+FUZZY_MIN_RATIO = 0.6
+# 精确结果不足这么多时才做模糊匹配（通常是拼写错误）
+FUZZY_TRIGGER = 20
+
+_TOKEN_SPLIT = re.compile(r"[^0-9a-z]+")
+
+
+def _trigrams(text):
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+def _profile_terms(model_data):
+    """Lower-cased host and env keys of a profile; shared by many profiles"""
+    terms = {key.lower() for key in model_data}
+    host = urlparse(model_data.get("ANTHROPIC_BASE_URL", "")).hostname
+    if host:
+        terms.add(host.lower())
+    return terms
+
+
+class ProfileSearchIndex:
+    """Ranked fuzzy search over profiles, updated one profile at a time
+
+    Names are unique per profile and get their own trigram postings. Hosts and
+    env keys repeat across profiles, so each distinct string is indexed once and
+    maps to the set of profiles using it. Results are ranked name prefix first,
+    then name substring, host/key substring, and finally fuzzy trigram overlap.
+    """
+
+    def __init__(self):
+        self._next_id = 0
+        self._ids = {}
+        self._names = {}
+        self._lower = {}
+        self._doc_terms = {}
+        self._name_grams = defaultdict(set)
+        self._sorted_names = []
+        self._term_docs = defaultdict(set)
+        self._term_grams = defaultdict(set)
+        self._term_prefixes = defaultdict(set)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def rebuild(self, models):
+        self.__init__()
+        for name, model_data in models.items():
+            self._add(name, model_data, _profile_terms(model_data), bulk=True)
+        self._sorted_names.sort()
+
+    # --- 增量更新 ---
+    def add(self, name, model_data):
+        if name in self._ids:
+            self.remove(name)
+        self._add(name, model_data, _profile_terms(model_data))
+
+    def _add(self, name, model_data, terms, bulk=False):
+        doc = self._next_id
+        self._next_id += 1
+        lower = name.lower()
+        self._ids[name] = doc
+        self._names[doc] = name
+        self._lower[doc] = lower
+        name_grams = self._name_grams
+        for gram in _trigrams(lower):
+            name_grams[gram].add(doc)
+        if bulk:
+            self._sorted_names.append((lower, name))
+        else:
+            bisect.insort(self._sorted_names, (lower, name))
+
+        self._doc_terms[doc] = terms
+        for term in terms:
+            docs = self._term_docs[term]
+            if not docs:
+                self._index_term(term)
+            docs.add(doc)
+
+    def remove(self, name):
+        doc = self._ids.pop(name, None)
+        if doc is None:
+            return
+        del self._names[doc]
+        lower = self._lower.pop(doc)
+        for gram in _trigrams(lower):
+            self._discard(self._name_grams, gram, doc)
+        pos = bisect.bisect_left(self._sorted_names, (lower, name))
+        if pos < len(self._sorted_names) and self._sorted_names[pos] == (lower, name):
+            del self._sorted_names[pos]
+
+        for term in self._doc_terms.pop(doc):
+            self._discard(self._term_docs, term, doc)
+            if term not in self._term_docs:
+                self._unindex_term(term)
+
+    def update(self, name, model_data):
+        self.add(name, model_data)
+
+    def _index_term(self, term):
+        for gram in _trigrams(term):
+            self._term_grams[gram].add(term)
+        for prefix in self._token_prefixes(term):
+            self._term_prefixes[prefix].add(term)
+
+    def _unindex_term(self, term):
+        for gram in _trigrams(term):
+            self._discard(self._term_grams, gram, term)
+        for prefix in self._token_prefixes(term):
+            self._discard(self._term_prefixes, prefix, term)
+
+    @staticmethod
+    def _token_prefixes(term):
+        prefixes = set()
+        for token in _TOKEN_SPLIT.split(term):
+            if token:
+                prefixes.add(token[:1])
+                prefixes.add(token[:2])
+        return prefixes
+
+    @staticmethod
+    def _discard(postings, key, value):
+        values = postings.get(key)
+        if values is not None:
+            values.discard(value)
+            if not values:
+                del postings[key]
+
+    # --- 查询 ---
+    def search(self, query, limit=DEFAULT_LIMIT):
+        """Return up to limit profile names, best match first"""
+        query = query.strip().lower()
+        if not query:
+            return []
+        results = self._name_prefix_matches(query, limit)
+        if len(results) >= limit:
+            return results
+        seen = {self._ids[name] for name in results}
+
+        def extend(docs):
+            for doc in docs:
+                if len(results) >= limit:
+                    return
+                if doc not in seen:
+                    seen.add(doc)
+                    results.append(self._names[doc])
+
+        if len(query) < 3:
+            terms = self._term_prefixes.get(query, ())
+            extend(self._docs_for_terms(terms))
+            return results
+
+        grams = _trigrams(query)
+        name_docs = self._intersect(self._name_grams, grams)
+        lower = self._lower
+        # 单个三元组即是子串本身，无需再逐个校验
+        if len(query) == 3:
+            substring = [(len(lower[d]), d) for d in name_docs]
+        else:
+            substring = [(len(s), d) for d in name_docs if query in (s := lower[d])]
+        extend(self._shortest(substring, limit - len(results)))
+        terms = [t for t in self._intersect(self._term_grams, grams) if query in t]
+        extend(self._docs_for_terms(terms))
+        if len(results) < limit:
+            scattered = [(len(lower[d]), d) for d in name_docs if d not in seen]
+            extend(self._shortest(scattered, limit - len(results)))
+        if len(results) < FUZZY_TRIGGER:
+            extend(self._fuzzy(grams, seen, limit - len(results)))
+        return results
+
+    def _name_prefix_matches(self, query, limit):
+        names = self._sorted_names
+        start = bisect.bisect_left(names, (query, ""))
+        results = []
+        for lowered, name in names[start : start + limit]:
+            if not lowered.startswith(query):
+                break
+            results.append(name)
+        # 完全匹配排在最前
+        results.sort(key=lambda n: (n.lower() != query, len(n)))
+        return results
+
+    @staticmethod
+    def _intersect(postings, grams):
+        sets = sorted((postings.get(gram, ()) for gram in grams), key=len)
+        if not sets or not sets[0]:
+            return set()
+        result = set(sets[0])
+        for values in sets[1:]:
+            result &= values
+            if not result:
+                break
+        return result
+
+    @staticmethod
+    def _shortest(scored, count):
+        # 传入预先组装的 (长度, doc) 元组，比 key=lambda 快得多
+        return [d for _, d in heapq.nsmallest(count, scored)]
+
+    def _docs_for_terms(self, terms):
+        # 较短（更精确）的 host/key 优先
+        for term in sorted(terms, key=len):
+            yield from self._term_docs.get(term, ())
+
+    def _fuzzy(self, grams, seen, count):
+        postings = sorted((self._name_grams.get(gram, ()) for gram in grams), key=len)
+        counted = []
+        total = 0
+        for docs in postings:
+            total += len(docs)
+            if counted and total > FUZZY_BUDGET:
+                break
+            counted.append(docs)
+        hits = Counter(chain.from_iterable(counted))
+        # 不存在的三元组（拼写错误处）也计入分母
+        needed = max(1, int(len(counted) * FUZZY_MIN_RATIO))
+        lower = self._lower
+        scored = [
+            (-n, len(lower[d]), d)
+            for d, n in hits.items()
+            if n >= needed and d not in seen
+        ]
+        return [d for _, _, d in heapq.nsmallest(count, scored)]
+
+
+class SearchIndexBuildThread(QThread):
+    """Thread for building the initial index without blocking UI"""
+
+    index_ready = pyqtSignal(object)
+
+    def __init__(self, models, parent=None):
+        super().__init__(parent)
+        # 浅拷贝即可：界面线程修改配置时总是整体替换单个模型的 dict
+        self.models = dict(models)
+
+    def run(self):
+        index = ProfileSearchIndex()
+        index.rebuild(self.models)
+        self.index_ready.emit(index)
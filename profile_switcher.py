@@ -0,0 +1,102 @@
+"""
+Profile switching for Claude Model Manager
+Applies a switch and pushes env.sh to remote hosts; shared by the main window and the tray
+"""
+
+from PyQt6.QtCore import QObject, pyqtSignal
+
+from propagation import PropagationThread, propagator_from_config
+from tracing import tracer
+
+
+class ProfileSwitcher(QObject):
+    """The one place a switch updates config, usage ranking, env.sh, gateway and remote hosts
+
+    The main window and the tray both go through it; reporting is left to
+    them via the propagation signals. Config and usage are read through
+    getters because resetting the config replaces both objects.
+    """
+
+    propagation_started = pyqtSignal(int)  # 主机数
+    propagation_finished = pyqtSignal(list, bool)  # HostResult 列表, 是否手动触发
+    propagation_failed = pyqtSignal(str)
+
+    def __init__(self, config_getter, usage_getter, config_writer, gateway_service, env_file,
+                 render_env, parent=None):
+        super().__init__(parent)
+        self.config_getter = config_getter
+        self.usage_getter = usage_getter
+        self.config_writer = config_writer
+        self.gateway_service = gateway_service
+        self.env_file = env_file
+        self.render_env = render_env
+        # 排行以 to_dict() 的形式保存在配置中，之后每次只更新变化的条目
+        config_getter()["usage"] = usage_getter().to_dict()
+        self.propagation_thread = None
+        # 推送进行中又有新的推送请求：None 表示没有，否则记录其中是否有手动触发的
+        self.propagate_again = None
+
+    def switch(self, name, record=True):
+        """Make name active, queue the config and env.sh write and propagate; returns the generation
+
+        record=False (automatic switches) leaves the usage ranking alone.
+        """
+        config = self.config_getter()
+        config["active"] = name
+        if record:
+            self.record_usage(name)
+        with tracer.span("persist.submit") as span:
+            generation = self.config_writer.submit(config, True)
+            span.set(generation=generation)
+        self.gateway_service.sync()
+        self.propagate()
+        return generation
+
+    def record_usage(self, name):
+        """更新最近/常用排行，随配置一起由后台线程写入 config.json"""
+        with tracer.span("record_usage"):
+            usage = self.usage_getter()
+            usage.record(name)
+            usage.update_dict(self.config_getter().setdefault("usage", {}), name)
+
+    def forget_usage(self, name):
+        usage = self.usage_getter()
+        if name in usage:
+            usage.remove(name)
+            usage.update_dict(self.config_getter().setdefault("usage", {}), name)
+
+    def propagate(self, manual=False):
+        """Push the active profile's env.sh to the remote hosts; False if none are configured"""
+        config = self.config_getter()
+        remote = config.get("remote", {})
+        hosts = remote.get("hosts", [])
+        if not hosts:
+            return False
+        if self.propagation_thread and self.propagation_thread.isRunning():
+            # 上一次推送完成后只再补推一次最新内容
+            self.propagate_again = manual or bool(self.propagate_again)
+            return True
+        active = config.get("active")
+        if not active:
+            return True
+        try:
+            propagator = propagator_from_config(remote)
+        except ValueError as e:
+            self.propagation_failed.emit(str(e))
+            return True
+        files = {self.env_file.name: self.render_env(config["models"][active])}
+        self.propagation_thread = PropagationThread(propagator, hosts, files)
+        self.propagation_thread.results_ready.connect(
+            lambda results: self.on_propagation_done(results, manual)
+        )
+        self.propagation_started.emit(len(hosts))
+        self.propagation_thread.start()
+        return True
+
+    def on_propagation_done(self, results, manual):
+        self.propagation_finished.emit(results, manual)
+        if self.propagate_again is not None:
+            manual_again, self.propagate_again = self.propagate_again, None
+            # 结果是 run() 的最后一步发出的，等线程退出后才能开始下一次推送
+            self.propagation_thread.wait()
+            self.propagate(manual_again)
@@ -0,0 +1,203 @@
+"""
+Remote propagation for Claude Model Manager
+Pushes the generated env.sh to remote dev hosts concurrently
+"""
+
+import hashlib
+import shlex
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from PyQt6.QtCore import QThread, pyqtSignal
+
+from tracing import tracer
+
+REMOTE_DIR = ".claude-cli"
+GENERATION_FILE = "env.generation"
+DEFAULT_MAX_PARALLEL = 4
+
+
+def compute_generation(files):
+    """Content hash of the files to push; hosts holding it are up to date"""
+    digest = hashlib.sha256()
+    for name in sorted(files):
+        digest.update(name.encode("utf-8") + b"\0")
+        digest.update(files[name].encode("utf-8") + b"\0")
+    return digest.hexdigest()[:16]
+
+
+class Transport:
+    """Base transport: read a host's generation and push files to it"""
+
+    def __init__(self, timeout=20):
+        self.timeout = timeout
+
+    def read_generation(self, host):
+        raise NotImplementedError
+
+    def push(self, host, files):
+        raise NotImplementedError
+
+    def _run(self, cmd, input_text=None):
+        result = subprocess.run(
+            cmd,
+            input=input_text,
+            capture_output=True,
+            text=True,
+            timeout=self.timeout,
+        )
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.strip() or f"退出码 {result.returncode}")
+        return result.stdout
+
+
+class SshTransport(Transport):
+    """Push over ssh/scp using the user's ssh config and agent"""
+
+    def __init__(self, timeout=20, connect_timeout=5):
+        super().__init__(timeout)
+        self.ssh_options = [
+            "-o",
+            "BatchMode=yes",
+            "-o",
+            f"ConnectTimeout={connect_timeout}",
+        ]
+
+    def read_generation(self, host):
+        script = (
+            f"umask 077 && mkdir -p ~/{REMOTE_DIR} "
+            f"&& cat ~/{REMOTE_DIR}/{GENERATION_FILE} 2>/dev/null || true"
+        )
+        return self._run(["ssh"] + self.ssh_options + [host, script]).strip() or None
+
+    def push(self, host, files):
+        # 先写临时文件再 mv，避免远程 shell 读到写了一半的 env.sh；
+        # env.sh 含有 token，umask 077 使其只对本人可读写
+        for name, content in files.items():
+            target = f"~/{REMOTE_DIR}/{name}"
+            script = f"umask 077 && cat > {target}.tmp && mv {target}.tmp {target}"
+            self._run(["ssh"] + self.ssh_options + [host, script], content)
+
+
+class LocalCommandTransport(Transport):
+    """Treat each host as a directory under root, driven through local shell commands
+
+    Exercises the same subprocess and concurrency paths as SshTransport without
+    needing real hosts, which makes it suitable for testing.
+    """
+
+    def __init__(self, root, timeout=20):
+        super().__init__(timeout)
+        self.root = Path(root)
+
+    def _host_dir(self, host):
+        return shlex.quote(str(self.root / host / REMOTE_DIR))
+
+    def read_generation(self, host):
+        host_dir = self._host_dir(host)
+        script = (
+            f"umask 077 && mkdir -p {host_dir} "
+            f"&& cat {host_dir}/{GENERATION_FILE} 2>/dev/null || true"
+        )
+        return self._run(["sh", "-c", script]).strip() or None
+
+    def push(self, host, files):
+        host_dir = self._host_dir(host)
+        for name, content in files.items():
+            target = f"{host_dir}/{name}"
+            script = f"umask 077 && cat > {target}.tmp && mv {target}.tmp {target}"
+            self._run(["sh", "-c", script], content)
+
+
+TRANSPORTS = {
+    "ssh": SshTransport,
+    "local": LocalCommandTransport,
+}
+
+
+class HostResult:
+    """Outcome of propagating to a single host"""
+
+    PUSHED = "pushed"
+    SKIPPED = "skipped"
+    FAILED = "failed"
+
+    def __init__(self, host, status, latency, error=None):
+        self.host = host
+        self.status = status
+        self.latency = latency
+        self.error = error
+
+    def __repr__(self):
+        return f"HostResult({self.host!r}, {self.status!r}, {self.latency:.3f}s)"
+
+    def summary(self):
+        line = f"{self.host}: {self.status} ({self.latency * 1000:.0f} ms)"
+        if self.error:
+            line += f" - {self.error}"
+        return line
+
+
+class Propagator:
+    """Push files to many hosts with bounded parallelism"""
+
+    def __init__(self, transport, max_parallel=DEFAULT_MAX_PARALLEL):
+        self.transport = transport
+        self.max_parallel = max(1, int(max_parallel))
+
+    def propagate(self, hosts, files):
+        """Return a HostResult per host, in the order hosts were given"""
+        if not hosts:
+            return []
+        # generation 文件最后写入，中途失败的主机下次会被重新推送
+        generation = compute_generation(files)
+        payload = dict(files)
+        payload[GENERATION_FILE] = generation + "\n"
+        workers = min(self.max_parallel, len(hosts))
+        with tracer.span("propagate", hosts=len(hosts)):
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                return list(
+                    pool.map(lambda host: self._push_one(host, generation, payload), hosts)
+                )
+
+    def _push_one(self, host, generation, payload):
+        start = time.perf_counter()
+        try:
+            if self.transport.read_generation(host) == generation:
+                return HostResult(host, HostResult.SKIPPED, time.perf_counter() - start)
+            self.transport.push(host, payload)
+            return HostResult(host, HostResult.PUSHED, time.perf_counter() - start)
+        except Exception as e:
+            return HostResult(host, HostResult.FAILED, time.perf_counter() - start, str(e))
+
+
+def propagator_from_config(remote_config):
+    """Build a Propagator from the "remote" section of config.json
+
+    Raises ValueError for a transport that is not in TRANSPORTS.
+    """
+    kind = remote_config.get("transport", "ssh")
+    if kind not in TRANSPORTS:
+        raise ValueError(f"未知的远程传输方式: {kind}（可选: {'、'.join(TRANSPORTS)}）")
+    if kind == "local":
+        transport = LocalCommandTransport(remote_config.get("local_root", "."))
+    else:
+        transport = TRANSPORTS[kind]()
+    return Propagator(transport, remote_config.get("max_parallel", DEFAULT_MAX_PARALLEL))
+
+
+class PropagationThread(QThread):
+    """Thread for propagating env.sh without blocking UI"""
+
+    results_ready = pyqtSignal(list)
+
+    def __init__(self, propagator, hosts, files, parent=None):
+        super().__init__(parent)
+        self.propagator = propagator
+        self.hosts = hosts
+        self.files = files
+
+    def run(self):
+        self.results_ready.emit(self.propagator.propagate(self.hosts, self.files))
@@ -0,0 +1,235 @@
+"""
+Rate limiting for Claude Model Manager
+Per-upstream request and token buckets learned from rate-limit response headers
+"""
+
+import asyncio
+import time
+from datetime import datetime, timezone
+
+# 预计排队超过此时长时，直接返回 429 让客户端自行退避
+MAX_WAIT_SECONDS = 120.0
+# Anthropic 的限额按分钟计，并持续回填
+WINDOW_SECONDS = 60.0
+# 按请求体大小粗略估算输入 token（约 4 字节一个 token）
+BYTES_PER_TOKEN = 4
+# 优先使用输入 token 限额，其次是总 token 限额
+TOKEN_LIMIT_PREFIXES = ("anthropic-ratelimit-input-tokens", "anthropic-ratelimit-tokens")
+REQUEST_LIMIT_PREFIX = "anthropic-ratelimit-requests"
+
+
+class RateLimited(Exception):
+    """The expected wait is longer than the limiter is allowed to queue"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"预计需要等待 {retry_after:.0f} 秒")
+        self.retry_after = retry_after
+
+
+def estimate_tokens(body):
+    return len(body) // BYTES_PER_TOKEN if body else 0
+
+
+def parse_reset(value, now_wall=None):
+    """Seconds until an RFC 3339 reset time, or None"""
+    if not value:
+        return None
+    try:
+        reset = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if reset.tzinfo is None:
+        reset = reset.replace(tzinfo=timezone.utc)
+    return max(0.0, reset.timestamp() - (now_wall or time.time()))
+
+
+def parse_retry_after(value):
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Continuously refilled bucket of `capacity` units per WINDOW_SECONDS"""
+
+    __slots__ = ("capacity", "rate", "level", "updated")
+
+    def __init__(self, capacity, now):
+        self.capacity = float(capacity)
+        self.rate = self.capacity / WINDOW_SECONDS
+        self.level = self.capacity
+        self.updated = now
+
+    def refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, cost, now):
+        self.refill(now)
+        cost = min(cost, self.capacity)
+        return 0.0 if self.level >= cost else (cost - self.level) / self.rate
+
+    def take(self, cost, now):
+        self.refill(now)
+        self.level -= min(cost, self.capacity)
+
+    def sync(self, limit, remaining, now):
+        """Adopt the server's limit and remaining count; it is authoritative over local estimates"""
+        if limit != self.capacity:
+            self.capacity = float(limit)
+            self.rate = self.capacity / WINDOW_SECONDS
+        self.level = min(self.capacity, float(remaining))
+        self.updated = now
+
+
+class UpstreamLimits:
+    """What has been learned about one upstream credential"""
+
+    def __init__(self):
+        self.requests = None
+        self.tokens = None
+        self.blocked_until = 0.0
+        # asyncio.Lock 按先来先到唤醒，排队的请求依次放行
+        self.queue = asyncio.Lock()
+        self.waiting = 0
+
+    def known(self, now):
+        return self.requests is not None or self.tokens is not None or self.blocked_until > now
+
+    def delay(self, tokens, now):
+        delay = max(0.0, self.blocked_until - now)
+        if self.requests is not None:
+            delay = max(delay, self.requests.delay(1, now))
+        if self.tokens is not None and tokens:
+            delay = max(delay, self.tokens.delay(tokens, now))
+        return delay
+
+    def take(self, tokens, now):
+        if self.requests is not None:
+            self.requests.take(1, now)
+        if self.tokens is not None and tokens:
+            self.tokens.take(tokens, now)
+
+    def to_dict(self, now):
+        data = {"waiting": self.waiting, "blocked_for": round(max(0.0, self.blocked_until - now), 1)}
+        for name in ("requests", "tokens"):
+            bucket = getattr(self, name)
+            if bucket is not None:
+                bucket.refill(now)
+                data[name] = {"limit": int(bucket.capacity), "available": int(bucket.level)}
+        return data
+
+
+class RateLimiter:
+    """Queues requests locally instead of sending them into a 429
+
+    observe() reads every upstream response: anthropic-ratelimit-*-limit and
+    -remaining size and level the request and token buckets, and retry-after
+    (or a reset time with nothing remaining) blocks the upstream until then.
+    acquire() returns at once for upstreams with no known limits; otherwise
+    callers wait in FIFO order until both buckets can cover the request.
+    """
+
+    def __init__(self, max_wait=MAX_WAIT_SECONDS, clock=time.monotonic):
+        self.max_wait = max_wait
+        self.clock = clock
+        self.limits = {}
+        self.waiting = 0
+        self.queued = 0
+        self.rejected = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def observe(self, key, headers, status):
+        now = self.clock()
+        limits = self.limits.get(key)
+        if limits is None:
+            limits = UpstreamLimits()
+        learned = self._learn(limits, "requests", (REQUEST_LIMIT_PREFIX,), headers, now)
+        learned = self._learn(limits, "tokens", TOKEN_LIMIT_PREFIXES, headers, now) or learned
+        if status == 429:
+            retry_after = parse_retry_after(headers.get("retry-after"))
+            if retry_after is not None:
+                limits.blocked_until = max(limits.blocked_until, now + retry_after)
+                learned = True
+        if learned:
+            self.limits[key] = limits
+
+    @staticmethod
+    def _learn(limits, name, prefixes, headers, now):
+        """Size one bucket from the first header family present; True if any was"""
+        for prefix in prefixes:
+            try:
+                limit = float(headers[f"{prefix}-limit"])
+                remaining = float(headers[f"{prefix}-remaining"])
+            except (KeyError, ValueError):
+                continue
+            if limit <= 0:
+                continue
+            bucket = getattr(limits, name)
+            if bucket is None:
+                bucket = TokenBucket(limit, now)
+                setattr(limits, name, bucket)
+            bucket.sync(limit, remaining, now)
+            if remaining <= 0:
+                reset = parse_reset(headers.get(f"{prefix}-reset"))
+                if reset:
+                    limits.blocked_until = max(limits.blocked_until, now + reset)
+            return True
+        return False
+
+    def delay(self, key, tokens):
+        """Seconds a request would have to wait on this upstream right now"""
+        limits = self.limits.get(key)
+        if limits is None:
+            return 0.0
+        if limits.waiting:
+            # 已有请求在排队时，新请求排在它们后面
+            return max(limits.delay(tokens, self.clock()), 0.001)
+        return limits.delay(tokens, self.clock())
+
+    async def acquire(self, key, tokens):
+        """Wait for capacity on key; returns seconds waited, raises RateLimited past max_wait"""
+        limits = self.limits.get(key)
+        started = self.clock()
+        if limits is None or not limits.known(started):
+            return 0.0
+        delay = limits.delay(tokens, started)
+        if delay <= 0 and not limits.waiting:
+            limits.take(tokens, started)
+            return 0.0
+        if delay > self.max_wait:
+            self.rejected += 1
+            raise RateLimited(delay)
+        self.waiting += 1
+        self.queued += 1
+        limits.waiting += 1
+        try:
+            async with limits.queue:
+                while True:
+                    now = self.clock()
+                    delay = limits.delay(tokens, now)
+                    if delay <= 0:
+                        break
+                    await asyncio.sleep(delay)
+                limits.take(tokens, now)
+        finally:
+            self.waiting -= 1
+            limits.waiting -= 1
+        waited = self.clock() - started
+        self.wait_total += waited
+        self.wait_max = max(self.wait_max, waited)
+        return waited
+
+    def stats(self):
+        now = self.clock()
+        return {
+            "queue_depth": self.waiting,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "wait_total_seconds": round(self.wait_total, 3),
+            "wait_avg_seconds": round(self.wait_total / self.queued, 3) if self.queued else 0.0,
+            "wait_max_seconds": round(self.wait_max, 3),
+            "upstreams": {key: limits.to_dict(now) for key, limits in self.limits.items()},
+        }
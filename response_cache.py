@@ -0,0 +1,237 @@
+"""
+Response cache for Claude Model Manager
+Content-addressed disk cache that replays deterministic Messages responses through the local gateway
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+
+CACHE_DIR = Path.home() / ".claude-cli" / "response_cache"
+DEFAULT_MAX_MB = 256
+# 单条响应超过此大小不缓存，避免一次超长输出占用过多内存
+MAX_ENTRY_BYTES = 8 * 1024 * 1024
+# 会影响响应内容的请求头；鉴权、User-Agent 等不参与缓存键
+KEY_HEADERS = ("anthropic-version", "anthropic-beta")
+# 回放时保留的响应头；限流等头部在回放时已经过时
+KEPT_RESPONSE_HEADERS = ("content-type",)
+CACHE_HEADER = "X-Claude-Model-Manager-Cache"
+# SSE 事件以空行结束，回放时按事件逐块写出
+SSE_EVENT = re.compile(rb".*?(?:\r\n\r\n|\n\n|\r\r)", re.S)
+
+
+def cacheable(request):
+    """Only Messages requests that ask for temperature 0 are treated as deterministic"""
+    if request.method != "POST" or request.target.split("?", 1)[0] != "/v1/messages":
+        return False
+    temperature = request.payload().get("temperature")
+    return temperature == 0 and not isinstance(temperature, bool)
+
+
+def cache_key(profile, request):
+    """SHA-256 of the profile and the canonical request
+
+    The JSON body is re-serialised with sorted keys and no whitespace, so
+    clients that order fields differently still share entries.
+    """
+    canonical = json.dumps(request.payload(), sort_keys=True, separators=(",", ":"),
+                           ensure_ascii=False)
+    digest = hashlib.sha256()
+    parts = [profile, request.method, request.target]
+    parts.extend(request.headers.get(name, "") for name in KEY_HEADERS)
+    parts.append(canonical)
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class CachedResponse:
+    def __init__(self, status, reason, headers, body):
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.body = body
+
+    def streaming(self):
+        return any(
+            name.lower() == "content-type" and value.startswith("text/event-stream")
+            for name, value in self.headers
+        )
+
+    def pieces(self):
+        """Body split at SSE event boundaries, byte for byte as received"""
+        if not self.streaming():
+            return [self.body]
+        pieces = [match.group() for match in SSE_EVENT.finditer(self.body)]
+        rest = len(b"".join(pieces))
+        if rest < len(self.body):
+            pieces.append(self.body[rest:])
+        return pieces
+
+
+class CacheRecorder:
+    """Collects one upstream response while the gateway relays it"""
+
+    def __init__(self, key, limit=MAX_ENTRY_BYTES):
+        self.key = key
+        self.limit = limit
+        self.status = None
+        self.reason = ""
+        self.headers = []
+        self.parts = []
+        self.size = 0
+        self.complete = False
+        self.overflow = False
+
+    def start(self, response):
+        self.status = response.status
+        self.reason = response.reason
+        self.headers = [
+            (name, value) for name, value in response.raw_headers
+            if name.lower() in KEPT_RESPONSE_HEADERS
+        ]
+
+    def feed(self, chunk):
+        if self.overflow:
+            return
+        self.size += len(chunk)
+        if self.size > self.limit:
+            self.overflow = True
+            self.parts = []
+            return
+        self.parts.append(chunk)
+
+    def result(self):
+        """The response to store, or None if it must not be cached"""
+        if not self.complete or self.overflow or self.status != 200:
+            return None
+        body = b"".join(self.parts)
+        cached = CachedResponse(self.status, self.reason, self.headers, body)
+        # 流中途返回 error 事件的响应不缓存
+        if cached.streaming() and (b"event: error" in body or b"message_stop" not in body):
+            return None
+        return cached
+
+
+class ResponseCache:
+    """zlib-compressed entries under CACHE_DIR, evicted least-recently-used by total size
+
+    Each entry is one file named after its key: a JSON header line (status,
+    reason, headers) followed by the compressed body. Recency lives in an
+    in-memory OrderedDict, rebuilt from file mtimes at startup; a hit
+    touches the file so the order survives restarts. File I/O runs in a
+    worker thread so the gateway's event loop keeps relaying other streams.
+    """
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=DEFAULT_MAX_MB * 1024 * 1024):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.index = OrderedDict()  # key → 文件大小，最久未使用的在前
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self._load_index()
+
+    def path_for(self, key):
+        return self.directory / key[:2] / f"{key}.bin"
+
+    async def get(self, key):
+        if key not in self.index:
+            self.misses += 1
+            return None
+        try:
+            cached = await asyncio.to_thread(self._read, key)
+        except (OSError, ValueError, KeyError, zlib.error):
+            self._forget(key)
+            self.misses += 1
+            return None
+        if key in self.index:
+            self.index.move_to_end(key)
+        self.hits += 1
+        return cached
+
+    async def put(self, key, cached):
+        size = await asyncio.to_thread(self._write, key, cached)
+        if key in self.index:
+            self.total_bytes -= self.index[key]
+        self.index[key] = size
+        self.total_bytes += size
+        self.stores += 1
+        self.evict()
+
+    def evict(self):
+        while self.total_bytes > self.max_bytes and self.index:
+            key = next(iter(self.index))
+            self._forget(key)
+            self.evictions += 1
+
+    def clear(self):
+        for key in list(self.index):
+            self._forget(key)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.index),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+    # --- 内部实现 ---
+    def _load_index(self):
+        entries = []
+        for path in self.directory.glob("*/*.bin"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, path.stem, stat.st_size))
+        for _, key, size in sorted(entries):
+            self.index[key] = size
+            self.total_bytes += size
+
+    def _forget(self, key):
+        self.total_bytes -= self.index.pop(key, 0)
+        try:
+            os.remove(self.path_for(key))
+        except OSError:
+            pass
+
+    def _read(self, key):
+        path = self.path_for(key)
+        with open(path, "rb") as f:
+            meta = json.loads(f.readline())
+            body = zlib.decompress(f.read())
+        os.utime(path)
+        headers = [tuple(pair) for pair in meta["headers"]]
+        return CachedResponse(meta["status"], meta["reason"], headers, body)
+
+    def _write(self, key, cached):
+        path = self.path_for(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        meta = {
+            "status": cached.status,
+            "reason": cached.reason,
+            "headers": cached.headers,
+            "stored_at": time.time(),
+        }
+        tmp_file = path.with_suffix(".tmp")
+        with open(tmp_file, "wb") as f:
+            f.write(json.dumps(meta, ensure_ascii=False).encode("utf-8") + b"\n")
+            f.write(zlib.compress(cached.body, 6))
+        os.replace(tmp_file, path)
+        return path.stat().st_size
@@ -0,0 +1,82 @@
+"""
+Single-instance support for Claude Model Manager
+A second launch forwards its arguments to the running instance over a local socket
+"""
+
+import getpass
+import json
+
+from PyQt6.QtCore import QObject, pyqtSignal
+from PyQt6.QtNetwork import QLocalServer, QLocalSocket
+
+SERVER_NAME = f"claude-model-manager-{getpass.getuser()}"
+CONNECT_TIMEOUT_MS = 200
+
+
+def forward_to_running_instance(args, timeout_ms=CONNECT_TIMEOUT_MS):
+    """Send args to a running instance; True if one accepted them
+
+    Needs only QtCore/QtNetwork and no QApplication, so a second launch can
+    exit before paying for the widget stack.
+    """
+    socket = QLocalSocket()
+    socket.connectToServer(SERVER_NAME)
+    if not socket.waitForConnected(timeout_ms):
+        return False
+    socket.write(json.dumps(list(args)).encode("utf-8") + b"\n")
+    if not socket.waitForBytesWritten(timeout_ms):
+        return False
+    # 等待对方确认，避免在对方读取前断开
+    acked = socket.waitForReadyRead(timeout_ms) and socket.readAll().data() == b"ok"
+    socket.disconnectFromServer()
+    return acked
+
+
+class InstanceServer(QObject):
+    """Local server owned by the first instance"""
+
+    message_received = pyqtSignal(list)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.server = QLocalServer(self)
+        self.server.setSocketOptions(QLocalServer.SocketOption.UserAccessOption)
+        self.server.newConnection.connect(self.on_new_connection)
+
+    def listen(self):
+        if self.server.listen(SERVER_NAME):
+            return True
+        # 上次异常退出可能残留套接字文件：确认连不上、没有实例在监听后才清理重试，
+        # 否则会删掉另一个正在运行的实例的套接字
+        socket = QLocalSocket()
+        socket.connectToServer(SERVER_NAME)
+        if socket.waitForConnected(CONNECT_TIMEOUT_MS):
+            socket.disconnectFromServer()
+            return False
+        stale = (
+            QLocalSocket.LocalSocketError.ServerNotFoundError,
+            QLocalSocket.LocalSocketError.ConnectionRefusedError,
+        )
+        if socket.error() not in stale:
+            return False
+        QLocalServer.removeServer(SERVER_NAME)
+        return self.server.listen(SERVER_NAME)
+
+    def on_new_connection(self):
+        while self.server.hasPendingConnections():
+            socket = self.server.nextPendingConnection()
+            socket.readyRead.connect(lambda s=socket: self.on_ready_read(s))
+            socket.disconnected.connect(socket.deleteLater)
+
+    def on_ready_read(self, socket):
+        if not socket.canReadLine():
+            return
+        line = socket.readLine().data()
+        try:
+            args = json.loads(line.decode("utf-8"))
+        except ValueError:
+            args = None
+        socket.write(b"ok")
+        socket.flush()
+        if isinstance(args, list):
+            self.message_received.emit([str(arg) for arg in args])
@@ -0,0 +1,36 @@
+"""
+Startup timing for Claude Model Manager
+Records import and startup phase timestamps, printed with --startup-profile
+"""
+
+import sys
+import time
+
+
+class StartupProfile:
+    """Collects (label, timestamp) marks relative to process start"""
+
+    def __init__(self, t0, enabled=False):
+        self.t0 = t0
+        self.enabled = enabled
+        self.marks = []
+        self.reported = False
+
+    def mark(self, label):
+        self.marks.append((label, time.perf_counter()))
+
+    def report(self, stream=None):
+        """Print per-phase and cumulative milliseconds once, if enabled"""
+        if not self.enabled or self.reported:
+            return
+        self.reported = True
+        stream = stream or sys.stderr
+        print("=== 启动耗时 (--startup-profile) ===", file=stream)
+        print(f"{'phase':<28}{'ms':>10}{'total ms':>12}", file=stream)
+        previous = self.t0
+        for label, ts in self.marks:
+            phase = (ts - previous) * 1000
+            total = (ts - self.t0) * 1000
+            print(f"{label:<28}{phase:>10.1f}{total:>12.1f}", file=stream)
+            previous = ts
+        stream.flush()
@@ -0,0 +1,211 @@
+"""
+Terminal launcher for Claude Model Manager
+Opens a new terminal that sources env.sh without blocking the GUI thread
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from PyQt6.QtCore import QThread, pyqtSignal
+
+from tracing import tracer
+
+CACHE_FILE = Path.home() / ".claude-cli" / "terminal_cache.json"
+
+# 按优先级排列的 Linux 终端及其执行命令参数
+LINUX_TERMINALS = [
+    ("gnome-terminal", ["--"]),
+    ("konsole", ["-e"]),
+    ("xterm", ["-e"]),
+    ("xfce4-terminal", ["-e"]),
+    ("x-terminal-emulator", ["-e"]),
+]
+
+
+def _probe_terminals():
+    """Look up every known terminal on PATH in parallel, keeping priority order"""
+    names = [name for name, _ in LINUX_TERMINALS]
+    with ThreadPoolExecutor(max_workers=len(names)) as pool:
+        paths = list(pool.map(shutil.which, names))
+    return [[name, path] for name, path in zip(names, paths) if path]
+
+
+def detect_terminals(refresh=False):
+    """Return available terminals as [name, path] pairs, cached per PATH"""
+    search_path = os.environ.get("PATH", "")
+    if not refresh and CACHE_FILE.exists():
+        try:
+            with open(CACHE_FILE, "r") as f:
+                cache = json.load(f)
+            terminals = cache.get("terminals", [])
+            # PATH 变化或缓存的终端已被卸载时重新探测
+            if cache.get("path") == search_path and all(
+                os.path.exists(path) for _, path in terminals
+            ):
+                return terminals
+        except (OSError, ValueError):
+            pass
+
+    with tracer.span("terminal.probe"):
+        terminals = _probe_terminals()
+    try:
+        CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        with open(CACHE_FILE, "w") as f:
+            json.dump({"path": search_path, "terminals": terminals}, f, indent=2)
+    except OSError as e:
+        print(f"无法写入终端缓存 {CACHE_FILE}: {e}")
+    return terminals
+
+
+def _spawn_detached(cmd):
+    """Start a process without waiting for it to exit"""
+    kwargs = {
+        "stdin": subprocess.DEVNULL,
+        "stdout": subprocess.DEVNULL,
+        "stderr": subprocess.DEVNULL,
+    }
+    if sys.platform.startswith("win"):
+        kwargs["creationflags"] = subprocess.DETACHED_PROCESS
+    else:
+        kwargs["start_new_session"] = True
+    with tracer.span("terminal.spawn", program=os.path.basename(cmd[0])):
+        return subprocess.Popen(cmd, **kwargs)
+
+
+def _linux_auto_source(env_file):
+    """Linux：使用缓存的终端列表，第一个能启动的终端即返回"""
+    shell_cmd = [
+        "bash",
+        "-c",
+        f"source {env_file}; echo 'Environment refreshed'; read -p 'Press Enter to close...'",
+    ]
+    args_by_name = dict(LINUX_TERMINALS)
+    with tracer.span("terminal.detect"):
+        terminals = detect_terminals()
+    for _ in range(2):
+        for name, path in terminals:
+            try:
+                _spawn_detached([path] + args_by_name[name] + shell_cmd)
+                return
+            except OSError:
+                continue
+        # 缓存可能已过期，重新探测一次
+        terminals = detect_terminals(refresh=True)
+    raise RuntimeError("未找到可用的终端程序")
+
+
+def _windows_auto_source(env_file):
+    """Windows: 使用PowerShell打开新窗口并执行source"""
+    # 注意：Windows使用Git Bash或WSL时需要不同的处理方式
+    ps_script = f"""
+$env_file = "{env_file}"
+if (Test-Path "$env:USERPROFILE\\scoop\\apps\\git\\current\\bin\\bash.exe") {{
+    # Git Bash via Scoop
+    Start-Process "$env:USERPROFILE\\scoop\\apps\\git\\current\\bin\\bash.exe" -ArgumentList "-c", "source $env_file && echo 'Environment refreshed' && sleep 3"
+}} elseif (Test-Path "$env:ProgramFiles\\Git\\bin\\bash.exe") {{
+    # Git Bash
+    Start-Process "$env:ProgramFiles\\Git\\bin\\bash.exe" -ArgumentList "-c", "source $env_file && echo 'Environment refreshed' && sleep 3"
+}} elseif (Test-Path "$env:SystemRoot\\System32\\wsl.exe") {{
+    # WSL
+    Start-Process "$env:SystemRoot\\System32\\wsl.exe" -ArgumentList "bash", "-c", "source {env_file} && echo 'Environment refreshed' && sleep 3"
+}} else {{
+    # 普通cmd
+    Start-Process "cmd.exe" -ArgumentList "/k", "echo Please manually run: source {env_file}"
+}}
+"""
+    _spawn_detached(["powershell", "-Command", ps_script])
+
+
+def _macos_auto_source(env_file):
+    """macOS专用：智能检测iTerm或Terminal并执行source"""
+    try:
+        # 首先尝试iTerm
+        iterm_script = f"""
+tell application "iTerm"
+    create window with default profile
+    tell current window
+        tell current session
+            write text "source {env_file}"
+        end tell
+    end tell
+    activate
+end tell
+"""
+        with tracer.span("terminal.osascript", app="iTerm"):
+            subprocess.run(["osascript", "-e", iterm_script], check=True)
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        # iTerm失败，尝试Terminal
+        try:
+            terminal_script = f"""
+tell application "Terminal"
+    do script "source {env_file}"
+    activate
+end tell
+"""
+            with tracer.span("terminal.osascript", app="Terminal"):
+                subprocess.run(["osascript", "-e", terminal_script], check=True)
+        except (subprocess.CalledProcessError, FileNotFoundError) as e:
+            print(f"macOS终端自动source失败: {e}")
+            # 最后尝试使用open命令
+            _spawn_detached(["open", "-a", "Terminal", env_file])
+
+
+def launch_source_terminal(env_file):
+    """Open a terminal that sources env_file (blocking; run it off the GUI thread)"""
+    env_file = str(env_file)
+    if sys.platform == "darwin":
+        launch = _macos_auto_source
+    elif sys.platform.startswith("win"):
+        launch = _windows_auto_source
+    elif sys.platform.startswith("linux"):
+        launch = _linux_auto_source
+    else:
+        return
+    with tracer.span("terminal.launch"), tracer.span(launch.__name__):
+        launch(env_file)
+
+
+class TerminalLaunchThread(QThread):
+    """Thread for launching the terminal without blocking UI"""
+
+    failed = pyqtSignal(str)
+
+    def __init__(self, env_file, parent=None):
+        super().__init__(parent)
+        self.env_file = env_file
+
+    def run(self):
+        try:
+            launch_source_terminal(self.env_file)
+        except Exception as e:
+            self.failed.emit(str(e))
+
+
+class TerminalLauncher:
+    """Keeps launch threads alive until they finish"""
+
+    def __init__(self):
+        self.threads = []
+
+    def warm_up(self):
+        """Probe terminals in the background so the first switch hits the cache"""
+        if sys.platform.startswith("linux"):
+            threading.Thread(target=detect_terminals, daemon=True).start()
+
+    def launch(self, env_file):
+        thread = TerminalLaunchThread(env_file)
+        # 静默失败，不显示错误对话框，因为这不是核心功能
+        thread.failed.connect(lambda msg: print(f"自动刷新终端失败: {msg}"))
+        self._track(thread)
+        thread.start()
+        return thread
+
+    def _track(self, thread):
+        self.threads.append(thread)
+        thread.finished.connect(lambda: self.threads.remove(thread))
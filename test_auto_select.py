@@ -0,0 +1,66 @@
+"""测试自动选择：按半衰期衰减的评分与切换滞回"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from auto_select import ERROR_PENALTY_MS, AutoScorer, set_auto_enabled
+
+HALF_LIFE = 60
+
+
+def scored(samples):
+    """Scorer fed (name, latency_ms, now) samples"""
+    scorer = AutoScorer(half_life=HALF_LIFE)
+    for name, latency_ms, now in samples:
+        scorer.update(name, latency_ms, now)
+    return scorer
+
+
+def test_new_sample_weighs_half_after_one_half_life():
+    scorer = scored([("a", 100, 0), ("a", 300, HALF_LIFE)])
+    assert scorer.score("a") == pytest.approx(200)
+    # 两个半衰期后新样本占 3/4
+    scorer = scored([("a", 100, 0), ("a", 300, 2 * HALF_LIFE)])
+    assert scorer.score("a") == pytest.approx(250)
+    # 同一时刻的重复样本不改变评分
+    scorer = scored([("a", 100, 0), ("a", 300, 0)])
+    assert scorer.score("a") == pytest.approx(100)
+
+
+def test_failures_raise_the_error_rate_and_decay_away():
+    scorer = scored([("a", 100, 0), ("a", None, HALF_LIFE)])
+    assert scorer.scores["a"].latency_ms == 100
+    assert scorer.score("a") == pytest.approx(100 + 0.5 * ERROR_PENALTY_MS)
+    scorer.update("a", 100, 2 * HALF_LIFE)
+    assert scorer.score("a") == pytest.approx(100 + 0.25 * ERROR_PENALTY_MS)
+
+
+def test_switch_waits_until_the_gap_exceeds_the_hysteresis():
+    members = ["a", "b"]
+    scorer = scored([("a", 100, 0), ("a", 100, 1), ("b", 85, 0), ("b", 85, 1)])
+    # 只快 15%，不足 20% 的滞回
+    assert scorer.choose(members, "a", hysteresis=0.2) is None
+    assert scorer.choose(members, "a", hysteresis=0.1) == "b"
+    scorer.update("b", 40, 1 + HALF_LIFE)
+    assert scorer.score("b") == pytest.approx(62.5)
+    assert scorer.choose(members, "a", hysteresis=0.2) == "b"
+    assert scorer.choose(members, "b", hysteresis=0.2) is None
+
+
+def test_members_need_enough_samples_to_compete():
+    scorer = scored([("a", 100, 0), ("a", 100, 1), ("b", 10, 0)])
+    assert scorer.choose(["a", "b"], "a", hysteresis=0.2) is None
+    # 当前模型不在组内时直接选最好的成员
+    assert scorer.choose(["a", "b"], "other", hysteresis=0.2) == "a"
+
+
+def test_set_auto_enabled_reports_changes():
+    config = {}
+    assert set_auto_enabled(config, False) is False and config == {}
+    assert set_auto_enabled(config, True) is True
+    assert set_auto_enabled(config, True) is False
+    assert set_auto_enabled(config, False) is True and config["auto"]["enabled"] is False
@@ -0,0 +1,164 @@
+"""测试请求合并：中途加入、慢读者互不拖累、领头断开后继续读取与缓冲裁剪"""
+
+import asyncio
+import json
+import os
+import socket
+import sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import coalescing
+from coalescing import Flight
+from http_client import header_dict, iter_body, read_head
+from test_gateway import TOKEN, StubUpstream, config_for, post, start_gateway
+
+BODY = json.dumps({"model": "m", "stream": True, "messages": []}).encode()
+
+
+async def coalescing_gateway(stub):
+    await stub.start()
+    return await start_gateway(config_for(stub.url, coalesce_requests=True))
+
+
+async def open_raw(gateway, receive_buffer=None):
+    """Send the shared request on a bare socket, optionally with a tiny receive buffer"""
+    sock = socket.socket()
+    if receive_buffer:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, receive_buffer)
+    sock.setblocking(False)
+    await asyncio.get_running_loop().sock_connect(sock, ("127.0.0.1", gateway.port))
+    reader, writer = await asyncio.open_connection(sock=sock)
+    writer.write(
+        b"POST /v1/messages HTTP/1.1\r\nHost: gateway\r\n"
+        b"Authorization: Bearer %s\r\ncontent-type: application/json\r\n"
+        b"content-length: %d\r\n\r\n%s" % (TOKEN.encode(), len(BODY), BODY)
+    )
+    await writer.drain()
+    return reader, writer
+
+
+async def read_body(reader):
+    _, raw_headers = await read_head(reader)
+    return b"".join([
+        chunk async for chunk in iter_body(reader, header_dict(raw_headers), read_to_eof=False)
+    ])
+
+
+def test_follower_joining_mid_stream_gets_the_whole_body():
+    async def run():
+        stub = StubUpstream(events=6, gap=0.05)
+        gateway = await coalescing_gateway(stub)
+        try:
+            leader = asyncio.ensure_future(post(gateway))
+            await asyncio.sleep(0.15)
+            follower = await post(gateway)
+            return await leader, follower, gateway.stats.coalesced, stub.tokens
+        finally:
+            await gateway.close()
+            await stub.close()
+
+    leader, follower, coalesced, tokens = asyncio.run(run())
+    assert leader[0] == follower[0] == 200
+    assert leader[1] == follower[1]
+    assert follower[1].count(b"content_block_delta") == 12
+    assert coalesced == 1 and tokens == ["a"]
+
+
+def test_slow_reader_does_not_hold_back_a_fast_one():
+    async def run():
+        # 约 4 MiB，远超套接字缓冲，但仍低于 MAX_JOIN_BYTES
+        stub = StubUpstream(events=64, gap=0.002, event_bytes=64 * 1024)
+        gateway = await coalescing_gateway(stub)
+        slow_reader, slow_writer = await open_raw(gateway, receive_buffer=4096)
+        try:
+            await asyncio.sleep(0.05)
+            # 领头请求一直不读，跟随者仍能读完整个响应
+            fast = await asyncio.wait_for(post(gateway), 5)
+            # 此时领头请求还卡在写给慢读者的背压上
+            slow_pending = gateway.stats.in_flight
+            slow = await asyncio.wait_for(read_body(slow_reader), 5)
+            return fast, slow, gateway.stats.coalesced, slow_pending
+        finally:
+            slow_writer.close()
+            await gateway.close()
+            await stub.close()
+
+    (status, fast), slow, coalesced, slow_pending = asyncio.run(run())
+    assert status == 200 and coalesced == 1 and slow_pending == 1
+    assert fast.count(b"content_block_delta") == 128 and b"message_stop" in fast
+    assert slow == fast
+
+
+def test_upstream_is_read_to_the_end_after_the_leader_disconnects():
+    async def run():
+        stub = StubUpstream(events=5, gap=0.05)
+        gateway = await coalescing_gateway(stub)
+        try:
+            _, leader_writer = await open_raw(gateway)
+            follower = asyncio.ensure_future(post(gateway))
+            await asyncio.sleep(0.1)
+            leader_writer.transport.abort()
+            status, data = await follower
+            await asyncio.sleep(0.05)
+            return status, data, stub.tokens, gateway.flights
+        finally:
+            await gateway.close()
+            await stub.close()
+
+    status, data, tokens, flights = asyncio.run(run())
+    assert status == 200
+    assert data.count(b"content_block_delta") == 10 and b"message_stop" in data
+    assert tokens == ["a"] and flights == {}
+
+
+def fake_response():
+    return SimpleNamespace(status=200, reason="OK", raw_headers=[], has_body=True)
+
+
+def test_buffer_is_trimmed_once_nobody_can_join(monkeypatch):
+    monkeypatch.setattr(coalescing, "MAX_JOIN_BYTES", 25)
+
+    async def run():
+        flight = Flight("k")
+        flight.start(fake_response())
+        fast, slow = flight.attach(), flight.attach()
+        for _ in range(2):
+            flight.feed(b"x" * 10)
+        await flight.read(fast)
+        # 仍可加入时保留全部缓冲，新的跟随者要从头读
+        assert (flight.offset, len(flight.chunks)) == (0, 2)
+        flight.feed(b"x" * 10)
+        assert not flight.joinable()
+        await flight.read(fast)
+        # 只丢弃所有读者都已读过的块
+        assert (flight.offset, len(flight.chunks)) == (0, 3)
+        await flight.read(slow)
+        assert (flight.offset, flight.chunks) == (3, [])
+        flight.feed(b"y")
+        await flight.read(fast)
+        flight.detach(slow)
+        assert (flight.offset, flight.chunks) == (4, [])
+
+    asyncio.run(run())
+
+
+def test_request_arriving_after_the_join_limit_goes_upstream(monkeypatch):
+    monkeypatch.setattr(coalescing, "MAX_JOIN_BYTES", 1000)
+
+    async def run():
+        stub = StubUpstream(events=6, gap=0.05, event_bytes=600)
+        gateway = await coalescing_gateway(stub)
+        try:
+            first = asyncio.ensure_future(post(gateway))
+            await asyncio.sleep(0.15)
+            second = await post(gateway)
+            return await first, second, gateway.stats.coalesced, stub.tokens
+        finally:
+            await gateway.close()
+            await stub.close()
+
+    first, second, coalesced, tokens = asyncio.run(run())
+    assert first == second
+    assert coalesced == 0 and tokens == ["a", "a"]
@@ -0,0 +1,93 @@
+"""测试多模型对比：首 token 计时、usage 解析与缺少 usage 时的估算"""
+
+import asyncio
+import json
+import os
+import socket
+import sys
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from compare import CompareResult, _stub_upstream, apply_event, compare
+
+
+async def compare_stubs(delays, tokens=5, on_delta=None):
+    # delays: 每个桩上游的 (首 token 延迟, token 间隔)
+    servers = [await _stub_upstream(first, gap, tokens) for first, gap in delays]
+    models = {
+        f"stub-{i}": {
+            "ANTHROPIC_AUTH_TOKEN": "stub",
+            "ANTHROPIC_BASE_URL": f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}",
+        }
+        for i, server in enumerate(servers)
+    }
+    try:
+        return await compare(models, "hi", max_tokens=16, on_delta=on_delta)
+    finally:
+        for server in servers:
+            server.close()
+            await server.wait_closed()
+
+
+def test_results_follow_input_order_and_ttft_reflects_the_upstream():
+    deltas = []
+    # 第一个上游首 token 更慢，但结果仍按输入顺序返回
+    results = asyncio.run(compare_stubs(
+        [(0.15, 0.001), (0.01, 0.001)], on_delta=lambda name, text: deltas.append(name)
+    ))
+    slow, fast = results
+    assert [r.profile for r in results] == ["stub-0", "stub-1"]
+    assert fast.ttft_ms < slow.ttft_ms
+    assert slow.ttft_ms >= 140
+    assert all(r.ttft_ms <= r.total_ms for r in results)
+    # 快的上游先产出文本
+    assert deltas[0] == "stub-1"
+    assert deltas.count("stub-0") == deltas.count("stub-1") == 5
+
+
+def test_usage_from_the_stream_is_exact():
+    (result,) = asyncio.run(compare_stubs([(0, 0.005)], tokens=8))
+    assert result.error is None and result.http_status == 200
+    assert result.text == "".join(f"word{i} " for i in range(8))
+    assert (result.input_tokens, result.output_tokens) == (12, 8)
+    assert result.tokens_estimated is False
+    assert result.stop_reason == "end_turn"
+    assert result.tokens_per_second() is not None
+
+
+def test_output_tokens_are_estimated_without_usage():
+    result = CompareResult("p", "m")
+    for text in ("a", "b", "c"):
+        apply_event(result, "content_block_delta", json.dumps({
+            "type": "content_block_delta", "delta": {"type": "text_delta", "text": text},
+        }))
+    apply_event(result, "message_delta", json.dumps({
+        "type": "message_delta", "delta": {"stop_reason": "end_turn"}, "usage": {},
+    }))
+    assert (result.output_tokens, result.tokens_estimated) == (3, True)
+    assert dict(result.metrics())["输出 tokens"] == "≈3"
+    # 之后出现的 usage 取代估算值
+    apply_event(result, "message_delta", json.dumps({
+        "type": "message_delta", "delta": {}, "usage": {"output_tokens": 7},
+    }))
+    assert (result.output_tokens, result.tokens_estimated) == (7, False)
+
+
+def test_events_without_a_name_use_the_payload_type():
+    result = CompareResult("p", "m")
+    text = apply_event(result, "message", json.dumps({
+        "type": "content_block_delta", "delta": {"type": "text_delta", "text": "x"},
+    }))
+    assert text == "x" and result.text == "x"
+
+
+def test_unreachable_upstream_is_reported_per_profile():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    models = {
+        "down": {"ANTHROPIC_AUTH_TOKEN": "t", "ANTHROPIC_BASE_URL": f"http://127.0.0.1:{port}"},
+    }
+    (result,) = asyncio.run(compare(models, "hi"))
+    assert result.error and result.http_status is None
+    assert dict(result.metrics())["首 token"] == "-"
@@ -0,0 +1,116 @@
+"""测试凭证校验：按 token 与主机去重、缓存命中与有效期"""
+
+import asyncio
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from credentials import (
+    INVALID, TTL_SECONDS, UNKNOWN, VALID, CredentialCache, credential_key, validate_profiles,
+)
+from http_client import HttpError, header_dict, iter_body, read_head
+
+
+class StubApi:
+    """Answers every request with respond(method, target, headers) -> (status, headers, body)
+
+    Records (method, target, headers) of each request it reads.
+    """
+
+    def __init__(self, respond):
+        self.respond = respond
+        self.requests = []
+        self.server = None
+        self.url = None
+
+    async def __aenter__(self):
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        self.url = f"http://127.0.0.1:{self.server.sockets[0].getsockname()[1]}"
+        return self
+
+    async def __aexit__(self, *exc):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                start, raw_headers = await read_head(reader)
+                headers = header_dict(raw_headers)
+                async for _ in iter_body(reader, headers, read_to_eof=False):
+                    pass
+                method, target, _ = start.split(" ", 2)
+                self.requests.append((method, target, headers))
+                status, extra, body = self.respond(method, target, headers)
+                head = [f"HTTP/1.1 {status} X", f"Content-Length: {len(body)}"]
+                head.extend(f"{name}: {value}" for name, value in extra)
+                writer.write(("\r\n".join(head) + "\r\n\r\n").encode() + body)
+                await writer.drain()
+        except (HttpError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+def by_token(method, target, headers):
+    token = headers["authorization"][7:]
+    status = {"good": 200, "bad": 401, "flaky": 500}[token]
+    body = b"{}" if status == 200 else json.dumps({"error": {"message": token}}).encode()
+    return status, [], body
+
+
+def profile(url, token):
+    return {"ANTHROPIC_AUTH_TOKEN": token, "ANTHROPIC_BASE_URL": url}
+
+
+def test_profiles_sharing_a_credential_are_checked_once(tmp_path):
+    async def run():
+        async with StubApi(by_token) as api:
+            models = {
+                "a": profile(api.url, "good"),
+                "b": profile(api.url + "/", "good"),
+                "c": profile(api.url, "bad"),
+                "d": profile(api.url, "flaky"),
+                "no-token": {"ANTHROPIC_BASE_URL": api.url},
+            }
+            results = await validate_profiles(models, CredentialCache(tmp_path / "c.json"))
+            return results, api.requests
+
+    results, requests = asyncio.run(run())
+    assert [(r.profile, r.status) for r in results] == [
+        ("a", VALID), ("b", VALID), ("c", INVALID), ("d", UNKNOWN),
+    ]
+    assert results[2].http_status == 401 and "bad" in results[2].summary()
+    # a 与 b 的 token 和主机相同，只校验一次
+    assert len(requests) == 3
+    assert all(method == "POST" and target == "/v1/messages" for method, target, _ in requests)
+
+
+def test_cached_results_skip_the_network_until_they_expire(tmp_path):
+    path = tmp_path / "credential_cache.json"
+
+    async def run():
+        async with StubApi(by_token) as api:
+            models = {"a": profile(api.url, "good"), "d": profile(api.url, "flaky")}
+            cache = CredentialCache(path)
+            await validate_profiles(models, cache)
+            cache.save()
+            # 重新加载的缓存里只有可缓存的结果；无法判断的结果每次重新校验
+            second = await validate_profiles(models, CredentialCache(path))
+            checked = len(api.requests)
+            forced = await validate_profiles(models, CredentialCache(path), refresh=True)
+            return second, checked, forced, len(api.requests), api.url
+
+    second, checked, forced, total, url = asyncio.run(run())
+    assert [(r.status, r.cached) for r in second] == [(VALID, True), (UNKNOWN, False)]
+    assert checked == 3
+    assert [r.cached for r in forced] == [False, False] and total == 5
+    saved = path.read_text()
+    assert "good" not in saved
+    key = credential_key("good", url)
+    cache = CredentialCache(path)
+    checked_at = cache.entries[key]["checked_at"]
+    assert cache.get(key, now=checked_at + TTL_SECONDS[VALID] - 1) is not None
+    assert cache.get(key, now=checked_at + TTL_SECONDS[VALID] + 1) is None
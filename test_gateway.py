@@ -0,0 +1,183 @@
+"""测试本地网关的转发、故障转移与限流排队"""
+
+import asyncio
+import json
+import os
+import socket
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from gateway import Gateway, Route, gateway_settings, member_key
+from http_client import AsyncHttpClient, HttpError, header_dict, iter_body, read_head
+
+TOKEN = "local"
+
+
+class StubUpstream:
+    """Messages API stub that streams `events` SSE events, `gap` seconds apart
+
+    Records the credential of every request it reads. With drop it hangs up
+    after reading the request instead of answering.
+    """
+
+    def __init__(self, events=3, gap=0.0, event_bytes=0, status=200, drop=False):
+        self.events = events
+        self.gap = gap
+        self.padding = "x" * event_bytes
+        self.status = status
+        self.drop = drop
+        self.tokens = []
+        self.server = None
+        self.url = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        self.url = f"http://127.0.0.1:{self.server.sockets[0].getsockname()[1]}"
+
+    async def close(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    def body(self):
+        for i in range(self.events):
+            data = json.dumps({"type": "content_block_delta", "index": i, "pad": self.padding})
+            yield f"event: content_block_delta\ndata: {data}\n\n".encode()
+        yield b'event: message_stop\ndata: {"type": "message_stop"}\n\n'
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                _, raw_headers = await read_head(reader)
+                headers = header_dict(raw_headers)
+                async for _ in iter_body(reader, headers, read_to_eof=False):
+                    pass
+                self.tokens.append(headers.get("authorization", "")[7:])
+                if self.drop:
+                    break
+                writer.write(
+                    b"HTTP/1.1 %d OK\r\ncontent-type: text/event-stream\r\n"
+                    b"transfer-encoding: chunked\r\n\r\n" % self.status
+                )
+                for event in self.body():
+                    if self.gap:
+                        await asyncio.sleep(self.gap)
+                    writer.write(b"%x\r\n%s\r\n" % (len(event), event))
+                    await writer.drain()
+                writer.write(b"0\r\n\r\n")
+                await writer.drain()
+        except (HttpError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+def config_for(url, pool=(), **settings):
+    return {
+        "active": "p",
+        "models": {"p": {"ANTHROPIC_AUTH_TOKEN": "a", "ANTHROPIC_BASE_URL": url}},
+        "gateway": dict({"pools": {"p": list(pool)}, "usage_metering": False}, **settings),
+    }
+
+
+async def start_gateway(config):
+    gateway = Gateway(TOKEN, port=0)
+    gateway.apply_settings(gateway_settings(config))
+    gateway.set_route(Route.from_config(config))
+    await gateway.start()
+    return gateway
+
+
+async def post(gateway, payload=None, client=None):
+    body = json.dumps(payload or {"model": "m", "stream": True, "messages": []}).encode()
+    own_client = client is None
+    client = client or AsyncHttpClient()
+    try:
+        response, data = await client.request(
+            "POST", f"http://127.0.0.1:{gateway.port}/v1/messages",
+            {"Authorization": f"Bearer {TOKEN}"}, body, timeout=10,
+        )
+    finally:
+        if own_client:
+            await client.close()
+    return response.status, data
+
+
+def test_rate_limited_member_queues_when_the_rest_are_open():
+    async def run():
+        stub = StubUpstream()
+        await stub.start()
+        config = config_for(stub.url, [{"ANTHROPIC_AUTH_TOKEN": "b"}])
+        gateway = await start_gateway(config)
+        model = config["models"]["p"]
+        key_a = "p"  # 模型配置自身的凭证以配置名为 key
+        key_b = member_key("p", dict(model, ANTHROPIC_AUTH_TOKEN="b"))
+        # A 被 retry-after 挡住 0.3 秒，B 的熔断器打开
+        gateway.limiter.observe(key_a, {"retry-after": "0.3"}, 429)
+        breaker = gateway.member_state(key_b).breaker
+        while breaker.available():
+            breaker.record_failure("down")
+        started = time.monotonic()
+        try:
+            status, data = await post(gateway)
+        finally:
+            await gateway.close()
+            await stub.close()
+        return status, data, time.monotonic() - started, stub.tokens
+
+    status, data, elapsed, tokens = asyncio.run(run())
+    # 不应立即返回 502，而是在 A 上排队直到解除限制
+    assert status == 200, data
+    assert b"message_stop" in data
+    assert elapsed >= 0.25
+    assert tokens == ["a"]
+
+
+def free_url():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return f"http://127.0.0.1:{sock.getsockname()[1]}"
+
+
+async def post_with_backup(first_url, first=None):
+    """POST to profile p at first_url with profile q as its failover; returns who answered"""
+    backup = StubUpstream()
+    await backup.start()
+    if first is not None:
+        await first.start()
+        first_url = first.url
+    config = config_for(first_url, failover_groups=[["p", "q"]])
+    config["models"]["q"] = {"ANTHROPIC_AUTH_TOKEN": "q", "ANTHROPIC_BASE_URL": backup.url}
+    gateway = await start_gateway(config)
+    try:
+        status, data = await post(gateway)
+    finally:
+        await gateway.close()
+        await backup.close()
+        if first is not None:
+            await first.close()
+    return status, data, backup.tokens
+
+
+def test_post_fails_over_when_it_was_never_sent():
+    status, data, backup_tokens = asyncio.run(post_with_backup(free_url()))
+    assert status == 200 and b"message_stop" in data
+    assert backup_tokens == ["q"]
+
+
+def test_post_is_not_resent_once_the_upstream_has_read_it():
+    dropping = StubUpstream(drop=True)
+    status, data, backup_tokens = asyncio.run(post_with_backup(None, dropping))
+    # 上游已读到请求后断开，可能已经在处理，不能再发给备用上游
+    assert status == 502 and "未改发".encode() in data
+    assert dropping.tokens == ["a"] and backup_tokens == []
+
+
+def test_post_is_not_resent_after_a_5xx_but_is_after_529():
+    failing = StubUpstream(status=500)
+    status, _, backup_tokens = asyncio.run(post_with_backup(None, failing))
+    assert status == 500 and backup_tokens == []
+    overloaded = StubUpstream(status=529)
+    status, _, backup_tokens = asyncio.run(post_with_backup(None, overloaded))
+    assert status == 200 and backup_tokens == ["q"]
@@ -0,0 +1,77 @@
+"""测试并发健康探测：计时、按 URL 去重与连接复用"""
+
+import asyncio
+import os
+import socket
+import sys
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from health_probe import ProbeResult, _stub_server, classify, probe_profiles
+from http_client import AsyncHttpClient
+
+
+async def with_stub(delay, probe):
+    server = await _stub_server(delay)
+    try:
+        return await probe(f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}")
+    finally:
+        server.close()
+        await server.wait_closed()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_probe_records_phase_timings():
+    results = asyncio.run(with_stub(0.05, lambda url: probe_profiles({"a": url + "/a"})))
+    (result,) = results
+    assert result.status == ProbeResult.UP and result.http_status == 200
+    timings = result.timings
+    assert timings["reused"] is False
+    assert timings["connect_ms"] is not None and timings["tls_ms"] is None
+    # 桩服务器延迟 50ms 才返回响应头
+    assert timings["ttfb_ms"] >= 45
+    assert timings["total_ms"] >= timings["ttfb_ms"]
+
+
+def test_profiles_sharing_a_url_are_probed_once():
+    results = asyncio.run(
+        with_stub(0, lambda url: probe_profiles({"a": url, "b": url, "c": url + "/c"}))
+    )
+    assert [r.profile for r in results] == ["a", "b", "c"]
+    # 同一 URL 只发一次请求，各模型共享同一份计时
+    assert results[0].timings is results[1].timings
+    assert results[2].timings is not results[0].timings
+
+
+def test_sequential_probes_reuse_the_connection():
+    async def probe(url):
+        profiles = {f"p{i}": f"{url}/p{i}" for i in range(4)}
+        client = AsyncHttpClient()
+        try:
+            results = await probe_profiles(profiles, max_concurrency=1, client=client)
+        finally:
+            await client.close()
+        return results
+
+    results = asyncio.run(with_stub(0, probe))
+    assert [r.timings["reused"] for r in results] == [False, True, True, True]
+    # 复用的连接不再经过 DNS/连接阶段
+    assert all(r.timings["connect_ms"] is None for r in results[1:])
+
+
+def test_refused_connection_is_down():
+    url = f"http://127.0.0.1:{free_port()}"
+    (result,) = asyncio.run(probe_profiles({"a": url}, timeout=2))
+    assert result.status == ProbeResult.DOWN
+    assert result.http_status is None and result.error
+    assert "不可用" in result.summary()
+
+
+def test_server_errors_are_degraded():
+    assert classify(503) == ProbeResult.DEGRADED
+    assert classify(401) == ProbeResult.UP
@@ -0,0 +1,112 @@
+"""测试 HTTP/2 传输：每连接的流数上限与 ALPN 选择 http/1.1 时的回退"""
+
+import asyncio
+import os
+import shutil
+import ssl
+import subprocess
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+pytest.importorskip("h2")
+
+from bench_http2 import REQUEST_BODY, StubUpstream
+from http2_client import Http2Client
+from http_client import AsyncHttpClient
+
+
+async def post(client, url):
+    response = await client.open("POST", url, {"content-type": "application/json"}, REQUEST_BODY)
+    return response.status, await response.read()
+
+
+def test_streams_per_connection_stay_under_the_cap():
+    async def run():
+        stub = StubUpstream(setup_ms=0, events=3, event_ms=20)
+        await stub.start()
+        url = f"http://127.0.0.1:{stub.port}/v1/messages"
+        peak = {"streams": 0, "connections": 0}
+        client = Http2Client(max_streams=4, cleartext=True, max_connections=2)
+
+        async def watch():
+            while True:
+                host = client.stats()["hosts"].get(f"127.0.0.1:{stub.port}")
+                if host:
+                    peak["streams"] = max(peak["streams"], host["streams"])
+                    peak["connections"] = max(peak["connections"], host["connections"])
+                await asyncio.sleep(0.002)
+
+        watcher = asyncio.ensure_future(watch())
+        try:
+            results = await asyncio.gather(*(post(client, url) for _ in range(20)))
+        finally:
+            watcher.cancel()
+            await client.close()
+            await stub.close()
+        return results, peak, stub.connections, client.stats()
+
+    results, peak, connections, stats = asyncio.run(run())
+    assert all(
+        status == 200 and body.count(b"content_block_delta") == 6 for status, body in results
+    )
+    # 20 个请求排队共用 2 个连接，每个连接同时最多 4 个流
+    assert connections == stats["connects"] == 2
+    assert peak["connections"] == 2
+    assert 4 < peak["streams"] <= 8
+
+
+@pytest.fixture(scope="module")
+def certificate(tmp_path_factory):
+    if shutil.which("openssl") is None:
+        pytest.skip("需要 openssl 生成自签名证书")
+    folder = tmp_path_factory.mktemp("tls")
+    cert, key = folder / "cert.pem", folder / "key.pem"
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+         "-subj", "/CN=127.0.0.1", "-addext", "subjectAltName=IP:127.0.0.1",
+         "-keyout", str(key), "-out", str(cert)],
+        check=True, capture_output=True,
+    )
+    return str(cert), str(key)
+
+
+async def tls_exchange(certificate, server_protocols, requests=3):
+    cert, key = certificate
+    server_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    server_context.load_cert_chain(cert, key)
+    server_context.set_alpn_protocols(server_protocols)
+    stub = StubUpstream(setup_ms=0, events=2, event_ms=1)
+    server = await asyncio.start_server(stub.handle, "127.0.0.1", 0, ssl=server_context)
+    port = server.sockets[0].getsockname()[1]
+    # 回退客户端用自己的 SSL 上下文，只声明 http/1.1
+    client = Http2Client(
+        ssl_context=ssl.create_default_context(cafile=cert),
+        fallback=AsyncHttpClient(ssl_context=ssl.create_default_context(cafile=cert)),
+    )
+    try:
+        results = [await post(client, f"https://127.0.0.1:{port}/v1/messages")
+                   for _ in range(requests)]
+    finally:
+        await client.close()
+        server.close()
+        await server.wait_closed()
+    return results, client.stats()["hosts"][f"127.0.0.1:{port}"], stub.connections
+
+
+def test_alpn_http11_falls_back_and_keeps_the_connection(certificate):
+    results, host, connections = asyncio.run(tls_exchange(certificate, ["http/1.1"]))
+    assert [status for status, _ in results] == [200, 200, 200]
+    assert all(body.count(b"content_block_delta") == 4 for _, body in results)
+    assert host["protocol"] == "http/1.1"
+    # 协商时建立的连接交给 HTTP/1.1 连接池，之后的请求复用它
+    assert connections == 1
+
+
+def test_alpn_h2_is_used_when_offered(certificate):
+    results, host, connections = asyncio.run(tls_exchange(certificate, ["h2", "http/1.1"]))
+    assert [status for status, _ in results] == [200, 200, 200]
+    assert host["protocol"] == "h2"
+    assert connections == 1
@@ -0,0 +1,91 @@
+"""测试 HTTP/1.1 客户端在复用连接失效时的重发规则"""
+
+import asyncio
+import os
+import socket
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from http_client import (
+    AsyncHttpClient, HttpError, RequestNotSent, header_dict, iter_body, read_head,
+)
+
+
+class DroppingUpstream:
+    """Answers the first request on each connection, then reads the next one and hangs up"""
+
+    def __init__(self):
+        self.requests = 0
+        self.server = None
+        self.url = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        self.url = f"http://127.0.0.1:{self.server.sockets[0].getsockname()[1]}/"
+
+    async def close(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def handle(self, reader, writer):
+        try:
+            for answered in (True, False):
+                _, raw_headers = await read_head(reader)
+                async for _ in iter_body(reader, header_dict(raw_headers), read_to_eof=False):
+                    pass
+                self.requests += 1
+                if answered:
+                    writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nok")
+                    await writer.drain()
+        except (HttpError, ConnectionError):
+            pass
+        finally:
+            # 第二个请求已完整读到（相当于已处理），却不返回任何响应字节
+            writer.close()
+
+
+async def twice(method):
+    upstream = DroppingUpstream()
+    await upstream.start()
+    client = AsyncHttpClient()
+    try:
+        first, _ = await client.request(method, upstream.url, body=b"{}")
+        try:
+            second, _ = await client.request(method, upstream.url, body=b"{}")
+            outcome = second.status
+        except HttpError as e:
+            outcome = e
+    finally:
+        await client.close()
+        await upstream.close()
+    return first.status, outcome, upstream.requests
+
+
+def test_idempotent_request_is_resent_on_a_new_connection():
+    first, second, requests = asyncio.run(twice("GET"))
+    assert (first, second) == (200, 200)
+    assert requests == 3
+
+
+def test_post_is_not_resent_after_it_was_written():
+    first, second, requests = asyncio.run(twice("POST"))
+    assert first == 200
+    assert isinstance(second, HttpError) and not isinstance(second, RequestNotSent)
+    # 对端已经读到第二个 POST，客户端不能再发一次
+    assert requests == 2
+
+
+def test_connection_refused_is_reported_as_not_sent():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    async def run():
+        async with AsyncHttpClient() as client:
+            await client.request("POST", f"http://127.0.0.1:{port}/", body=b"{}")
+
+    with pytest.raises(RequestNotSent):
+        asyncio.run(run())
@@ -0,0 +1,50 @@
+"""测试会话粘滞的一致性哈希环"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from gateway import member_key, profile_upstreams
+from load_balancer import HashRing, conversation_key
+
+MODEL = {"ANTHROPIC_AUTH_TOKEN": "k", "ANTHROPIC_BASE_URL": "http://127.0.0.1:1"}
+POOL = [{"ANTHROPIC_AUTH_TOKEN": token} for token in "abcd"]
+
+
+def conversations(count=2000):
+    return [
+        conversation_key({"model": "m", "messages": [{"role": "user", "content": f"q{i}"}]})
+        for i in range(count)
+    ]
+
+
+def test_removing_a_member_only_moves_its_own_conversations():
+    full = HashRing(profile_upstreams("p", MODEL, POOL))
+    # 删除中间一行：其后成员的 key 不变
+    rest = HashRing(profile_upstreams("p", MODEL, POOL[:1] + POOL[2:]))
+    removed = member_key("p", dict(MODEL, ANTHROPIC_AUTH_TOKEN="b"))
+    for key in conversations():
+        before, after = full.home(key).key, rest.home(key).key
+        assert before == after or before == removed
+
+
+def test_conversation_key_ignores_later_turns_and_cache_control():
+    first = {
+        "model": "m",
+        "system": [{"type": "text", "text": "s", "cache_control": {"type": "ephemeral"}}],
+        "messages": [{"role": "user", "content": [
+            {"type": "text", "text": "hi", "cache_control": {"type": "ephemeral"}},
+        ]}],
+    }
+    later = {
+        "model": "m",
+        "system": [{"type": "text", "text": "s"}],
+        "messages": [
+            {"role": "user", "content": [{"type": "text", "text": "hi"}]},
+            {"role": "assistant", "content": "hello"},
+            {"role": "user", "content": "next"},
+        ],
+    }
+    assert conversation_key(first) == conversation_key(later)
+    assert conversation_key({"messages": []}) is None
@@ -0,0 +1,92 @@
+"""测试模型目录：新鲜缓存、过期后 304 重新验证与刷新失败时沿用旧目录"""
+
+import asyncio
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from model_catalog import TTL_SECONDS, CatalogCache, discover, endpoint_key
+from test_credentials import StubApi, profile
+
+ETAG = '"v1"'
+
+
+class Listing:
+    """Models endpoint serving two pages under ETAG; status overrides every answer"""
+
+    def __init__(self):
+        self.status = None
+
+    def __call__(self, method, target, headers):
+        if self.status is not None:
+            return self.status, [], b""
+        if headers.get("if-none-match") == ETAG:
+            return 304, [], b""
+        if "after_id=m2" in target:
+            page = {"data": [{"id": "m3"}], "has_more": False}
+        else:
+            page = {"data": [{"id": "m1"}, {"id": "m2"}], "has_more": True, "last_id": "m2"}
+        return 200, [("ETag", ETAG)], json.dumps(page).encode()
+
+
+def age(cache, url, seconds):
+    cache.entries[endpoint_key(url)]["fetched_at"] -= seconds
+
+
+def test_fresh_catalog_is_served_from_the_cache(tmp_path):
+    async def run():
+        async with StubApi(Listing()) as api:
+            models = {"a": profile(api.url, "t"), "b": profile(api.url + "/", "u")}
+            cache = CatalogCache(tmp_path / "catalog.json")
+            first = await discover(models, cache)
+            fetched = len(api.requests)
+            second = await discover(models, cache)
+            return first, fetched, second, len(api.requests)
+
+    first, fetched, second, total = asyncio.run(run())
+    assert [r.models for r in first] == [["m1", "m2", "m3"]] * 2
+    assert not any(r.cached for r in first)
+    # 两个模型指向同一端点，只取一次（两页）
+    assert fetched == 2
+    assert all(r.cached and r.models == ["m1", "m2", "m3"] for r in second)
+    assert total == fetched
+
+
+def test_stale_catalog_is_revalidated_with_its_etag(tmp_path):
+    async def run():
+        async with StubApi(Listing()) as api:
+            models = {"a": profile(api.url, "t")}
+            cache = CatalogCache(tmp_path / "catalog.json")
+            await discover(models, cache)
+            age(cache, api.url, TTL_SECONDS + 1)
+            (result,) = await discover(models, cache)
+            return result, api.requests[-1], cache.fresh(cache.get(endpoint_key(api.url)))
+
+    result, request, fresh = asyncio.run(run())
+    assert request[2]["if-none-match"] == ETAG
+    assert result.revalidated and not result.cached and result.error is None
+    assert result.models == ["m1", "m2", "m3"]
+    # 304 后缓存重新计时
+    assert fresh
+
+
+def test_failed_refresh_falls_back_to_the_old_catalog(tmp_path):
+    async def run():
+        listing = Listing()
+        async with StubApi(listing) as api:
+            models = {"a": profile(api.url, "t")}
+            cache = CatalogCache(tmp_path / "catalog.json")
+            await discover(models, cache)
+            listing.status = 500
+            (refreshed,) = await discover(models, cache, refresh=True)
+            (missing,) = await discover({"b": profile(api.url + "/other", "t")}, cache)
+            return refreshed, missing
+
+    refreshed, missing = asyncio.run(run())
+    assert refreshed.error == "HTTP 500" and refreshed.cached
+    assert refreshed.models == ["m1", "m2", "m3"]
+    assert "刷新失败" in refreshed.summary()
+    # 没有旧目录可用时如实报告失败
+    assert missing.models == [] and missing.summary() == "获取失败: HTTP 500"
@@ -0,0 +1,28 @@
+"""测试后台配置写入：写入失败后 env.sh 的更新不会丢失"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from persistence import ConfigWriter
+
+
+def test_env_update_survives_a_failed_write():
+    failures = [OSError("磁盘已满")]
+    env_writes = []
+
+    def save(config):
+        if failures:
+            raise failures.pop()
+
+    writer = ConfigWriter(save, lambda active, data: env_writes.append(active), 0.01)
+    config = {"active": "a", "models": {"a": {}}}
+    try:
+        writer.submit(config, env_changed=True)
+        assert writer.flush() is False and env_writes == []
+        # 之后只改了配置的提交也要补写 env.sh
+        writer.submit(config, env_changed=False)
+        assert writer.flush() is True and env_writes == ["a"]
+    finally:
+        writer.stop()
@@ -0,0 +1,83 @@
+"""测试远程同步：并发上限、已是最新的主机跳过、逐主机报告失败"""
+
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from propagation import (
+    GENERATION_FILE, REMOTE_DIR, HostResult, LocalCommandTransport, Propagator,
+    compute_generation, propagator_from_config,
+)
+
+FILES = {"env.sh": "export ANTHROPIC_AUTH_TOKEN=t\n"}
+
+
+class CountingTransport(LocalCommandTransport):
+    """Records how many hosts are being handled at the same time"""
+
+    def __init__(self, root, delay=0.05):
+        super().__init__(root)
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.active = 0
+        self.peak = 0
+
+    def read_generation(self, host):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            time.sleep(self.delay)
+            return super().read_generation(host)
+        finally:
+            with self.lock:
+                self.active -= 1
+
+
+def test_parallelism_is_bounded(tmp_path):
+    transport = CountingTransport(tmp_path)
+    hosts = [f"host{i}" for i in range(8)]
+    results = Propagator(transport, max_parallel=3).propagate(hosts, FILES)
+    assert [r.host for r in results] == hosts
+    assert all(r.status == HostResult.PUSHED for r in results)
+    assert 1 < transport.peak <= 3
+    for host in hosts:
+        remote = tmp_path / host / REMOTE_DIR
+        assert (remote / "env.sh").read_text() == FILES["env.sh"]
+        assert (remote / GENERATION_FILE).read_text().strip() == compute_generation(FILES)
+
+
+def test_hosts_already_on_the_generation_are_skipped(tmp_path):
+    propagator = Propagator(LocalCommandTransport(tmp_path))
+    hosts = ["a", "b", "c"]
+    propagator.propagate(hosts, FILES)
+    # 模拟 b 上次推送中途失败：generation 与内容不一致
+    (tmp_path / "b" / REMOTE_DIR / GENERATION_FILE).write_text("stale\n")
+    results = propagator.propagate(hosts, FILES)
+    assert [r.status for r in results] == [
+        HostResult.SKIPPED, HostResult.PUSHED, HostResult.SKIPPED,
+    ]
+    # 内容变化后所有主机都要重新推送
+    results = propagator.propagate(hosts, {"env.sh": "export ANTHROPIC_AUTH_TOKEN=u\n"})
+    assert {r.status for r in results} == {HostResult.PUSHED}
+
+
+def test_a_failing_host_is_reported_without_stopping_the_others(tmp_path):
+    # 同名的普通文件让 mkdir -p 失败
+    (tmp_path / "broken").write_text("")
+    results = Propagator(LocalCommandTransport(tmp_path)).propagate(["ok", "broken"], FILES)
+    ok, broken = results
+    assert ok.status == HostResult.PUSHED
+    assert broken.status == HostResult.FAILED and broken.error
+    assert broken.summary().startswith("broken: failed")
+
+
+def test_unknown_transport_is_rejected():
+    with pytest.raises(ValueError, match="rsync"):
+        propagator_from_config({"transport": "rsync"})
+    assert propagator_from_config({}).transport.timeout == 20
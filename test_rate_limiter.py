@@ -0,0 +1,128 @@
+"""测试上游限流：从响应头学习限额、retry-after/reset 阻塞、先来先到排队与超时拒绝"""
+
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import rate_limiter
+from rate_limiter import RateLimited, RateLimiter, parse_reset
+
+KEY = "p"
+REAL_SLEEP = asyncio.sleep
+
+
+class FakeClock:
+    """Monotonic clock that only moves when the limiter sleeps"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        # 先让出一次，同时到达的请求都以同一时刻开始计时
+        await REAL_SLEEP(0)
+        self.now += seconds
+
+
+def limited(headers, status=200, max_wait=rate_limiter.MAX_WAIT_SECONDS):
+    clock = FakeClock()
+    limiter = RateLimiter(max_wait=max_wait, clock=clock)
+    limiter.observe(KEY, headers, status)
+    return limiter, clock
+
+
+def test_unknown_upstreams_are_not_limited():
+    limiter, _ = limited({"content-type": "application/json"})
+    assert limiter.limits == {}
+    assert limiter.delay(KEY, 10_000) == 0.0
+    assert asyncio.run(limiter.acquire(KEY, 10_000)) == 0.0
+
+
+def test_buckets_follow_the_ratelimit_headers():
+    limiter, clock = limited({
+        "anthropic-ratelimit-requests-limit": "60",
+        "anthropic-ratelimit-requests-remaining": "0",
+        # 有输入 token 限额时优先使用，忽略总 token 限额
+        "anthropic-ratelimit-input-tokens-limit": "6000",
+        "anthropic-ratelimit-input-tokens-remaining": "600",
+        "anthropic-ratelimit-tokens-limit": "100",
+        "anthropic-ratelimit-tokens-remaining": "0",
+    })
+    # 请求桶每秒回填 1 个，token 桶每秒回填 100 个
+    assert limiter.delay(KEY, 0) == pytest.approx(1.0)
+    assert limiter.delay(KEY, 1200) == pytest.approx(6.0)
+    clock.now += 6
+    assert limiter.delay(KEY, 1200) == 0.0
+    stats = limiter.stats()["upstreams"][KEY]
+    assert stats["requests"] == {"limit": 60, "available": 6}
+    assert stats["tokens"] == {"limit": 6000, "available": 1200}
+    # 服务端的数字优先于本地估算，限额变化时随之调整
+    limiter.observe(KEY, {
+        "anthropic-ratelimit-requests-limit": "120",
+        "anthropic-ratelimit-requests-remaining": "120",
+    }, 200)
+    assert limiter.stats()["upstreams"][KEY]["requests"] == {"limit": 120, "available": 120}
+
+
+def test_retry_after_blocks_the_upstream_until_it_passes():
+    limiter, clock = limited({"retry-after": "5"}, status=429)
+    assert limiter.delay(KEY, 0) == pytest.approx(5.0)
+    clock.now += 5
+    assert limiter.delay(KEY, 0) == 0.0
+    # 不是 429 时忽略 retry-after
+    limiter, _ = limited({"retry-after": "5"})
+    assert limiter.delay(KEY, 0) == 0.0
+
+
+def test_exhausted_limit_blocks_until_its_reset_time():
+    reset = datetime.now(timezone.utc) + timedelta(seconds=30)
+    limiter, _ = limited({
+        "anthropic-ratelimit-tokens-limit": "1000",
+        "anthropic-ratelimit-tokens-remaining": "0",
+        "anthropic-ratelimit-tokens-reset": reset.isoformat().replace("+00:00", "Z"),
+    })
+    # 即使不需要 token 的请求也要等到 reset
+    assert 28 < limiter.delay(KEY, 0) <= 30
+    assert parse_reset("2024-01-01T00:01:00Z", now_wall=1704067200) == 60
+    assert parse_reset("not a date") is None
+
+
+def test_queued_requests_are_released_in_arrival_order(monkeypatch):
+    limiter, clock = limited({
+        "anthropic-ratelimit-requests-limit": "60",
+        "anthropic-ratelimit-requests-remaining": "0",
+    })
+    monkeypatch.setattr(rate_limiter.asyncio, "sleep", clock.sleep)
+    released = []
+
+    async def request(i):
+        waited = await limiter.acquire(KEY, 0)
+        released.append((i, waited))
+
+    async def run():
+        # 三个请求同时到达，按创建顺序进入队列
+        tasks = [asyncio.ensure_future(request(i)) for i in range(3)]
+        await REAL_SLEEP(0)
+        # 已有请求排队时，新请求不能插队
+        assert limiter.waiting == 3 and limiter.delay(KEY, 0) > 0
+        await asyncio.gather(*tasks)
+
+    asyncio.run(run())
+    assert released == [(0, 1.0), (1, 2.0), (2, 3.0)]
+    stats = limiter.stats()
+    assert (stats["queued"], stats["queue_depth"], stats["wait_max_seconds"]) == (3, 0, 3.0)
+
+
+def test_waits_beyond_max_wait_are_rejected():
+    limiter, _ = limited({"retry-after": "30"}, status=429, max_wait=10)
+    with pytest.raises(RateLimited) as raised:
+        asyncio.run(limiter.acquire(KEY, 0))
+    assert raised.value.retry_after == pytest.approx(30)
+    assert (limiter.rejected, limiter.queued) == (1, 0)
@@ -0,0 +1,132 @@
+"""测试响应缓存：规范化缓存键、只存完整响应、LRU 淘汰与 SSE 原样回放"""
+
+import asyncio
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from gateway import GatewayRequest
+from http_client import AsyncHttpClient
+from response_cache import CACHE_HEADER, CachedResponse, CacheRecorder, ResponseCache, cache_key
+from test_gateway import TOKEN, StubUpstream, config_for, start_gateway
+
+SSE_HEADERS = [("content-type", "text/event-stream")]
+
+
+def request(body, **headers):
+    raw_headers = [("content-type", "application/json")] + list(headers.items())
+    return GatewayRequest("POST", "/v1/messages", "HTTP/1.1", raw_headers, body)
+
+
+def test_key_ignores_field_order_whitespace_and_credentials():
+    a = request(
+        b'{"model": "m", "temperature": 0, "messages": [{"role": "user", "content": "hi"}]}',
+        authorization="Bearer one",
+    )
+    b = request(b'{"messages":[{"content":"hi","role":"user"}],"temperature":0,"model":"m"}',
+                authorization="Bearer two")
+    assert cache_key("p", a) == cache_key("p", b)
+    # 模型配置与影响响应内容的请求头仍要区分
+    assert cache_key("q", a) != cache_key("p", a)
+    beta = request(a.body, **{"anthropic-beta": "tools-2024"})
+    assert cache_key("p", beta) != cache_key("p", a)
+
+
+def recorded(status=200, body=b"", headers=SSE_HEADERS, complete=True, limit=1024):
+    recorder = CacheRecorder("k", limit=limit)
+    recorder.start(SimpleNamespace(status=status, reason="OK", raw_headers=headers))
+    for i in range(0, len(body), 7):
+        recorder.feed(body[i:i + 7])
+    recorder.complete = complete
+    return recorder.result()
+
+
+STREAM = (
+    b'event: message_start\ndata: {"type": "message_start"}\n\n'
+    b'event: content_block_delta\r\ndata: {"type": "content_block_delta"}\r\n\r\n'
+    b'event: message_stop\ndata: {"type": "message_stop"}\n\n'
+)
+
+
+def test_only_complete_successful_responses_are_stored():
+    cached = recorded(body=STREAM)
+    assert cached is not None and cached.body == STREAM
+    json_body = b'{"type": "message"}'
+    json_headers = [("content-type", "application/json")]
+    assert recorded(body=json_body, headers=json_headers).body == json_body
+    # 中途断开、非 200、没有 message_stop、流中出错或超过单条上限都不缓存
+    assert recorded(body=STREAM, complete=False) is None
+    assert recorded(status=529, body=STREAM) is None
+    assert recorded(body=STREAM.rsplit(b"event: message_stop", 1)[0]) is None
+    assert recorded(body=STREAM + b'event: error\ndata: {"type": "error"}\n\n') is None
+    assert recorded(body=STREAM, limit=len(STREAM) - 1) is None
+
+
+def test_least_recently_used_entries_are_evicted_under_max_bytes(tmp_path):
+    async def run():
+        def entry():
+            return CachedResponse(200, "OK", [], os.urandom(1000))
+
+        cache = ResponseCache(tmp_path, max_bytes=10 ** 6)
+        await cache.put("aa1", entry())
+        size = cache.total_bytes
+        cache.max_bytes = size * 2 + size // 2
+        await cache.put("bb2", entry())
+        # 读一次 aa1，最久未使用的变成 bb2
+        assert await cache.get("aa1") is not None
+        await cache.put("cc3", entry())
+        return cache
+
+    cache = asyncio.run(run())
+    assert list(cache.index) == ["aa1", "cc3"]
+    assert cache.evictions == 1 and cache.total_bytes <= cache.max_bytes
+    assert not cache.path_for("bb2").exists()
+    # 重启后从文件恢复索引与总大小
+    reloaded = ResponseCache(tmp_path, max_bytes=cache.max_bytes)
+    assert set(reloaded.index) == {"aa1", "cc3"}
+    assert reloaded.total_bytes == cache.total_bytes
+
+
+def test_pieces_keep_each_event_as_received():
+    cached = CachedResponse(200, "OK", SSE_HEADERS, STREAM + b"data: partial")
+    pieces = cached.pieces()
+    assert b"".join(pieces) == cached.body
+    assert pieces[1].startswith(b"event: content_block_delta\r\n")
+    assert pieces[1].endswith(b"}\r\n\r\n") and len(pieces) == 4
+    assert pieces[-1] == b"data: partial"
+
+
+async def fetch(gateway, payload):
+    async with AsyncHttpClient() as client:
+        response = await client.open(
+            "POST", f"http://127.0.0.1:{gateway.port}/v1/messages",
+            {"Authorization": f"Bearer {TOKEN}"}, json.dumps(payload).encode(), 10,
+        )
+        chunks = [chunk async for chunk in response.iter_chunks()]
+    return response.headers.get(CACHE_HEADER.lower()), chunks
+
+
+def test_hit_replays_the_stream_byte_for_byte(tmp_path):
+    async def run():
+        stub = StubUpstream(events=4)
+        await stub.start()
+        gateway = await start_gateway(config_for(stub.url))
+        gateway.cache = ResponseCache(tmp_path)
+        payload = {"model": "m", "stream": True, "temperature": 0, "messages": []}
+        try:
+            miss = await fetch(gateway, payload)
+            hit = await fetch(gateway, dict(reversed(list(payload.items()))))
+            return miss, hit, stub.tokens, list(stub.body())
+        finally:
+            await gateway.close()
+            await stub.close()
+
+    (miss_header, miss), (hit_header, hit), tokens, events = asyncio.run(run())
+    assert (miss_header, hit_header) == (None, "hit")
+    assert tokens == ["a"]
+    assert b"".join(hit) == b"".join(miss) == b"".join(events)
+    # 回放时每个 SSE 事件单独成块，与上游的事件边界一致
+    assert hit == events
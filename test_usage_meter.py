@@ -0,0 +1,82 @@
+"""测试网关用量统计：SSE 事件解析与批量写入"""
+
+import asyncio
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from usage_meter import UsageMeter, UsageTap
+
+
+def sse(payload, named=True):
+    event = f"event: {payload['type']}\n" if named else ""
+    return f"{event}data: {json.dumps(payload)}\n\n".encode()
+
+
+STREAM = [
+    {"type": "message_start", "message": {"model": "m1", "usage": {"input_tokens": 5}}},
+    {"type": "content_block_delta", "delta": {"type": "text_delta", "text": "hi"}},
+    {"type": "message_delta", "usage": {"output_tokens": 2}},
+    {"type": "message_delta", "usage": {"output_tokens": 9}},
+]
+
+
+def test_named_and_unnamed_events_give_the_same_usage():
+    for named in (True, False):
+        tap = UsageTap("p", "m0", streaming=True)
+        data = b"".join(sse(payload, named) for payload in STREAM)
+        # 逐字节喂入，事件跨块也能解析
+        for i in range(len(data)):
+            tap.feed(data[i:i + 1])
+        usage = tap.finish()
+        assert tap.model == "m1"
+        assert (usage["input_tokens"], usage["output_tokens"]) == (5, 9)
+
+
+def test_json_response_is_read_at_the_end():
+    tap = UsageTap("p", "m0", streaming=False)
+    tap.feed(json.dumps({"model": "m1", "usage": {"input_tokens": 3, "output_tokens": 4}}).encode())
+    assert tap.finish()["output_tokens"] == 4 and tap.model == "m1"
+
+
+class MemoryStore:
+    def __init__(self):
+        self.rows = []
+
+    def add_many(self, rows):
+        self.rows.extend(rows)
+
+
+def finished_tap(output_tokens):
+    tap = UsageTap("p", "m", streaming=False)
+    tap.feed(json.dumps({"usage": {"output_tokens": output_tokens}}).encode())
+    return tap
+
+
+def test_the_tail_of_a_burst_is_written_without_further_requests():
+    async def run():
+        store = MemoryStore()
+        meter = UsageMeter(store, flush_seconds=0.05)
+        for tokens in (1, 2, 3):
+            meter.record(finished_tap(tokens))
+        assert store.rows == []
+        await asyncio.sleep(0.2)
+        return store.rows, meter.pending
+
+    rows, pending = asyncio.run(run())
+    assert pending == {}
+    # 一批请求合并为一行：3 个请求，共 6 个输出 token
+    assert [row[3:5] for row in rows] == [(3, 0)] and rows[0][5] == 6
+
+
+def test_close_writes_pending_usage():
+    async def run():
+        store = MemoryStore()
+        meter = UsageMeter(store, flush_seconds=60)
+        meter.record(finished_tap(4))
+        await meter.close()
+        return store.rows
+
+    assert [row[5] for row in asyncio.run(run())] == [4]
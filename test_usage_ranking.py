@@ -0,0 +1,32 @@
+"""测试使用排行：增量更新配置中的 usage 字段与写入快照隔离"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from persistence import snapshot_config
+from usage_ranking import UsageRanking
+
+
+def test_update_dict_matches_a_full_rebuild():
+    ranking = UsageRanking.from_dict({"recent": ["a", "b"], "counts": {"a": 2, "b": 1}})
+    data = ranking.to_dict()
+    for name in ["c", "a", "b", "a"]:
+        ranking.record(name)
+        ranking.update_dict(data, name)
+        assert data == ranking.to_dict()
+    ranking.remove("b")
+    ranking.update_dict(data, "b")
+    assert data == ranking.to_dict() == {"recent": ["c", "a"], "counts": {"c": 1, "a": 4}}
+
+
+def test_snapshot_does_not_see_later_usage_updates():
+    ranking = UsageRanking()
+    config = {"active": "a", "models": {}, "usage": ranking.to_dict()}
+    ranking.record("a")
+    ranking.update_dict(config["usage"], "a")
+    snapshot = snapshot_config(config)
+    ranking.record("b")
+    ranking.update_dict(config["usage"], "b")
+    assert snapshot["usage"] == {"recent": ["a"], "counts": {"a": 1}}
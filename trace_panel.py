@@ -0,0 +1,115 @@
+"""
+Performance panel for Claude Model Manager
+Shows the per-stage breakdown of recent traced operations and exports Chrome traces
+"""
+
+import time
+
+from PyQt6.QtCore import QTimer
+from PyQt6.QtWidgets import (
+    QCheckBox,
+    QDialog,
+    QFileDialog,
+    QHBoxLayout,
+    QMessageBox,
+    QPushButton,
+    QTreeWidget,
+    QTreeWidgetItem,
+    QVBoxLayout,
+)
+
+from tracing import tracer
+
+
+class TracePanel(QDialog):
+    """Tree of recent operations and their stages, newest first"""
+
+    REFRESH_MS = 1000
+    MAX_OPERATIONS = 100
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("性能面板")
+        self.resize(680, 460)
+        self.shown_marker = None
+
+        layout = QVBoxLayout(self)
+        controls = QHBoxLayout()
+        self.enabled_check = QCheckBox("记录耗时")
+        self.enabled_check.setChecked(tracer.enabled)
+        self.enabled_check.toggled.connect(self.set_enabled)
+        clear_button = QPushButton("清空")
+        clear_button.clicked.connect(self.clear)
+        export_button = QPushButton("导出 Chrome Trace...")
+        export_button.clicked.connect(self.export_trace)
+        controls.addWidget(self.enabled_check)
+        controls.addStretch()
+        controls.addWidget(clear_button)
+        controls.addWidget(export_button)
+        layout.addLayout(controls)
+
+        self.tree = QTreeWidget()
+        self.tree.setHeaderLabels(["操作 / 阶段", "耗时 (ms)", "占比", "线程", "时间"])
+        self.tree.setColumnWidth(0, 260)
+        layout.addWidget(self.tree)
+
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(self.REFRESH_MS)
+        self.refresh_timer.timeout.connect(self.refresh)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.enabled_check.setChecked(tracer.enabled)
+        self.refresh()
+        self.refresh_timer.start()
+
+    def hideEvent(self, event):
+        self.refresh_timer.stop()
+        super().hideEvent(event)
+
+    def set_enabled(self, enabled):
+        tracer.enabled = enabled
+
+    def clear(self):
+        tracer.clear()
+        self.refresh()
+
+    def refresh(self):
+        # 没有新的 span 时不重建树，保留展开状态
+        spans = tracer.spans()
+        marker = (len(spans), id(spans[-1]) if spans else None)
+        if marker == self.shown_marker:
+            return
+        self.shown_marker = marker
+        self.tree.clear()
+        for span, children in tracer.operations(self.MAX_OPERATIONS):
+            item = self.build_item(span, children, span.duration_ms)
+            item.setText(3, span.thread)
+            item.setText(4, time.strftime("%H:%M:%S", time.localtime(tracer.wall_time(span))))
+            self.tree.addTopLevelItem(item)
+
+    def build_item(self, span, children, root_ms):
+        label = span.name
+        if span.args:
+            label += " (" + ", ".join(f"{k}={v}" for k, v in span.args.items()) + ")"
+        item = QTreeWidgetItem([label, f"{span.duration_ms:.2f}"])
+        if root_ms > 0:
+            item.setText(2, f"{span.duration_ms / root_ms:.0%}")
+        for child, grandchildren in children:
+            item.addChild(self.build_item(child, grandchildren, root_ms))
+        return item
+
+    def export_trace(self):
+        path, _ = QFileDialog.getSaveFileName(
+            self, "导出 Chrome Trace", "claude-model-manager-trace.json", "JSON (*.json)"
+        )
+        if not path:
+            return
+        try:
+            tracer.export_chrome_trace(path)
+        except OSError as e:
+            QMessageBox.warning(self, "导出失败", str(e))
+            return
+        QMessageBox.information(
+            self, "提示", f"已导出到 {path}\n可在 chrome://tracing 或 ui.perfetto.dev 中打开"
+        )
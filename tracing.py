@@ -0,0 +1,161 @@
+"""
+Tracing spans for Claude Model Manager
+Times each stage of add/edit/switch/delete and update checks into a ring buffer
+"""
+
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+RING_SIZE = 4096
+
+
+class _NullSpan:
+    """Shared do-nothing span returned while tracing is disabled"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **args):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """One timed stage; nesting is tracked per thread and per asyncio task"""
+
+    __slots__ = ("tracer", "name", "args", "start", "end", "thread", "depth", "parent", "_token")
+
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+        self.start = 0
+        self.end = 0
+        self.thread = ""
+        self.depth = 0
+        self.parent = None
+        self._token = None
+
+    def __enter__(self):
+        self.parent = self.tracer._current.get()
+        self.depth = self.parent.depth + 1 if self.parent is not None else 0
+        self.thread = threading.current_thread().name
+        self._token = self.tracer._current.set(self)
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end = time.perf_counter_ns()
+        # 恢复进入前的当前 span，而不是弹出栈顶：并发的协程各自有自己的上下文
+        self.tracer._current.reset(self._token)
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        self.tracer._buffer.append(self)
+        return False
+
+    def set(self, **args):
+        """Attach extra arguments known only after the span started"""
+        self.args.update(args)
+
+    @property
+    def duration_ms(self):
+        return (self.end - self.start) / 1e6
+
+
+class Tracer:
+    """Ring buffer of finished spans
+
+    While disabled, span() returns NULL_SPAN without allocating, so
+    instrumented code pays one attribute check. deque(maxlen) drops the
+    oldest spans and its append is atomic, so worker threads need no lock.
+    The current span lives in a ContextVar, which every thread and every
+    asyncio task has its own copy of, so concurrent gateway requests on one
+    event loop do not nest under each other.
+    """
+
+    def __init__(self, size=RING_SIZE, enabled=False):
+        self.enabled = enabled
+        self._buffer = deque(maxlen=size)
+        self._current = contextvars.ContextVar("current_span", default=None)
+        # perf_counter 没有固定起点，导出时换算成墙钟时间
+        self._wall_offset_ns = time.time_ns() - time.perf_counter_ns()
+
+    def span(self, name, **args):
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, args)
+
+    def spans(self):
+        return list(self._buffer.copy())
+
+    def clear(self):
+        self._buffer.clear()
+
+    def operations(self, limit=50):
+        """Recent top-level spans, newest first, as (span, children) trees
+
+        Spans of one thread that ran at depth 0 are operations; stages that ran
+        on worker threads (config writes, terminal launches) show up as their
+        own operations.
+        """
+        children = {}
+        roots = []
+        for span in self.spans():
+            if span.parent is None:
+                roots.append(span)
+            else:
+                children.setdefault(id(span.parent), []).append(span)
+
+        def build(span):
+            kids = sorted(children.get(id(span), []), key=lambda s: s.start)
+            return span, [build(kid) for kid in kids]
+
+        return [build(root) for root in reversed(roots[-limit:])]
+
+    def wall_time(self, span):
+        return (span.start + self._wall_offset_ns) / 1e9
+
+    def chrome_trace(self):
+        """Spans as a Chrome trace (chrome://tracing, Perfetto) JSON object"""
+        pid = os.getpid()
+        thread_ids = {}
+        events = []
+        for span in self.spans():
+            tid = thread_ids.setdefault(span.thread, len(thread_ids) + 1)
+            events.append(
+                {
+                    "name": span.name,
+                    "cat": "claude-model-manager",
+                    "ph": "X",
+                    "ts": (span.start + self._wall_offset_ns) / 1000,
+                    "dur": (span.end - span.start) / 1000,
+                    "pid": pid,
+                    "tid": tid,
+                    "args": {k: str(v) for k, v in span.args.items()},
+                }
+            )
+        for name, tid in thread_ids.items():
+            events.append(
+                {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+            )
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export_chrome_trace(self, path):
+        with open(path, "w") as f:
+            json.dump(self.chrome_trace(), f)
+
+
+# 全局 tracer，--trace 启动或在性能面板中开启
+tracer = Tracer(enabled="--trace" in sys.argv)
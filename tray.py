@@ -0,0 +1,229 @@
+"""
+System tray mode for Claude Model Manager
+Keeps the process resident with a most-used quick-switch menu; the window is created on demand
+"""
+
+import time
+from pathlib import Path
+
+from PyQt6.QtCore import QObject
+from PyQt6.QtGui import QAction, QIcon
+from PyQt6.QtWidgets import QApplication, QMenu, QStyle, QSystemTrayIcon
+
+from auto_select import AUTO_PROFILE, AutoSwitcher, set_auto_enabled
+from gateway_service import GatewayService
+from profile_switcher import ProfileSwitcher
+from usage_ranking import UsageRanking
+
+ICON_FILE = Path(__file__).resolve().parent / "assets" / "icon.png"
+
+
+def tray_icon():
+    icon = QIcon(str(ICON_FILE))
+    if icon.isNull():
+        icon = QApplication.style().standardIcon(QStyle.StandardPixmap.SP_ComputerIcon)
+    return icon
+
+
+class TrayController(QObject):
+    """Owns the shared config while the app lives in the tray
+
+    Switching from the menu updates config, usage ranking and env.sh through
+    the shared ConfigWriter without building any widgets. Once the main window
+    exists it becomes the single place switches go through.
+    """
+
+    MENU_SIZE = 5
+
+    def __init__(
+        self,
+        config,
+        config_writer,
+        terminal_launcher,
+        window_factory,
+        render_env,
+        env_file,
+        parent=None,
+    ):
+        super().__init__(parent)
+        self.config = config
+        self.usage = UsageRanking.from_dict(config.get("usage"))
+        self.config_writer = config_writer
+        self.terminal_launcher = terminal_launcher
+        self.window_factory = window_factory
+        self.env_file = env_file
+        self.window = None
+        self.started = time.perf_counter()
+        self.source_after_generation = None
+        self.config_writer.saved.connect(self.on_config_saved)
+        self.auto_switcher = AutoSwitcher(lambda: self.config, parent=self)
+        self.auto_switcher.switch_requested.connect(self.on_auto_switch)
+        self.auto_switcher.reconfigure()
+        self.gateway_service = GatewayService(lambda: self.config, parent=self)
+        self.gateway_service.reconfigure()
+        QApplication.instance().aboutToQuit.connect(self.gateway_service.stop)
+        self.switcher = ProfileSwitcher(
+            lambda: self.config, lambda: self.usage, config_writer, self.gateway_service,
+            env_file, render_env, self,
+        )
+        self.switcher.propagation_finished.connect(self.on_propagation_done)
+        self.switcher.propagation_failed.connect(self.on_propagation_failed)
+
+        self.menu = QMenu()
+        self.menu.aboutToShow.connect(self.rebuild_menu)
+        self.tray_icon = QSystemTrayIcon(tray_icon(), self)
+        self.tray_icon.setContextMenu(self.menu)
+        self.tray_icon.activated.connect(self.on_activated)
+        self.update_tooltip()
+        # 部分平台在首次显示前不会触发 aboutToShow
+        self.rebuild_menu()
+
+    def show(self):
+        self.tray_icon.show()
+
+    def update_tooltip(self):
+        active = self.config.get("active") or "-"
+        auto = "（自动选择）" if self.auto_switcher.is_enabled() else ""
+        self.tray_icon.setToolTip(f"Claude Model Manager\n当前模型: {active}{auto}")
+
+    def on_activated(self, reason):
+        if reason == QSystemTrayIcon.ActivationReason.DoubleClick:
+            self.show_window()
+
+    # --- 菜单 ---
+    def rebuild_menu(self):
+        self.menu.clear()
+        models = self.config["models"]
+        active = self.config.get("active")
+        recent = [n for n in self.usage.most_recent(self.MENU_SIZE) if n in models]
+        frequent = [
+            n
+            for n in self.usage.most_frequent(self.MENU_SIZE + len(recent))
+            if n in models and n not in recent
+        ][: self.MENU_SIZE]
+
+        if recent:
+            self.add_section("最近使用", recent, active)
+        if frequent:
+            self.add_section("常用", frequent, active)
+        if not recent and not frequent:
+            first = [name for _, name in zip(range(self.MENU_SIZE), models)]
+            self.add_section("模型", first, active)
+
+        if len(self.auto_switcher.members()) >= 2:
+            self.menu.addSeparator()
+            auto_action = QAction("自动选择最快端点", self.menu)
+            auto_action.setCheckable(True)
+            auto_action.setChecked(self.auto_switcher.is_enabled())
+            auto_action.triggered.connect(self.toggle_auto_selection)
+            self.menu.addAction(auto_action)
+
+        self.menu.addSeparator()
+        open_action = QAction("打开主窗口", self.menu)
+        open_action.triggered.connect(self.show_window)
+        self.menu.addAction(open_action)
+        diagnostics_action = QAction("导出诊断包", self.menu)
+        diagnostics_action.triggered.connect(lambda: self.export_diagnostics())
+        self.menu.addAction(diagnostics_action)
+        quit_action = QAction("退出", self.menu)
+        quit_action.triggered.connect(QApplication.instance().quit)
+        self.menu.addAction(quit_action)
+
+    def add_section(self, title, names, active):
+        self.menu.addSection(title)
+        for name in names:
+            action = QAction(name, self.menu)
+            action.setCheckable(True)
+            action.setChecked(name == active)
+            action.triggered.connect(lambda checked, n=name: self.switch_to(n))
+            self.menu.addAction(action)
+
+    # --- 切换 ---
+    def switch_to(self, name):
+        if name == AUTO_PROFILE and name not in self.config["models"]:
+            self.enable_auto_selection()
+            return
+        if self.window is not None:
+            self.window.activate_model(name)
+            self.update_tooltip()
+            return
+        if name not in self.config["models"]:
+            self.tray_icon.showMessage("Claude Model Manager", f"未找到模型: {name}")
+            return
+        # 手动切换优先于自动选择
+        if set_auto_enabled(self.config, False):
+            self.auto_switcher.reconfigure()
+        generation = self.switcher.switch(name)
+        # env.sh 写入完成后再打开终端；经由本地网关时无需刷新终端
+        if not self.gateway_service.is_running():
+            self.source_after_generation = generation
+        self.update_tooltip()
+
+    def toggle_auto_selection(self, checked):
+        if checked:
+            self.enable_auto_selection()
+        elif set_auto_enabled(self.config, False):
+            self.config_writer.submit(self.config, False)
+            self.auto_switcher.reconfigure()
+            self.update_tooltip()
+
+    def enable_auto_selection(self):
+        if self.window is not None:
+            self.window.enable_auto_selection()
+            return
+        if len(self.auto_switcher.members()) < 2:
+            self.tray_icon.showMessage("Claude Model Manager", "请先在主窗口中设置自动选择的成员")
+            return
+        if set_auto_enabled(self.config, True):
+            self.config_writer.submit(self.config, False)
+        self.auto_switcher.reconfigure()
+        self.update_tooltip()
+
+    def on_auto_switch(self, name, reason):
+        if self.window is not None:
+            self.window.apply_auto_switch(name, reason)
+        elif name in self.config["models"]:
+            # 自动切换只更新 env.sh 并同步远程主机，不打开新终端
+            self.switcher.switch(name, record=False)
+        self.update_tooltip()
+
+    def on_config_saved(self, generation):
+        pending = self.source_after_generation
+        if pending is not None and generation >= pending:
+            self.source_after_generation = None
+            self.terminal_launcher.launch(self.env_file)
+
+    # 主窗口存在时由它报告同步结果
+    def on_propagation_done(self, results, manual):
+        failed = [r for r in results if r.status == r.FAILED]
+        if failed and self.window is None:
+            self.tray_icon.showMessage(
+                "远程同步失败",
+                "\n".join(r.summary() for r in failed),
+                QSystemTrayIcon.MessageIcon.Warning,
+            )
+
+    def on_propagation_failed(self, error):
+        if self.window is None:
+            self.tray_icon.showMessage("远程同步失败", error, QSystemTrayIcon.MessageIcon.Warning)
+
+    def export_diagnostics(self, path=None):
+        from diagnostics import write_bundle
+
+        try:
+            bundle = write_bundle(self.config, path, started=self.started)
+        except OSError as e:
+            self.tray_icon.showMessage(
+                "导出诊断包失败", str(e), QSystemTrayIcon.MessageIcon.Warning
+            )
+            return None
+        self.tray_icon.showMessage("Claude Model Manager", f"诊断包已保存到: {bundle}")
+        return bundle
+
+    # --- 窗口 ---
+    def show_window(self):
+        if self.window is None:
+            self.window = self.window_factory(self)
+        self.window.showNormal()
+        self.window.raise_()
+        self.window.activateWindow()
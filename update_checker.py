@@ -4,7 +4,6 @@ Uses GitHub API to check for new releases based on Git tags
 """
 
 import json
-import requests
 from PyQt6.QtCore import QObject, pyqtSignal, QThread, QTimer, Qt, QUrl
 from PyQt6.QtWidgets import (
     QMessageBox,
@@ -19,6 +18,7 @@ from PyQt6.QtGui import QDesktopServices
 import time
 from pathlib import Path
 from version import get_current_version, compare_versions, parse_version
+from tracing import tracer
 
 
 class UpdateChecker(QObject):
@@ -39,42 +39,48 @@ class UpdateChecker(QObject):
 
     def check_for_updates(self):
         """Check GitHub for latest tag/release"""
-        try:
-            headers = {
-                "Accept": "application/vnd.github.v3+json",
-                "User-Agent": "Claude-Model-Manager",
-            }
-
-            response = requests.get(self.api_url, headers=headers, timeout=10)
-            response.raise_for_status()
-
-            tags = response.json()
-            if not tags:
-                self.no_update.emit()
-                return
-
-            # Get the latest tag
-            latest_tag = tags[0]
-            latest_version = latest_tag["name"]
-
-            # Compare versions
-            comparison = compare_versions(self.current_version, latest_version)
-
-            if comparison < 0:
-                # Update available
-                release_url = f"https://github.com/{self.owner}/{self.repo}/releases/tag/{latest_version}"
-                self.update_available.emit(
-                    self.current_version, latest_version, release_url
-                )
-            else:
-                self.no_update.emit()
-
-        except requests.exceptions.Timeout:
-            self.error_occurred.emit("连接超时，请检查网络连接")
-        except requests.exceptions.RequestException as e:
-            self.error_occurred.emit(f"网络错误: {str(e)}")
-        except Exception as e:
-            self.error_occurred.emit(f"检查更新时出错: {str(e)}")
+        with tracer.span("update.check"):
+            # requests 导入较慢，只在后台线程真正检查时才导入
+            with tracer.span("update.import_requests"):
+                import requests
+
+            try:
+                headers = {
+                    "Accept": "application/vnd.github.v3+json",
+                    "User-Agent": "Claude-Model-Manager",
+                }
+
+                with tracer.span("update.request"):
+                    response = requests.get(self.api_url, headers=headers, timeout=10)
+                response.raise_for_status()
+
+                tags = response.json()
+                if not tags:
+                    self.no_update.emit()
+                    return
+
+                # Get the latest tag
+                latest_tag = tags[0]
+                latest_version = latest_tag["name"]
+
+                # Compare versions
+                comparison = compare_versions(self.current_version, latest_version)
+
+                if comparison < 0:
+                    # Update available
+                    release_url = f"https://github.com/{self.owner}/{self.repo}/releases/tag/{latest_version}"
+                    self.update_available.emit(
+                        self.current_version, latest_version, release_url
+                    )
+                else:
+                    self.no_update.emit()
+
+            except requests.exceptions.Timeout:
+                self.error_occurred.emit("连接超时，请检查网络连接")
+            except requests.exceptions.RequestException as e:
+                self.error_occurred.emit(f"网络错误: {str(e)}")
+            except Exception as e:
+                self.error_occurred.emit(f"检查更新时出错: {str(e)}")
 
 
 class UpdateCheckThread(QThread):
@@ -0,0 +1,98 @@
+"""
+Usage dialog for Claude Model Manager
+Token totals per profile and model, as metered by the local gateway
+"""
+
+import time
+
+from PyQt6.QtCore import Qt, QTimer
+from PyQt6.QtWidgets import (
+    QAbstractItemView,
+    QComboBox,
+    QDialog,
+    QHBoxLayout,
+    QHeaderView,
+    QLabel,
+    QTableWidget,
+    QTableWidgetItem,
+    QVBoxLayout,
+)
+
+from usage_meter import day_for, format_tokens
+
+
+class UsageDialog(QDialog):
+    """Table of metered usage; re-reads the store while visible"""
+
+    RANGES = [("今天", 1), ("最近 7 天", 7), ("最近 30 天", 30), ("全部", None)]
+    COLUMNS = ["模型配置", "模型", "请求", "输入", "输出", "缓存读取", "缓存写入"]
+    REFRESH_MS = 5000
+
+    def __init__(self, store, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("用量统计")
+        self.resize(760, 420)
+        self.store = store
+
+        layout = QVBoxLayout(self)
+        controls = QHBoxLayout()
+        self.range_combo = QComboBox()
+        for label, days in self.RANGES:
+            self.range_combo.addItem(label, days)
+        controls.addWidget(QLabel("时间范围:"))
+        controls.addWidget(self.range_combo)
+        controls.addStretch()
+        layout.addLayout(controls)
+
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeMode.Stretch)
+        layout.addWidget(self.table, 1)
+        self.status_label = QLabel()
+        layout.addWidget(self.status_label)
+
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(self.REFRESH_MS)
+        self.refresh_timer.timeout.connect(self.reload)
+        self.range_combo.currentIndexChanged.connect(self.reload)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.reload()
+        self.refresh_timer.start()
+
+    def hideEvent(self, event):
+        self.refresh_timer.stop()
+        super().hideEvent(event)
+
+    def reload(self):
+        days = self.range_combo.currentData()
+        since = day_for(time.time() - (days - 1) * 86400) if days else None
+        rows = self.store.totals(since)
+        self.table.setRowCount(len(rows))
+        totals = [0] * 5
+        for row, (profile, model, *counts) in enumerate(rows):
+            cells = [profile, model, str(counts[0]), *map(format_tokens, counts[1:])]
+            for col, text in enumerate(cells):
+                item = QTableWidgetItem(text)
+                if col >= 2:
+                    item.setTextAlignment(
+                        Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter
+                    )
+                    # 悬停显示精确数值
+                    item.setToolTip(f"{counts[col - 2]:,}")
+                self.table.setItem(row, col, item)
+            totals = [a + b for a, b in zip(totals, counts)]
+        self.table.resizeColumnsToContents()
+        if not rows:
+            self.status_label.setText("暂无用量记录（仅统计经本地网关转发的请求）")
+            return
+        requests, input_tokens, output_tokens, cache_read, cache_creation = totals
+        prompt = input_tokens + cache_read + cache_creation
+        ratio = f"，缓存命中 {cache_read / prompt:.0%}" if prompt else ""
+        self.status_label.setText(
+            f"合计 {requests} 个请求，输入 {format_tokens(input_tokens)}，"
+            f"输出 {format_tokens(output_tokens)}，缓存读取 {format_tokens(cache_read)}{ratio}"
+        )
@@ -0,0 +1,258 @@
+"""
+Usage metering for Claude Model Manager
+Token usage per profile and model, read from responses as the local gateway relays them
+"""
+
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+import unicodedata
+from pathlib import Path
+
+from http_client import SseParser
+
+DB_FILE = Path.home() / ".claude-cli" / "usage.db"
+# 内存中累积的用量每隔这么久写入一次 SQLite
+FLUSH_SECONDS = 5.0
+# 非流式响应需要读完整个 JSON 才能取到 usage，超过此大小则放弃统计 token
+MAX_JSON_BYTES = 2 * 1024 * 1024
+USAGE_FIELDS = (
+    "input_tokens", "output_tokens", "cache_read_input_tokens", "cache_creation_input_tokens",
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS usage (
+    day TEXT NOT NULL,
+    profile TEXT NOT NULL,
+    model TEXT NOT NULL,
+    requests INTEGER NOT NULL DEFAULT 0,
+    input_tokens INTEGER NOT NULL DEFAULT 0,
+    output_tokens INTEGER NOT NULL DEFAULT 0,
+    cache_read_tokens INTEGER NOT NULL DEFAULT 0,
+    cache_creation_tokens INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, profile, model)
+);
+"""
+
+
+class UsageStore:
+    """Daily totals keyed by (day, profile, model)
+
+    Follows LatencyStore: one locked connection in WAL mode, so the gateway
+    thread writes while the GUI (or another process) reads.
+    """
+
+    def __init__(self, path=DB_FILE):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+
+    def add_many(self, rows):
+        """rows: iterable of (day, profile, model, requests, input, output, cache_read, cache_creation)"""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO usage (day, profile, model, requests, input_tokens, output_tokens, "
+                "cache_read_tokens, cache_creation_tokens) VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (day, profile, model) DO UPDATE SET "
+                "requests = requests + excluded.requests, "
+                "input_tokens = input_tokens + excluded.input_tokens, "
+                "output_tokens = output_tokens + excluded.output_tokens, "
+                "cache_read_tokens = cache_read_tokens + excluded.cache_read_tokens, "
+                "cache_creation_tokens = cache_creation_tokens + excluded.cache_creation_tokens",
+                list(rows),
+            )
+
+    def totals(self, since_day=None):
+        """[(profile, model, requests, input, output, cache_read, cache_creation)], largest first"""
+        sql = (
+            "SELECT profile, model, SUM(requests), SUM(input_tokens), SUM(output_tokens), "
+            "SUM(cache_read_tokens), SUM(cache_creation_tokens) FROM usage"
+        )
+        params = []
+        if since_day is not None:
+            sql += " WHERE day >= ?"
+            params.append(since_day)
+        sql += " GROUP BY profile, model ORDER BY SUM(input_tokens + output_tokens) DESC"
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def day_for(ts=None):
+    return time.strftime("%Y-%m-%d", time.localtime(ts))
+
+
+class UsageTap:
+    """Follows the usage of one response while it is relayed
+
+    For SSE only message_start and message_delta events are decoded, plus
+    events without an event: line, which some gateways send and which are
+    told apart by the payload's type; the parser keeps just the current
+    partial line, so streams are not buffered.
+    message_delta carries cumulative counts, so later values replace earlier
+    ones. A JSON response is collected (up to MAX_JSON_BYTES) and read once
+    at the end.
+    """
+
+    def __init__(self, profile, model, streaming):
+        self.profile = profile
+        self.model = model
+        self.parser = SseParser() if streaming else None
+        self.parts = []
+        self.size = 0
+        self.usage = dict.fromkeys(USAGE_FIELDS, 0)
+
+    def feed(self, chunk):
+        if self.parser is None:
+            self.size += len(chunk)
+            if self.size <= MAX_JSON_BYTES:
+                self.parts.append(chunk)
+            return
+        for event, data in self.parser.feed(chunk):
+            if event not in ("message_start", "message_delta", "message"):
+                continue
+            payload = self._load(data)
+            # 没有 event: 行时 SseParser 给出 "message"，此时按 data 中的 type 区分
+            kind = payload.get("type", event) if event == "message" else event
+            if kind == "message_start":
+                message = payload.get("message", {})
+                self.model = message.get("model") or self.model
+                self._apply(message.get("usage"))
+            elif kind == "message_delta":
+                self._apply(payload.get("usage"))
+
+    def finish(self):
+        """Final usage dict; JSON bodies are parsed here"""
+        if self.parser is None and self.size <= MAX_JSON_BYTES:
+            payload = self._load(b"".join(self.parts))
+            self.model = payload.get("model") or self.model
+            self._apply(payload.get("usage"))
+            self.parts = []
+        return self.usage
+
+    def _apply(self, usage):
+        if not isinstance(usage, dict):
+            return
+        for field in USAGE_FIELDS:
+            value = usage.get(field)
+            if isinstance(value, int):
+                self.usage[field] = value
+
+    @staticmethod
+    def _load(data):
+        try:
+            payload = json.loads(data)
+        except ValueError:
+            return {}
+        return payload if isinstance(payload, dict) else {}
+
+
+class UsageMeter:
+    """Accumulates taps in memory and writes them to the store in batches
+
+    Runs on the gateway's event loop; the SQLite write happens in a worker
+    thread, so metering adds no disk I/O to the request path. The first
+    usage recorded after a write schedules the next one FLUSH_SECONDS
+    later, so the tail of a burst is written even if no request follows.
+    """
+
+    def __init__(self, store, flush_seconds=FLUSH_SECONDS):
+        self.store = store
+        self.flush_seconds = flush_seconds
+        self.pending = {}  # (day, profile, model) → [requests, 输入, 输出, 缓存读取, 缓存写入]
+        self._timer = None
+        self._flushing = None
+
+    def tap(self, profile, model, streaming):
+        return UsageTap(profile, model, streaming)
+
+    def record(self, tap):
+        usage = tap.finish()
+        key = (day_for(), tap.profile, tap.model or "unknown")
+        totals = self.pending.setdefault(key, [0, 0, 0, 0, 0])
+        totals[0] += 1
+        for i, field in enumerate(USAGE_FIELDS, 1):
+            totals[i] += usage[field]
+        self._schedule()
+
+    def _schedule(self):
+        if self._timer is None and self._flushing is None:
+            self._timer = asyncio.get_running_loop().call_later(self.flush_seconds, self._start_flush)
+
+    def _start_flush(self):
+        self._timer = None
+        self._flushing = asyncio.ensure_future(self.flush())
+
+    async def flush(self):
+        rows = [(*key, *totals) for key, totals in self.pending.items()]
+        self.pending = {}
+        try:
+            if rows:
+                await asyncio.to_thread(self.store.add_many, rows)
+        except sqlite3.Error:
+            pass
+        finally:
+            self._flushing = None
+            # 写入期间又记录的用量等下一轮
+            if self.pending:
+                self._schedule()
+
+    async def close(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._flushing is not None:
+            await self._flushing
+        await self.flush()
+
+
+def _width(text):
+    # 中文等宽字符在终端中占两列
+    return sum(2 if unicodedata.east_asian_width(ch) in "WF" else 1 for ch in text)
+
+
+def format_tokens(count):
+    if count >= 1_000_000:
+        return f"{count / 1_000_000:.2f}M"
+    if count >= 10_000:
+        return f"{count / 1000:.1f}k"
+    return str(count)
+
+
+# --- 命令行：查看用量 ---
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="查看经本地网关转发的 token 用量")
+    parser.add_argument("--days", type=int, help="只统计最近 N 天（默认全部）")
+    args = parser.parse_args(argv)
+
+    since = day_for(time.time() - (args.days - 1) * 86400) if args.days else None
+    rows = UsageStore().totals(since)
+    if not rows:
+        print("暂无用量记录")
+        return
+    table = [["模型配置", "模型", "请求", "输入", "输出", "缓存读取", "缓存写入"]]
+    for profile, model, requests, *tokens in rows:
+        table.append([profile, model, str(requests), *map(format_tokens, tokens)])
+    widths = [max(_width(row[col]) for row in table) for col in range(len(table[0]))]
+    for row in table:
+        cells = [
+            cell + " " * (width - _width(cell)) if col < 2 else " " * (width - _width(cell)) + cell
+            for col, (cell, width) in enumerate(zip(row, widths))
+        ]
+        print("  ".join(cells))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Profile usage ranking for Claude Model Manager
+Most-recently and most-frequently used profiles with O(1) updates
+"""
+
+from collections import OrderedDict
+from itertools import islice
+
+
+class UsageRanking:
+    """Recency list plus frequency buckets, in the style of an O(1) LFU cache
+
+    record() and remove() touch a constant number of dict entries. Listing the
+    top N walks only the non-empty frequency buckets from the highest count.
+    """
+
+    def __init__(self):
+        self._recent = OrderedDict()
+        self._counts = {}
+        self._buckets = {}
+
+    def __len__(self):
+        return len(self._counts)
+
+    def __contains__(self, name):
+        return name in self._counts
+
+    def record(self, name):
+        count = self._counts.get(name, 0)
+        if count:
+            self._unbucket(name, count)
+        self._counts[name] = count + 1
+        self._buckets.setdefault(count + 1, OrderedDict())[name] = None
+        self._recent[name] = None
+        self._recent.move_to_end(name)
+
+    def remove(self, name):
+        count = self._counts.pop(name, 0)
+        if count:
+            self._unbucket(name, count)
+            del self._recent[name]
+
+    def _unbucket(self, name, count):
+        bucket = self._buckets[count]
+        del bucket[name]
+        if not bucket:
+            del self._buckets[count]
+
+    def count(self, name):
+        return self._counts.get(name, 0)
+
+    def most_recent(self, limit):
+        return list(islice(reversed(self._recent), limit))
+
+    def most_frequent(self, limit):
+        result = []
+        for count in sorted(self._buckets, reverse=True):
+            # 同频次中最近使用的排在前面
+            for name in reversed(self._buckets[count]):
+                result.append(name)
+                if len(result) >= limit:
+                    return result
+        return result
+
+    # --- 持久化（保存在 config.json 的 "usage" 字段中） ---
+    def to_dict(self):
+        return {"recent": list(self._recent), "counts": dict(self._counts)}
+
+    def update_dict(self, data, name):
+        """Bring data, as returned by to_dict(), up to date after name was recorded or removed
+
+        Only name's entries are touched, so a switch does not rebuild the map.
+        """
+        recent = data.setdefault("recent", [])
+        counts = data.setdefault("counts", {})
+        if name in recent:
+            recent.remove(name)
+        if name in self._counts:
+            recent.append(name)
+            counts[name] = self._counts[name]
+        else:
+            counts.pop(name, None)
+
+    @classmethod
+    def from_dict(cls, data):
+        ranking = cls()
+        counts = data.get("counts", {}) if isinstance(data, dict) else {}
+        for name in data.get("recent", []) if isinstance(data, dict) else []:
+            count = int(counts.get(name, 1))
+            ranking._counts[name] = count
+            ranking._buckets.setdefault(count, OrderedDict())[name] = None
+            ranking._recent[name] = None
+        return ranking